@@ -0,0 +1,36 @@
+"""
+KPI历史数据按月归档
+
+将热数据窗口（KPI_HOT_MONTHS 个月）之前的 kpi_data 按月搬到只读的归档文件
+（KPI_ARCHIVE_DIR，默认为数据库同级的 archive 目录）。可按月定期执行，重复执行是安全的。
+
+用法:
+    python scripts/archive_kpi_data.py [热数据月数]
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / "selfmastery"))
+
+from selfmastery.config.database import AsyncSessionLocal, init_async_db
+from selfmastery.backend.services.kpi_archive_service import KPIArchiveService
+
+
+async def archive(hot_months=None):
+    """归档热数据窗口之前的KPI数据"""
+    await init_async_db()
+    async with AsyncSessionLocal() as db:
+        service = KPIArchiveService(db, hot_months=hot_months)
+        archived = await service.archive()
+        for item in archived:
+            print(f"{item['month']:%Y-%m}: 归档 {item['rows']} 条")
+        print(f"热数据起始: {service.hot_cutoff():%Y-%m-%d}，归档分区 {len(service.list_partitions())} 个")
+
+
+if __name__ == "__main__":
+    hot_months = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    asyncio.run(archive(hot_months))
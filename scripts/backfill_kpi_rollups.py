@@ -0,0 +1,36 @@
+"""
+KPI汇总表回填
+
+从原始数据（kpi_data 热表和已归档的月份）重建 kpi_rollups 的小时/天/月汇总。
+上线汇总表后执行一次，之后新写入的数据点由 KPIService.record_data_points 增量维护。
+
+用法:
+    python scripts/backfill_kpi_rollups.py [KPI ID ...]
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / "selfmastery"))
+
+from selfmastery.config.database import AsyncSessionLocal, init_async_db
+from selfmastery.backend.services.kpi_service import KPIService
+
+
+async def backfill(kpi_ids=None):
+    """重建指定KPI（默认全部）的汇总数据"""
+    await init_async_db()
+    async with AsyncSessionLocal() as db:
+        started = time.perf_counter()
+        processed = await KPIService(db).rebuild_rollups(kpi_ids)
+        elapsed = time.perf_counter() - started
+    print(f"已汇总 {processed} 个数据点，耗时 {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    kpi_ids = [int(arg) for arg in sys.argv[1:]] or None
+    asyncio.run(backfill(kpi_ids))
@@ -0,0 +1,133 @@
+"""
+批量操作性能基准测试
+
+对比 BaseService.bulk_create / bulk_update 的集合式实现与原有逐条实现
+（逐条 refresh、逐条 get）在临时 SQLite 数据库上的耗时。
+
+用法:
+    python scripts/benchmark_bulk_operations.py [记录数] [批大小]
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / "selfmastery"))
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from selfmastery.config.database import Base, _sqlite_pragma_on_connect
+from selfmastery.backend.models import User, BusinessSystem, BusinessProcess, Task
+from selfmastery.backend.services.base_service import BaseService, DEFAULT_BULK_CHUNK_SIZE
+
+
+def legacy_bulk_create(db, model, obj_data_list):
+    """原有实现：add_all 后逐条 refresh"""
+    db_objs = [model(**obj_data) for obj_data in obj_data_list]
+    db.add_all(db_objs)
+    db.commit()
+    for db_obj in db_objs:
+        db.refresh(db_obj)
+    return db_objs
+
+
+def legacy_bulk_update(service, updates):
+    """原有实现：逐条 get 后逐条更新"""
+    updated_objs = []
+    for update_data in updates:
+        obj_id = update_data.pop('id')
+        db_obj = service.get(obj_id)
+        if db_obj:
+            db_obj.update_from_dict(update_data)
+            updated_objs.append(db_obj)
+    service.db.commit()
+    for db_obj in updated_objs:
+        service.db.refresh(db_obj)
+    return updated_objs
+
+
+def create_session(db_path):
+    """创建指向临时数据库的会话"""
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+    event.listen(engine, "connect", _sqlite_pragma_on_connect)
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+
+def prepare_process(db):
+    """准备任务所需的用户、系统和流程"""
+    user = User(name="基准测试用户", email="benchmark@example.com", role="admin")
+    db.add(user)
+    db.flush()
+    system = BusinessSystem(name="基准测试系统", owner_id=user.id)
+    db.add(system)
+    db.flush()
+    process = BusinessProcess(system_id=system.id, name="基准测试流程", owner_id=user.id)
+    db.add(process)
+    db.commit()
+    return user.id, process.id
+
+
+def timed(func, *args, **kwargs):
+    """执行函数并返回 (结果, 耗时秒数)"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def run_benchmark(total: int, chunk_size: int):
+    """运行基准测试"""
+    print(f"批量操作基准测试: {total} 条任务, 批大小 {chunk_size}")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        results = {}
+        for label in ("legacy", "set_based"):
+            db = create_session(Path(tmp_dir) / f"{label}.db")
+            try:
+                user_id, process_id = prepare_process(db)
+                rows = [
+                    {
+                        "process_id": process_id,
+                        "title": f"任务 {i}",
+                        "assignee_id": user_id,
+                        "creator_id": user_id,
+                        "status": "pending",
+                    }
+                    for i in range(total)
+                ]
+                service = BaseService(Task, db)
+
+                if label == "legacy":
+                    tasks, create_time = timed(legacy_bulk_create, db, Task, rows)
+                else:
+                    tasks, create_time = timed(service.bulk_create, rows, chunk_size=chunk_size)
+
+                updates = [
+                    {"id": task.id, "status": "completed" if i % 2 else "in_progress"}
+                    for i, task in enumerate(tasks)
+                ]
+                if label == "legacy":
+                    updated, update_time = timed(legacy_bulk_update, service, updates)
+                else:
+                    updated, update_time = timed(service.bulk_update, updates, chunk_size=chunk_size)
+
+                assert len(tasks) == total and len(updated) == total
+                results[label] = (create_time, update_time)
+            finally:
+                db.close()
+
+    legacy_create, legacy_update = results["legacy"]
+    new_create, new_update = results["set_based"]
+    print(f"{'操作':<12}{'原实现(s)':>12}{'集合式(s)':>12}{'加速比':>10}")
+    print(f"{'bulk_create':<12}{legacy_create:>12.3f}{new_create:>12.3f}{legacy_create / new_create:>9.1f}x")
+    print(f"{'bulk_update':<12}{legacy_update:>12.3f}{new_update:>12.3f}{legacy_update / new_update:>9.1f}x")
+
+
+if __name__ == "__main__":
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    chunk_size = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_BULK_CHUNK_SIZE
+    run_benchmark(total, chunk_size)
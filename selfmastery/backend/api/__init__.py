@@ -4,6 +4,9 @@ API路由模块初始化
 from fastapi import APIRouter
 from .auth import router as auth_router
 from .users import router as users_router
+from .search import router as search_router
+from .systems import router as systems_router
+from .kpis import router as kpis_router
 
 # 创建主API路由器
 api_router = APIRouter()
@@ -21,14 +24,26 @@ api_router.include_router(
     tags=["用户管理"]
 )
 
+api_router.include_router(
+    search_router,
+    prefix="/search",
+    tags=["全局搜索"]
+)
+
+api_router.include_router(
+    systems_router,
+    prefix="/systems",
+    tags=["业务系统"]
+)
+
+api_router.include_router(
+    kpis_router,
+    prefix="/kpis",
+    tags=["KPI指标"]
+)
+
 # TODO: 添加其他路由
 # api_router.include_router(
-#     systems_router,
-#     prefix="/systems",
-#     tags=["业务系统"]
-# )
-# 
-# api_router.include_router(
 #     processes_router,
 #     prefix="/processes",
 #     tags=["业务流程"]
@@ -41,12 +56,6 @@ api_router.include_router(
 # )
 # 
 # api_router.include_router(
-#     kpis_router,
-#     prefix="/kpis",
-#     tags=["KPI指标"]
-# )
-# 
-# api_router.include_router(
 #     tasks_router,
 #     prefix="/tasks",
 #     tags=["任务管理"]
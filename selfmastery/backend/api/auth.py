@@ -1,9 +1,10 @@
 """
 认证相关API路由
 """
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import HTTPBearer
-from sqlalchemy.orm import Session
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..schemas.user import (
     UserLogin, UserRegister, Token, UserResponse,
@@ -14,9 +15,9 @@ from ..middleware.auth import get_current_active_user
 from ..utils.responses import APIResponse
 from ..utils.exceptions import (
     AuthenticationError, UserAlreadyExistsError,
-    ValidationError, DatabaseError
+    ValidationError, DatabaseError, RateLimitError
 )
-from config.database import get_db
+from config.database import get_async_db
 
 router = APIRouter()
 security = HTTPBearer()
@@ -25,7 +26,7 @@ security = HTTPBearer()
 @router.post("/login", response_model=dict, summary="用户登录")
 async def login(
     login_data: UserLogin,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     用户登录
@@ -37,7 +38,7 @@ async def login(
     """
     try:
         auth_service = AuthService(db)
-        token = auth_service.login(login_data)
+        token = await auth_service.login(login_data)
         
         return APIResponse.success(
             data={
@@ -54,6 +55,8 @@ async def login(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=str(e)
         )
+    except RateLimitError:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -64,7 +67,7 @@ async def login(
 @router.post("/register", response_model=dict, summary="用户注册")
 async def register(
     register_data: UserRegister,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     用户注册
@@ -88,7 +91,7 @@ async def register(
             timezone=register_data.timezone
         )
         
-        user = auth_service.register(user_data)
+        user = await auth_service.register(user_data)
         
         return APIResponse.created(
             data={
@@ -112,6 +115,8 @@ async def register(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail=str(e)
         )
+    except RateLimitError:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -122,7 +127,7 @@ async def register(
 @router.post("/refresh", response_model=dict, summary="刷新令牌")
 async def refresh_token(
     refresh_token: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     刷新访问令牌
@@ -133,7 +138,7 @@ async def refresh_token(
     """
     try:
         auth_service = AuthService(db)
-        token = auth_service.refresh_token(refresh_token)
+        token = await auth_service.refresh_token(refresh_token)
         
         return APIResponse.success(
             data={
@@ -159,20 +164,31 @@ async def refresh_token(
 
 @router.post("/logout", response_model=dict, summary="用户登出")
 async def logout(
-    current_user: UserResponse = Depends(get_current_active_user)
+    refresh_token: Optional[str] = None,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    current_user: UserResponse = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     用户登出
     
-    注意：由于使用JWT令牌，实际的登出需要在客户端删除令牌
-    这个端点主要用于记录登出事件和清理服务器端状态
+    撤销当前访问令牌（以及传入的刷新令牌），撤销后令牌在过期前不再可用
+    
+    - **refresh_token**: 刷新令牌（可选）
     """
     try:
-        # TODO: 可以在这里添加令牌黑名单逻辑
-        # TODO: 可以在这里记录登出日志
+        auth_service = AuthService(db)
+        await auth_service.revoke_token(credentials.credentials, "access", current_user.id)
+        if refresh_token:
+            await auth_service.revoke_token(refresh_token, "refresh", current_user.id)
         
         return APIResponse.success(message="登出成功")
         
+    except AuthenticationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -214,7 +230,7 @@ async def change_password(
     old_password: str,
     new_password: str,
     current_user: UserResponse = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     修改当前用户密码
@@ -224,7 +240,7 @@ async def change_password(
     """
     try:
         auth_service = AuthService(db)
-        success = auth_service.change_password(
+        success = await auth_service.change_password(
             current_user.id,
             old_password,
             new_password
@@ -243,6 +259,8 @@ async def change_password(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
+    except RateLimitError:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -253,7 +271,7 @@ async def change_password(
 @router.post("/reset-password", response_model=dict, summary="请求密码重置")
 async def request_password_reset(
     reset_data: PasswordReset,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     请求密码重置
@@ -264,7 +282,7 @@ async def request_password_reset(
     """
     try:
         auth_service = AuthService(db)
-        reset_token = auth_service.reset_password(reset_data.email)
+        reset_token = await auth_service.reset_password(reset_data.email)
         
         # TODO: 在实际实现中，这里应该发送邮件而不是返回令牌
         # 这里为了演示目的返回令牌
@@ -283,7 +301,7 @@ async def request_password_reset(
 @router.post("/reset-password/confirm", response_model=dict, summary="确认密码重置")
 async def confirm_password_reset(
     reset_data: PasswordResetConfirm,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     确认密码重置
@@ -294,7 +312,7 @@ async def confirm_password_reset(
     """
     try:
         auth_service = AuthService(db)
-        success = auth_service.confirm_password_reset(
+        success = await auth_service.confirm_password_reset(
             reset_data.token,
             reset_data.new_password
         )
@@ -312,6 +330,8 @@ async def confirm_password_reset(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
+    except RateLimitError:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -0,0 +1,362 @@
+"""
+KPI指标API路由
+"""
+from datetime import date, datetime
+from typing import List, Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Query, Request
+from fastapi.responses import FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..schemas.user import UserResponse
+from ..schemas.kpi import KPIComparison, KPIReport, KPIReportJobResponse
+from ..services.kpi_service import KPIService
+from ..services.kpi_analytics_service import KPIAnalyticsService
+from ..services.kpi_comparison_service import KPIComparisonService
+from ..services.kpi_archive_service import KPIArchiveService
+from ..services.kpi_ingest_service import KPIIngestService, detect_format
+from ..services.kpi_report_service import KPIReportService, REPORT_FORMATS, REPORT_MEDIA_TYPES, run_report_job
+from ..services.base_service import DEFAULT_BULK_CHUNK_SIZE
+from ..middleware.auth import (
+    get_current_active_user, rate_limit_checker, require_process_edit, require_analytics_view
+)
+from ..utils.responses import APIResponse, ORJSONResponse, project_rows
+from ..utils.exceptions import (
+    KPINotFoundError, ProcessNotFoundError, SystemNotFoundError, ValidationError, DatabaseError,
+    NotFoundError, InsufficientPermissionError, BusinessLogicError
+)
+from config.database import get_async_db, AsyncSessionLocal
+
+router = APIRouter()
+
+# KPI历史数据点返回的字段
+DATA_POINT_FIELDS = ("id", "value", "recorded_at", "source", "notes")
+
+
+@router.get("/latest", response_model=dict, summary="批量获取KPI最新值")
+async def get_latest_values(
+    kpi_ids: List[int] = Query(..., description="KPI ID列表"),
+    current_user: UserResponse = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    批量获取多个KPI的最新值
+    
+    最新值缓存在KPI行上，仪表盘一次请求即可取回全部KPI的当前值。
+    """
+    try:
+        if len(kpi_ids) > 500:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="一次最多查询500个KPI"
+            )
+        
+        latest = await KPIService(db).get_latest_values(kpi_ids)
+        
+        return APIResponse.success(
+            data={str(kpi_id): value for kpi_id, value in latest.items()},
+            message="获取KPI最新值成功"
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="获取KPI最新值失败"
+        )
+
+
+@router.get("/analytics", response_model=dict, summary="批量获取KPI分析")
+async def get_batch_analytics(
+    period_start: date = Query(..., description="周期开始日期"),
+    period_end: date = Query(..., description="周期结束日期（含）"),
+    process_id: Optional[int] = Query(None, description="流程ID"),
+    system_id: Optional[int] = Query(None, description="业务系统ID"),
+    include_subsystems: bool = Query(False, description="按系统查询时是否包含子系统"),
+    resolution: str = Query("auto", pattern="^(auto|hour|day|month)$", description="汇总粒度"),
+    current_user: UserResponse = Depends(require_analytics_view),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    获取一个流程或业务系统下所有KPI的分析结果
+    
+    所有KPI的统计量在一次查询、一次向量化计算中得出。
+    """
+    try:
+        if (process_id is None) == (system_id is None):
+            raise ValidationError("必须且只能指定 process_id 或 system_id 之一")
+        
+        service = KPIAnalyticsService(db)
+        if process_id is not None:
+            analytics = await service.get_process_analytics(process_id, period_start, period_end, resolution)
+        else:
+            analytics = await service.get_system_analytics(
+                system_id, period_start, period_end, resolution, include_subsystems
+            )
+        
+        return APIResponse.success(
+            data=[item.dict() for item in analytics],
+            message="获取KPI分析成功"
+        )
+        
+    except (ProcessNotFoundError, SystemNotFoundError, ValidationError, DatabaseError):
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="获取KPI分析失败"
+        )
+
+
+@router.get("/{kpi_id}/analytics", response_model=dict, summary="获取KPI分析")
+async def get_kpi_analytics(
+    kpi_id: int,
+    period_start: date = Query(..., description="周期开始日期"),
+    period_end: date = Query(..., description="周期结束日期（含）"),
+    resolution: str = Query("auto", pattern="^(auto|hour|day|month)$", description="汇总粒度"),
+    current_user: UserResponse = Depends(require_analytics_view),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    获取KPI在指定周期内的均值、极值、趋势、波动率和达成率
+    """
+    try:
+        analytics = await KPIAnalyticsService(db).get_analytics(kpi_id, period_start, period_end, resolution)
+        
+        return APIResponse.success(
+            data=analytics.dict(),
+            message="获取KPI分析成功"
+        )
+        
+    except (KPINotFoundError, ValidationError, DatabaseError):
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="获取KPI分析失败"
+        )
+
+
+@router.post("/compare", response_model=dict, summary="对比多个KPI")
+async def compare_kpis(
+    comparison: KPIComparison,
+    resolution: str = Query("auto", pattern="^(auto|hour|day|month)$", description="汇总粒度"),
+    max_points: int = Query(500, ge=2, le=5000, description="自动选择粒度时的最大时间桶数"),
+    current_user: UserResponse = Depends(require_analytics_view),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    将多个KPI对齐到同一时间网格后比较数值、趋势或达成率
+    
+    返回对齐后的序列、两两相关系数矩阵和每个KPI的汇总。
+    """
+    try:
+        result = await KPIComparisonService(db).compare(
+            comparison.kpi_ids,
+            comparison.period_start,
+            comparison.period_end,
+            comparison.comparison_type,
+            resolution,
+            max_points
+        )
+        
+        return APIResponse.success(
+            data=result,
+            message="KPI对比成功"
+        )
+        
+    except (KPINotFoundError, ValidationError, DatabaseError):
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="KPI对比失败"
+        )
+
+
+@router.post(
+    "/reports",
+    response_model=dict,
+    summary="创建KPI报告任务",
+    dependencies=[Depends(rate_limit_checker(10, 60))]
+)
+async def create_kpi_report(
+    report: KPIReport,
+    background_tasks: BackgroundTasks,
+    current_user: UserResponse = Depends(require_analytics_view),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    创建KPI报告任务
+    
+    报告在后台生成，立即返回任务信息；通过任务状态接口查询进度，完成后下载。
+    需要数据分析查看权限。
+    """
+    try:
+        job = await KPIReportService(db).create_job(report, current_user.id)
+        background_tasks.add_task(run_report_job, AsyncSessionLocal, job.id)
+        
+        return APIResponse.success(
+            data=KPIReportJobResponse.from_orm(job).dict(),
+            message="KPI报告任务已创建"
+        )
+        
+    except ValidationError:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="创建KPI报告任务失败"
+        )
+
+
+@router.get("/reports/{job_id}", response_model=dict, summary="获取KPI报告任务状态")
+async def get_kpi_report(
+    job_id: int,
+    current_user: UserResponse = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """获取KPI报告任务的状态和进度"""
+    try:
+        job = await KPIReportService(db).get_job(job_id, current_user.id, current_user.role == "admin")
+        
+        return APIResponse.success(
+            data=KPIReportJobResponse.from_orm(job).dict(),
+            message="获取KPI报告任务成功"
+        )
+        
+    except (NotFoundError, InsufficientPermissionError):
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="获取KPI报告任务失败"
+        )
+
+
+@router.get("/reports/{job_id}/download", summary="下载KPI报告")
+async def download_kpi_report(
+    job_id: int,
+    current_user: UserResponse = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """下载已生成的KPI报告文件"""
+    job = await KPIReportService(db).get_job(job_id, current_user.id, current_user.role == "admin")
+    if job.status != "completed" or not job.file_path:
+        raise BusinessLogicError(f"报告尚未生成完成（当前状态: {job.status}）")
+    
+    return FileResponse(
+        job.file_path,
+        media_type=REPORT_MEDIA_TYPES[job.format],
+        filename=f"kpi_report_{job.id}.{REPORT_FORMATS[job.format]}"
+    )
+
+
+@router.post(
+    "/data/ingest",
+    response_model=dict,
+    summary="流式导入KPI数据",
+    dependencies=[Depends(rate_limit_checker(60, 60))]
+)
+async def ingest_kpi_data(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(ndjson|csv)$", description="请求体格式，默认按 Content-Type 判断"),
+    chunk_size: int = Query(DEFAULT_BULK_CHUNK_SIZE, ge=1, le=10000, description="每批写入的数据点数"),
+    current_user: UserResponse = Depends(require_process_edit),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    流式导入KPI数据点
+    
+    请求体为 NDJSON（每行一个JSON对象）或带表头的 CSV，字段同 KPIDataCreate。
+    请求体边接收边解析，按批写入；出错的行在结果中列出，不影响其它行。
+    需要流程编辑权限。
+    """
+    try:
+        fmt = format or detect_format(request.headers.get("content-type"))
+        result = await KPIIngestService(db).ingest(request.stream(), fmt, chunk_size)
+        
+        return APIResponse.success(
+            data=result,
+            message=f"导入完成: 成功 {result['accepted']} 条，失败 {result['rejected']} 条"
+        )
+        
+    except (ValidationError, DatabaseError):
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="KPI数据导入失败"
+        )
+
+
+@router.get("/{kpi_id}/series", response_model=dict, summary="获取KPI时间序列")
+async def get_kpi_series(
+    kpi_id: int,
+    start: datetime = Query(..., description="开始时间"),
+    end: datetime = Query(..., description="结束时间（不含）"),
+    resolution: str = Query("auto", pattern="^(auto|raw|hour|day|month)$", description="汇总粒度"),
+    max_points: int = Query(500, ge=1, le=5000, description="自动选择粒度时的最大点数"),
+    current_user: UserResponse = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    获取KPI时间序列
+    
+    默认按时间范围自动选择小时/天/月汇总数据，长时间范围的趋势图不再扫描原始数据点。
+    """
+    try:
+        series = await KPIService(db).get_series(kpi_id, start, end, resolution, max_points)
+        
+        return APIResponse.success(
+            data=series,
+            message="获取KPI时间序列成功"
+        )
+        
+    except (KPINotFoundError, ValidationError):
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="获取KPI时间序列失败"
+        )
+
+
+@router.get("/{kpi_id}/data", response_model=dict, summary="获取KPI历史数据点")
+async def get_kpi_data_points(
+    kpi_id: int,
+    start: datetime = Query(..., description="开始时间"),
+    end: datetime = Query(..., description="结束时间（不含）"),
+    limit: int = Query(1000, ge=1, le=10000, description="每页数据点数"),
+    cursor: Optional[str] = Query(None, description="分页游标"),
+    current_user: UserResponse = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    获取KPI原始数据点
+    
+    时间范围跨越已归档月份时自动读取对应的归档分区。按 (记录时间, ID) 游标分页，
+    响应中的 next_cursor 可作为下一次请求的 cursor；长时间范围的趋势请使用 /series。
+    """
+    try:
+        if not await KPIService(db).exists(kpi_id):
+            raise KPINotFoundError("KPI不存在")
+        
+        points, next_cursor = await KPIArchiveService(db).get_data_page(kpi_id, start, end, limit, cursor)
+        
+        return ORJSONResponse(APIResponse.paginated(
+            data=project_rows(points, DATA_POINT_FIELDS),
+            total=None,
+            page=None,
+            size=limit,
+            message="获取KPI历史数据成功",
+            next_cursor=next_cursor
+        ))
+        
+    except (KPINotFoundError, ValidationError, DatabaseError):
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="获取KPI历史数据失败"
+        )
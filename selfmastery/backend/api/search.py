@@ -0,0 +1,50 @@
+"""
+全局搜索API路由
+"""
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..schemas.user import UserResponse
+from ..services.search_service import SearchService
+from ..middleware.auth import get_current_active_user
+from ..utils.responses import APIResponse
+from ..utils.exceptions import ValidationError
+from config.database import get_async_db
+
+router = APIRouter()
+
+
+@router.get("/", response_model=dict, summary="全局搜索")
+async def search(
+    q: str = Query(..., min_length=1, max_length=200, description="搜索关键词，空格分隔的多个词需同时匹配"),
+    types: Optional[List[str]] = Query(None, description="限定实体类型: system, process, sop, task"),
+    skip: int = Query(0, ge=0, description="跳过的记录数"),
+    limit: int = Query(20, ge=1, le=100, description="返回的记录数"),
+    current_user: UserResponse = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    跨业务系统、流程、SOP和任务搜索
+    
+    结果按相关度（BM25）排序，facets 给出每种实体类型的匹配数量。
+    """
+    try:
+        search_service = SearchService(db)
+        result = await search_service.search(q, entity_types=types, skip=skip, limit=limit)
+        
+        return APIResponse.success(
+            data=result,
+            message="搜索成功"
+        )
+        
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e.detail)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="搜索失败"
+        )
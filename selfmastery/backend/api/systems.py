@@ -0,0 +1,117 @@
+"""
+业务系统API路由
+"""
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..schemas.user import UserResponse
+from ..services.process_graph_service import ProcessGraphService
+from ..middleware.auth import get_current_active_user
+from ..utils.responses import APIResponse
+from ..utils.exceptions import SystemNotFoundError, ValidationError
+from config.database import get_async_db
+
+router = APIRouter()
+
+
+def _graph_error(e: Exception, message: str) -> HTTPException:
+    """将流程图服务异常转换为HTTP异常"""
+    if isinstance(e, SystemNotFoundError):
+        return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e.detail))
+    if isinstance(e, ValidationError):
+        return HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e.detail))
+    return HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=message)
+
+
+@router.get("/{system_id}/process-graph", response_model=dict, summary="获取流程图概要")
+async def get_process_graph(
+    system_id: int,
+    current_user: UserResponse = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """获取系统内流程数量、连接数量及是否存在环"""
+    try:
+        summary = await ProcessGraphService(db).get_summary(system_id)
+        return APIResponse.success(data=summary, message="获取流程图成功")
+    except Exception as e:
+        raise _graph_error(e, "获取流程图失败")
+
+
+@router.get("/{system_id}/process-graph/reachability", response_model=dict, summary="批量查询流程可达性")
+async def get_process_reachability(
+    system_id: int,
+    process_ids: List[int] = Query(..., description="起点流程ID列表"),
+    direction: str = Query("downstream", pattern="^(downstream|upstream)$", description="downstream 下游影响，upstream 上游依赖"),
+    current_user: UserResponse = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    查询每个起点流程传递可达的全部流程
+    
+    downstream 用于评估修改某个流程的影响范围，upstream 用于查找其依赖。
+    """
+    try:
+        if len(process_ids) > 100:
+            raise ValidationError("一次最多查询100个流程")
+        
+        reachable = await ProcessGraphService(db).get_reachable(
+            system_id, process_ids, downstream=direction == "downstream"
+        )
+        return APIResponse.success(
+            data={str(process_id): ids for process_id, ids in reachable.items()},
+            message="查询流程可达性成功"
+        )
+    except Exception as e:
+        raise _graph_error(e, "查询流程可达性失败")
+
+
+@router.get("/{system_id}/process-graph/topological-order", response_model=dict, summary="获取流程拓扑顺序")
+async def get_process_topological_order(
+    system_id: int,
+    current_user: UserResponse = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """按层返回拓扑顺序，同一层内的流程互不依赖；存在环时返回422"""
+    try:
+        layers = await ProcessGraphService(db).get_topological_layers(system_id)
+        return APIResponse.success(
+            data={
+                "layers": layers,
+                "order": [process_id for layer in layers for process_id in layer]
+            },
+            message="获取拓扑顺序成功"
+        )
+    except Exception as e:
+        raise _graph_error(e, "获取拓扑顺序失败")
+
+
+@router.get("/{system_id}/process-graph/cycles", response_model=dict, summary="检测流程环")
+async def get_process_cycles(
+    system_id: int,
+    current_user: UserResponse = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """返回位于环上的流程ID"""
+    try:
+        cyclic = await ProcessGraphService(db).get_cycles(system_id)
+        return APIResponse.success(
+            data={"has_cycle": bool(cyclic), "cyclic_process_ids": cyclic},
+            message="环检测完成"
+        )
+    except Exception as e:
+        raise _graph_error(e, "环检测失败")
+
+
+@router.get("/{system_id}/process-graph/critical-path", response_model=dict, summary="获取关键路径")
+async def get_process_critical_path(
+    system_id: int,
+    current_user: UserResponse = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """按流程预估时长计算最长路径；存在环时返回422"""
+    try:
+        critical_path = await ProcessGraphService(db).get_critical_path(system_id)
+        return APIResponse.success(data=critical_path, message="获取关键路径成功")
+    except Exception as e:
+        raise _graph_error(e, "获取关键路径失败")
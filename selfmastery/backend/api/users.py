@@ -3,7 +3,7 @@
 """
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..schemas.user import (
     UserCreate, UserUpdate, UserResponse, UserStats, UserProfile
@@ -13,15 +13,18 @@ from ..middleware.auth import (
     get_current_active_user, require_admin, require_manager_or_admin,
     require_user_management
 )
-from ..utils.responses import APIResponse
+from ..utils.responses import APIResponse, ORJSONResponse, project_rows
 from ..utils.exceptions import (
     UserNotFoundError, UserAlreadyExistsError,
     ValidationError, DatabaseError, AuthorizationError
 )
-from config.database import get_db
+from config.database import get_async_db
 
 router = APIRouter()
 
+# 用户列表返回的字段
+USER_LIST_FIELDS = ("id", "name", "email", "role", "timezone", "is_active", "created_at", "updated_at")
+
 
 @router.get("/", response_model=dict, summary="获取用户列表")
 async def get_users(
@@ -30,26 +33,30 @@ async def get_users(
     role: Optional[str] = Query(None, description="按角色过滤"),
     is_active: Optional[bool] = Query(None, description="按状态过滤"),
     search: Optional[str] = Query(None, description="搜索关键词"),
+    cursor: Optional[str] = Query(None, description="分页游标，提供时忽略skip"),
+    approximate_total: bool = Query(False, description="无过滤条件时使用表统计信息估算总数"),
     current_user: UserResponse = Depends(require_manager_or_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     获取用户列表
     
-    需要管理员或经理权限
+    需要管理员或经理权限。响应中的 next_cursor 可作为下一次请求的 cursor，
+    游标分页的翻页耗时与页码深度无关。首页的总数与当前页在同一次查询中返回，
+    按游标翻页时不再计算总数（total 为null）。
     """
     try:
         user_service = UserService(db)
         
         if search:
-            users = user_service.search_users(
+            users, total, next_cursor, total_mode = await user_service.search_users(
                 query=search,
                 skip=skip,
                 limit=limit,
                 role=role,
-                is_active=is_active
+                is_active=is_active,
+                cursor=cursor
             )
-            total = len(users)  # 搜索结果的总数（简化实现）
         else:
             # 构建过滤条件
             filters = {}
@@ -58,35 +65,30 @@ async def get_users(
             if is_active is not None:
                 filters["is_active"] = is_active
             
-            users = user_service.get_multi(
+            users, total, next_cursor, total_mode = await user_service.get_page(
                 skip=skip,
                 limit=limit,
-                filters=filters
+                cursor=cursor,
+                filters=filters,
+                total_mode="approximate" if approximate_total else "exact"
             )
-            total = user_service.count(filters=filters)
-        
-        # 转换为响应格式
-        user_data = []
-        for user in users:
-            user_data.append({
-                "id": user.id,
-                "name": user.name,
-                "email": user.email,
-                "role": user.role,
-                "timezone": user.timezone,
-                "is_active": user.is_active,
-                "created_at": user.created_at,
-                "updated_at": user.updated_at
-            })
         
-        return APIResponse.paginated(
-            data=user_data,
+        # 直接投影为响应字段，由 orjson 编码
+        return ORJSONResponse(APIResponse.paginated(
+            data=project_rows(users, USER_LIST_FIELDS),
             total=total,
-            page=(skip // limit) + 1,
+            page=None if cursor else (skip // limit) + 1,
             size=limit,
-            message="获取用户列表成功"
-        )
+            message="获取用户列表成功",
+            next_cursor=next_cursor,
+            total_approximate=total_mode == "approximate"
+        ))
         
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e.detail)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -98,7 +100,7 @@ async def get_users(
 async def create_user(
     user_data: UserCreate,
     current_user: UserResponse = Depends(require_user_management),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     创建新用户
@@ -107,7 +109,7 @@ async def create_user(
     """
     try:
         user_service = UserService(db)
-        user = user_service.create_user(user_data)
+        user = await user_service.create_user(user_data)
         
         return APIResponse.created(
             data={
@@ -140,11 +142,49 @@ async def create_user(
         )
 
 
+@router.get("/stats", response_model=dict, summary="批量获取用户统计")
+async def get_users_stats(
+    user_ids: List[int] = Query(..., description="用户ID列表"),
+    current_user: UserResponse = Depends(require_manager_or_admin),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    批量获取多个用户的统计信息
+    
+    需要管理员或经理权限
+    """
+    try:
+        if len(user_ids) > 100:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="一次最多查询100个用户"
+            )
+        
+        user_service = UserService(db)
+        stats_map = await user_service.get_users_stats(user_ids)
+        
+        return APIResponse.success(
+            data={
+                str(user_id): stats.dict()
+                for user_id, stats in stats_map.items()
+            },
+            message="获取用户统计成功"
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="获取用户统计失败"
+        )
+
+
 @router.get("/{user_id}", response_model=dict, summary="获取用户详情")
 async def get_user(
     user_id: int,
     current_user: UserResponse = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     获取用户详情
@@ -161,7 +201,7 @@ async def get_user(
                 detail="权限不足"
             )
         
-        user = user_service.get(user_id)
+        user = await user_service.get(user_id)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -196,7 +236,7 @@ async def update_user(
     user_id: int,
     user_data: UserUpdate,
     current_user: UserResponse = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     更新用户信息
@@ -221,7 +261,7 @@ async def update_user(
                     detail="无权修改角色或状态"
                 )
         
-        user = user_service.update_user(user_id, user_data)
+        user = await user_service.update_user(user_id, user_data)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -260,7 +300,7 @@ async def update_user(
 async def delete_user(
     user_id: int,
     current_user: UserResponse = Depends(require_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     删除用户
@@ -277,7 +317,7 @@ async def delete_user(
                 detail="不能删除自己"
             )
         
-        success = user_service.delete(user_id)
+        success = await user_service.delete(user_id)
         if not success:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -299,7 +339,7 @@ async def delete_user(
 async def deactivate_user(
     user_id: int,
     current_user: UserResponse = Depends(require_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     停用用户
@@ -316,7 +356,7 @@ async def deactivate_user(
                 detail="不能停用自己"
             )
         
-        success = user_service.deactivate_user(user_id)
+        success = await user_service.deactivate_user(user_id)
         if not success:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -338,7 +378,7 @@ async def deactivate_user(
 async def activate_user(
     user_id: int,
     current_user: UserResponse = Depends(require_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     激活用户
@@ -348,7 +388,7 @@ async def activate_user(
     try:
         user_service = UserService(db)
         
-        success = user_service.activate_user(user_id)
+        success = await user_service.activate_user(user_id)
         if not success:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -370,7 +410,7 @@ async def activate_user(
 async def get_user_stats(
     user_id: int,
     current_user: UserResponse = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     获取用户统计信息
@@ -386,7 +426,7 @@ async def get_user_stats(
             )
         
         user_service = UserService(db)
-        stats = user_service.get_user_stats(user_id)
+        stats = await user_service.get_user_stats(user_id)
         
         return APIResponse.success(
             data={
@@ -419,7 +459,7 @@ async def change_user_role(
     user_id: int,
     new_role: str,
     current_user: UserResponse = Depends(require_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     修改用户角色
@@ -436,7 +476,7 @@ async def change_user_role(
                 detail="不能修改自己的角色"
             )
         
-        user = user_service.change_user_role(user_id, new_role)
+        user = await user_service.change_user_role(user_id, new_role)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -472,7 +512,7 @@ async def change_user_role(
 async def get_user_permissions(
     user_id: int,
     current_user: UserResponse = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     获取用户权限信息
@@ -488,7 +528,7 @@ async def get_user_permissions(
             )
         
         user_service = UserService(db)
-        permissions = user_service.get_user_permissions(user_id)
+        permissions = await user_service.get_user_permissions(user_id)
         
         return APIResponse.success(
             data=permissions,
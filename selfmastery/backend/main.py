@@ -5,21 +5,26 @@ import uvicorn
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 from pathlib import Path
 from datetime import datetime
 import traceback
 
 from selfmastery.config.settings import get_app_settings
-from selfmastery.config.database import init_async_db
+from selfmastery.config.database import init_async_db, AsyncSessionLocal
 from .api import api_router
 from .utils.exceptions import BaseAPIException
-from .utils.responses import APIResponse, ResponseMessages
+from .utils.responses import APIResponse, ORJSONResponse, ResponseMessages
 from .utils.monitoring import init_sentry_monitoring, capture_exception, set_user_context, add_breadcrumb
 from .middleware.cors import setup_cors
+from .middleware.rate_limit import setup_rate_limit
+from .services.kpi_alert_service import run_alert_loop
+from .services.kpi_report_service import recover_report_jobs
+from .services.password_hasher import password_hasher
+from .services.service_cache import service_cache
 
 # 获取应用设置
 settings = get_app_settings()
@@ -57,12 +62,37 @@ async def lifespan(app: FastAPI):
     Path(settings.UPLOAD_DIR).mkdir(exist_ok=True)
     Path("logs").mkdir(exist_ok=True)
     
+    # 重启前未完成的报告任务标记为失败（单工作进程时全部视为中断）
+    try:
+        stale_after = settings.REPORT_JOB_STALE_SECONDS if settings.API_WORKERS > 1 else 0
+        recovered = await recover_report_jobs(AsyncSessionLocal, stale_after)
+        if recovered:
+            logger.warning(f"{recovered} 个未完成的KPI报告任务已标记为失败")
+    except Exception as e:
+        logger.error(f"清理中断的KPI报告任务失败: {e}")
+    
+    # 启动KPI阈值预警后台任务
+    alert_task = None
+    if settings.KPI_ALERT_INTERVAL_SECONDS > 0:
+        alert_task = asyncio.create_task(run_alert_loop(
+            AsyncSessionLocal,
+            settings.KPI_ALERT_INTERVAL_SECONDS,
+            settings.KPI_ALERT_TIME_BUDGET_SECONDS
+        ))
+    
     logger.info("应用启动完成")
     
     yield
     
     # 关闭时执行
     logger.info("正在关闭应用...")
+    if alert_task is not None:
+        alert_task.cancel()
+        try:
+            await alert_task
+        except asyncio.CancelledError:
+            pass
+    password_hasher.shutdown()
 
 
 # 创建FastAPI应用实例
@@ -77,6 +107,9 @@ app = FastAPI(
     openapi_url=f"{settings.API_V1_STR}/openapi.json"
 )
 
+# 设置IP限流中间件（在CORS之内，429响应也带CORS头）
+setup_rate_limit(app)
+
 # 设置CORS中间件
 setup_cors(app)
 
@@ -96,12 +129,13 @@ async def api_exception_handler(request: Request, exc: BaseAPIException):
     if exc.status_code >= 500:
         capture_exception(exc)
     
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content=APIResponse.error(
             message=exc.detail,
             error_code=getattr(exc, 'error_code', None)
-        )
+        ),
+        headers=exc.headers
     )
 
 
@@ -114,12 +148,13 @@ async def http_exception_handler(request: Request, exc: HTTPException):
     if exc.status_code >= 500:
         capture_exception(exc)
     
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content=APIResponse.error(
             message=exc.detail,
             error_code="HTTP_ERROR"
-        )
+        ),
+        headers=exc.headers
     )
 
 
@@ -137,7 +172,7 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
             "type": error["type"]
         })
     
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=422,
         content=APIResponse.validation_error(
             validation_errors=validation_errors,
@@ -156,7 +191,7 @@ async def general_exception_handler(request: Request, exc: Exception):
     
     # 在调试模式下返回详细错误信息
     if settings.DEBUG:
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=500,
             content=APIResponse.error(
                 message=f"内部服务器错误: {str(exc)}",
@@ -168,7 +203,7 @@ async def general_exception_handler(request: Request, exc: Exception):
             )
         )
     else:
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=500,
             content=APIResponse.error(
                 message=ResponseMessages.INTERNAL_ERROR,
@@ -205,7 +240,9 @@ async def health_check():
             "status": "healthy",
             "timestamp": datetime.now().isoformat(),
             "version": settings.APP_VERSION,
-            "uptime": "运行中"
+            "uptime": "运行中",
+            "password_hashing": password_hasher.stats(),
+            "service_cache": service_cache.stats()
         },
         message="系统运行正常"
     )
@@ -2,28 +2,49 @@
 认证中间件
 """
 from typing import Optional
-from fastapi import Depends, HTTPException, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from fastapi import Depends, HTTPException, Request, Response, status
+from fastapi.security import APIKeyHeader, HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..services.auth_service import AuthService
+from ..services.auth_service import AuthService, token_digest
+from ..services.principal_service import Principal
+from .rate_limit import RateLimitResult, rate_limiter
 from ..models.user import User
-from ..utils.exceptions import AuthenticationError, AuthorizationError
-from config.database import get_db
+from ..utils.exceptions import AuthenticationError, AuthorizationError, RateLimitError
+from config.database import get_async_db
+from config.settings import get_app_settings
+
+settings = get_app_settings()
 
 # HTTP Bearer 认证方案
 security = HTTPBearer()
 
+# API密钥认证方案
+api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
+
+# 按摘要索引的API密钥权限（不保留密钥原文）
+API_KEY_SCOPES = {token_digest(key): scopes for key, scopes in settings.API_KEYS.items()}
 
-def get_current_user(
+
+async def get_current_user(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
-    """获取当前认证用户"""
+    db: AsyncSession = Depends(get_async_db)
+) -> Principal:
+    """
+    获取当前认证用户
+    
+    每个请求只解析一次，结果保存在 request.state.principal 中供其它依赖共享。
+    """
+    principal = getattr(request.state, "principal", None)
+    if principal is not None:
+        return principal
+    
     try:
         auth_service = AuthService(db)
-        user = auth_service.get_current_user(credentials.credentials)
-        return user
+        principal = await auth_service.get_current_principal(credentials.credentials)
+        request.state.principal = principal
+        return principal
     except AuthenticationError as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -32,7 +53,7 @@ def get_current_user(
         )
 
 
-def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
+def get_current_active_user(current_user: Principal = Depends(get_current_user)) -> Principal:
     """获取当前活跃用户"""
     if not current_user.is_active:
         raise HTTPException(
@@ -42,18 +63,24 @@ def get_current_active_user(current_user: User = Depends(get_current_user)) -> U
     return current_user
 
 
-def get_optional_user(
+async def get_optional_user(
+    request: Request,
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
-    db: Session = Depends(get_db)
-) -> Optional[User]:
+    db: AsyncSession = Depends(get_async_db)
+) -> Optional[Principal]:
     """获取可选的当前用户（用于可选认证的端点）"""
     if not credentials:
         return None
     
+    principal = getattr(request.state, "principal", None)
+    if principal is not None:
+        return principal
+    
     try:
         auth_service = AuthService(db)
-        user = auth_service.get_current_user(credentials.credentials)
-        return user
+        principal = await auth_service.get_current_principal(credentials.credentials)
+        request.state.principal = principal
+        return principal
     except AuthenticationError:
         return None
 
@@ -64,7 +91,7 @@ class RoleChecker:
     def __init__(self, allowed_roles: list):
         self.allowed_roles = allowed_roles
     
-    def __call__(self, current_user: User = Depends(get_current_active_user)):
+    def __call__(self, current_user: Principal = Depends(get_current_active_user)):
         if current_user.role not in self.allowed_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -79,15 +106,9 @@ class PermissionChecker:
     def __init__(self, required_permission: str):
         self.required_permission = required_permission
     
-    def __call__(
-        self,
-        current_user: User = Depends(get_current_active_user),
-        db: Session = Depends(get_db)
-    ):
-        from ..services.user_service import UserService
-        user_service = UserService(db)
-        
-        if not user_service.check_user_permission(current_user.id, self.required_permission):
+    def __call__(self, current_user: Principal = Depends(get_current_active_user)):
+        # 权限集合随 Principal 预先计算，不再查询数据库
+        if not current_user.has_permission(self.required_permission):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail=f"缺少权限: {self.required_permission}"
@@ -101,18 +122,18 @@ class ResourceOwnerChecker:
     def __init__(self, resource_type: str):
         self.resource_type = resource_type
     
-    def __call__(
+    async def __call__(
         self,
         resource_id: int,
-        current_user: User = Depends(get_current_active_user),
-        db: Session = Depends(get_db)
+        current_user: Principal = Depends(get_current_active_user),
+        db: AsyncSession = Depends(get_async_db)
     ):
         """检查用户是否是资源的所有者"""
         try:
             if self.resource_type == "system":
                 from ..services.system_service import SystemService
                 service = SystemService(db)
-                resource = service.get(resource_id)
+                resource = await service.get(resource_id)
                 if not resource or resource.owner_id != current_user.id:
                     raise HTTPException(
                         status_code=status.HTTP_403_FORBIDDEN,
@@ -121,7 +142,7 @@ class ResourceOwnerChecker:
             elif self.resource_type == "process":
                 from ..services.process_service import ProcessService
                 service = ProcessService(db)
-                resource = service.get(resource_id)
+                resource = await service.get(resource_id)
                 if not resource or resource.owner_id != current_user.id:
                     raise HTTPException(
                         status_code=status.HTTP_403_FORBIDDEN,
@@ -130,7 +151,7 @@ class ResourceOwnerChecker:
             elif self.resource_type == "sop":
                 from ..services.sop_service import SOPService
                 service = SOPService(db)
-                resource = service.get(resource_id)
+                resource = await service.get(resource_id)
                 if not resource or resource.author_id != current_user.id:
                     raise HTTPException(
                         status_code=status.HTTP_403_FORBIDDEN,
@@ -139,7 +160,7 @@ class ResourceOwnerChecker:
             elif self.resource_type == "task":
                 from ..services.task_service import TaskService
                 service = TaskService(db)
-                resource = service.get(resource_id)
+                resource = await service.get(resource_id)
                 if not resource or resource.assignee_id != current_user.id:
                     raise HTTPException(
                         status_code=status.HTTP_403_FORBIDDEN,
@@ -187,13 +208,14 @@ require_sop_owner = ResourceOwnerChecker("sop")
 require_task_assignee = ResourceOwnerChecker("task")
 
 
-def verify_token_dependency(
+async def verify_token_dependency(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """验证令牌依赖项（不返回用户，只验证令牌有效性）"""
+    """验证令牌依赖项（不返回用户，只验证令牌有效性；先加载其它进程撤销的令牌）"""
     try:
         auth_service = AuthService(db)
+        await auth_service.load_revoked_tokens()
         auth_service.verify_token(credentials.credentials)
         return True
     except AuthenticationError as e:
@@ -204,39 +226,76 @@ def verify_token_dependency(
         )
 
 
-def get_user_from_token(
+async def get_user_from_token(
     token: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> User:
     """从令牌获取用户（用于内部服务调用）"""
     try:
         auth_service = AuthService(db)
-        user = auth_service.get_current_user(token)
+        user = await auth_service.get_current_user(token)
         return user
     except AuthenticationError as e:
         raise AuthenticationError(str(e))
 
 
+def _apply_rate_limit(result: RateLimitResult, response: Response) -> None:
+    """写入限流响应头，超限时抛出429"""
+    if not result.allowed:
+        raise RateLimitError(headers=result.headers())
+    response.headers.update(result.headers())
+
+
 class APIKeyChecker:
-    """API密钥检查器（用于外部API调用）"""
+    """API密钥检查器（用于外部API调用，按密钥限流）"""
     
     def __init__(self, required_scopes: list = None):
         self.required_scopes = required_scopes or []
     
-    def __call__(self, api_key: str = Depends(security)):
-        # TODO: 实现API密钥验证逻辑
-        # 这里可以添加API密钥的验证逻辑
-        pass
+    async def __call__(self, response: Response, api_key: Optional[str] = Depends(api_key_header)) -> str:
+        """返回密钥标识（摘要前16位）"""
+        if not api_key:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="缺少API密钥"
+            )
+        
+        digest = token_digest(api_key)
+        scopes = API_KEY_SCOPES.get(digest)
+        if scopes is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="无效的API密钥"
+            )
+        missing = [scope for scope in self.required_scopes if scope not in scopes and "*" not in scopes]
+        if missing:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"API密钥缺少权限: {', '.join(missing)}"
+            )
+        
+        key_id = digest[:16]
+        result = await rate_limiter.hit(
+            f"apikey:{key_id}",
+            settings.RATE_LIMIT_API_KEY_REQUESTS,
+            settings.RATE_LIMIT_API_KEY_WINDOW_SECONDS
+        )
+        _apply_rate_limit(result, response)
+        return key_id
 
 
 def rate_limit_checker(max_requests: int = 100, window_seconds: int = 3600):
-    """速率限制检查器"""
-    def checker(
-        current_user: User = Depends(get_current_active_user),
-        # TODO: 添加Redis或其他缓存依赖来实现速率限制
+    """速率限制检查器（按用户，不同限额的检查器使用各自的桶）"""
+    async def checker(
+        response: Response,
+        current_user: Principal = Depends(get_current_active_user)
     ):
-        # TODO: 实现速率限制逻辑
-        # 这里可以添加基于用户的速率限制逻辑
+        result = await rate_limiter.hit(
+            f"user:{current_user.id}:{max_requests}/{window_seconds}",
+            max_requests,
+            window_seconds
+        )
+        _apply_rate_limit(result, response)
         return current_user
     
-    return checker
\ No newline at end of file
+    return checker
@@ -0,0 +1,261 @@
+"""
+速率限制
+
+按令牌桶算法限流：每个键（用户、API密钥或客户端IP）一个桶，容量为窗口内允许的
+请求数，按 容量/窗口 的速率匀速补充。每个活跃键只保存 (令牌数, 更新时间, 补满时间)
+三个数，补满后的桶与新建的桶等价，可以直接淘汰。
+
+存储可替换：
+- memory: 进程内 LRU，单进程部署
+- sqlite: 共享的 SQLite 文件（RATE_LIMIT_DB_PATH），多个 uvicorn 工作进程共用同一组桶
+
+响应带 X-RateLimit-Limit / X-RateLimit-Remaining / X-RateLimit-Reset 头，
+超限时返回 429 和 Retry-After。
+"""
+import asyncio
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import FastAPI
+
+from config.settings import get_app_settings
+from ..utils.responses import APIResponse, ORJSONResponse
+
+settings = get_app_settings()
+
+# 不做IP限流的路径
+RATE_LIMIT_EXEMPT_PATHS = ("/health",)
+
+# SQLite 存储每执行多少次扣减清理一次已补满的桶
+SQLITE_PURGE_INTERVAL = 1000
+
+
+def _take(
+    tokens: float,
+    updated_at: float,
+    capacity: float,
+    rate: float,
+    cost: float,
+    now: float
+) -> Tuple[bool, float]:
+    """补充令牌后尝试扣减，返回 (是否允许, 剩余令牌数)"""
+    tokens = min(capacity, tokens + max(0.0, now - updated_at) * rate)
+    if tokens >= cost:
+        return True, tokens - cost
+    return False, tokens
+
+
+class RateLimitResult:
+    """一次限流判定的结果"""
+
+    __slots__ = ("allowed", "limit", "remaining", "reset_after", "retry_after")
+
+    def __init__(self, allowed: bool, limit: int, tokens: float, rate: float):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = int(tokens)
+        # 桶补满的剩余秒数；被拒绝时为补足一个令牌的秒数
+        self.reset_after = math.ceil((limit - tokens) / rate)
+        self.retry_after = 0 if allowed else max(1, math.ceil((1 - tokens) / rate))
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(self.reset_after),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(self.retry_after)
+        return headers
+
+
+class MemoryRateLimitStore:
+    """进程内令牌桶存储（LRU，线程安全）"""
+
+    blocking = False
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        # 键 -> [令牌数, 更新时间, 补满时间]，按最近访问排序
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key: str, capacity: float, rate: float, cost: float = 1.0) -> Tuple[bool, float]:
+        """扣减令牌，返回 (是否允许, 剩余令牌数)"""
+        now = time.time()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                allowed, tokens = _take(capacity, now, capacity, rate, cost, now)
+            else:
+                allowed, tokens = _take(bucket[0], bucket[1], capacity, rate, cost, now)
+            self._buckets[key] = [tokens, now, now + (capacity - tokens) / rate]
+            self._buckets.move_to_end(key)
+            self._evict(now)
+        return allowed, tokens
+
+    def _evict(self, now: float) -> None:
+        """淘汰最久未访问且已补满的桶，超过键数上限时淘汰最久未访问的桶"""
+        for _ in range(2):
+            if not self._buckets:
+                return
+            key, bucket = next(iter(self._buckets.items()))
+            if bucket[2] > now:
+                break
+            del self._buckets[key]
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class SQLiteRateLimitStore:
+    """共享 SQLite 文件的令牌桶存储（多工作进程共用）"""
+
+    blocking = True
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._calls = 0
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_buckets ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL, full_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_rate_limit_buckets_full_at ON rate_limit_buckets (full_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        """每个线程一个连接（自动提交模式，事务显式开启）"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def consume(self, key: str, capacity: float, rate: float, cost: float = 1.0) -> Tuple[bool, float]:
+        """扣减令牌，返回 (是否允许, 剩余令牌数)"""
+        conn = self._connect()
+        now = time.time()
+        # BEGIN IMMEDIATE 取得写锁，读-改-写在进程间原子执行
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens, updated_at = row if row else (capacity, now)
+            allowed, tokens = _take(tokens, updated_at, capacity, rate, cost, now)
+            conn.execute(
+                "INSERT INTO rate_limit_buckets (key, tokens, updated_at, full_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, "
+                "updated_at = excluded.updated_at, full_at = excluded.full_at",
+                (key, tokens, now, now + (capacity - tokens) / rate)
+            )
+            self._calls += 1
+            if self._calls % SQLITE_PURGE_INTERVAL == 0:
+                conn.execute("DELETE FROM rate_limit_buckets WHERE full_at <= ?", (now,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, tokens
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM rate_limit_buckets").fetchone()[0]
+
+
+class RateLimiter:
+    """速率限制器"""
+
+    def __init__(self, store):
+        self.store = store
+
+    async def hit(self, key: str, max_requests: int, window_seconds: float, cost: float = 1.0) -> RateLimitResult:
+        """
+        记录一次请求
+
+        Args:
+            key: 限流键，如 user:1、apikey:<摘要>、ip:127.0.0.1
+            max_requests: 窗口内允许的请求数（桶容量）
+            window_seconds: 窗口秒数（空桶补满所需时间）
+            cost: 本次请求消耗的令牌数
+
+        Returns:
+            限流判定结果
+        """
+        rate = max_requests / window_seconds
+        if self.store.blocking:
+            allowed, tokens = await asyncio.to_thread(self.store.consume, key, max_requests, rate, cost)
+        else:
+            allowed, tokens = self.store.consume(key, max_requests, rate, cost)
+        return RateLimitResult(allowed, max_requests, tokens, rate)
+
+
+def create_rate_limit_store():
+    """按配置创建限流存储"""
+    if settings.RATE_LIMIT_STORE == "sqlite":
+        return SQLiteRateLimitStore(Path(settings.RATE_LIMIT_DB_PATH))
+    return MemoryRateLimitStore(settings.RATE_LIMIT_MAX_KEYS)
+
+
+rate_limiter = RateLimiter(create_rate_limit_store())
+
+
+def client_ip(scope) -> str:
+    """客户端IP（不信任 X-Forwarded-For，反向代理部署时由代理限流）"""
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class RateLimitMiddleware:
+    """按客户端IP限流的ASGI中间件（未设置限流头的响应补上IP桶的限流头）"""
+
+    def __init__(self, app, limiter: Optional[RateLimiter] = None):
+        self.app = app
+        self.limiter = limiter or rate_limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in RATE_LIMIT_EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        result = await self.limiter.hit(
+            f"ip:{client_ip(scope)}",
+            settings.RATE_LIMIT_IP_REQUESTS,
+            settings.RATE_LIMIT_IP_WINDOW_SECONDS
+        )
+        if not result.allowed:
+            response = ORJSONResponse(
+                status_code=429,
+                content=APIResponse.error(message="请求频率过高", error_code="RATE_LIMIT_ERROR"),
+                headers=result.headers()
+            )
+            await response(scope, receive, send)
+            return
+
+        rate_headers = [(name.lower().encode(), value.encode()) for name, value in result.headers().items()]
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                present = {name.lower() for name, _ in headers}
+                headers.extend(item for item in rate_headers if item[0] not in present)
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+def setup_rate_limit(app: FastAPI) -> None:
+    """设置IP限流中间件"""
+    if settings.RATE_LIMIT_ENABLED:
+        app.add_middleware(RateLimitMiddleware)
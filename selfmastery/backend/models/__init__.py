@@ -6,10 +6,10 @@
 from .base import BaseModel, TimestampMixin, SoftDeleteMixin
 
 # 导入用户相关模型
-from .user import User
+from .user import User, RevokedToken
 
 # 导入业务系统相关模型
-from .system import BusinessSystem
+from .system import BusinessSystem, ensure_system_hierarchy, rebuild_system_paths
 
 # 导入流程相关模型
 from .process import (
@@ -35,9 +35,13 @@ from .sop import (
 from .kpi import (
     KPI,
     KPIData,
+    KPIRollup,
     KPIAlert,
+    KPIAlertLease,
     KPIDashboard,
-    KPITarget
+    KPITarget,
+    KPIReportJob,
+    ensure_kpi_latest_columns
 )
 
 # 导入任务相关模型
@@ -49,6 +53,14 @@ from .task import (
     Notification
 )
 
+# 导入全文搜索索引定义（注册 create_all 时的建索引钩子）
+from .search import (
+    SEARCH_INDEXES,
+    SearchIndexSpec,
+    ensure_search_index,
+    rebuild_search_index
+)
+
 # 导出所有模型类
 __all__ = [
     # 基础模型
@@ -58,9 +70,12 @@ __all__ = [
     
     # 用户相关
     'User',
+    'RevokedToken',
     
     # 业务系统相关
     'BusinessSystem',
+    'ensure_system_hierarchy',
+    'rebuild_system_paths',
     
     # 流程相关
     'BusinessProcess',
@@ -81,9 +96,13 @@ __all__ = [
     # KPI相关
     'KPI',
     'KPIData',
+    'KPIRollup',
     'KPIAlert',
+    'KPIAlertLease',
     'KPIDashboard',
     'KPITarget',
+    'KPIReportJob',
+    'ensure_kpi_latest_columns',
     
     # 任务相关
     'Task',
@@ -91,4 +110,10 @@ __all__ = [
     'TaskAttachment',
     'TaskTimeLog',
     'Notification',
+    
+    # 全文搜索索引
+    'SEARCH_INDEXES',
+    'SearchIndexSpec',
+    'ensure_search_index',
+    'rebuild_search_index',
 ]
\ No newline at end of file
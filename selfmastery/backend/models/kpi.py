@@ -1,8 +1,10 @@
 """
 KPI相关数据模型
 """
-from sqlalchemy import Column, String, Text, Integer, Float, Boolean, ForeignKey, DateTime, Index
+from datetime import datetime
+from sqlalchemy import Column, String, Text, Integer, Float, Boolean, ForeignKey, DateTime, Index, UniqueConstraint, event, text
 from sqlalchemy.orm import relationship
+from selfmastery.config.database import Base
 from .base import BaseModel
 
 
@@ -48,6 +50,11 @@ class KPI(BaseModel):
         comment="当前值"
     )
     
+    latest_recorded_at = Column(
+        DateTime,
+        comment="最新数据点的记录时间（写入数据点时与 current_value 一起更新）"
+    )
+    
     unit = Column(
         String(50),
         comment="单位"
@@ -112,9 +119,7 @@ class KPI(BaseModel):
     
     @property
     def latest_value(self) -> Float:
-        """获取最新数据值"""
-        if self.data_points:
-            return self.data_points[0].value
+        """获取最新数据值（读取KPI行上缓存的最新值，不加载历史数据）"""
         return self.current_value
     
     @property
@@ -143,17 +148,27 @@ class KPI(BaseModel):
         
         return "normal"
     
-    def add_data_point(self, value: float, source: str = None, notes: str = None) -> 'KPIData':
+    def add_data_point(
+        self,
+        value: float,
+        source: str = None,
+        notes: str = None,
+        recorded_at: datetime = None
+    ) -> 'KPIData':
         """添加数据点"""
+        recorded_at = recorded_at or datetime.utcnow()
         data_point = KPIData(
             kpi_id=self.id,
             value=value,
+            recorded_at=recorded_at,
             source=source,
             notes=notes
         )
         
-        # 更新当前值
-        self.current_value = value
+        # 只有更新的数据点才更新当前值（补录的历史数据不影响）
+        if self.latest_recorded_at is None or recorded_at >= self.latest_recorded_at:
+            self.current_value = value
+            self.latest_recorded_at = recorded_at
         
         return data_point
 
@@ -202,6 +217,81 @@ class KPIData(BaseModel):
         return f"<KPIData(id={self.id}, kpi_id={self.kpi_id}, value={self.value})>"
 
 
+class KPIRollup(BaseModel):
+    """KPI数据汇总表（按小时/天/月分桶，写入数据点时增量维护）"""
+    
+    __tablename__ = "kpi_rollups"
+    
+    kpi_id = Column(
+        Integer,
+        ForeignKey("kpis.id"),
+        nullable=False,
+        comment="KPI ID"
+    )
+    
+    resolution = Column(
+        String(10),
+        nullable=False,
+        comment="汇总粒度: hour, day, month"
+    )
+    
+    bucket_start = Column(
+        DateTime,
+        nullable=False,
+        comment="时间桶起始时间"
+    )
+    
+    count = Column(
+        Integer,
+        nullable=False,
+        default=0,
+        comment="数据点数量"
+    )
+    
+    sum = Column(
+        Float,
+        nullable=False,
+        default=0.0,
+        comment="数据值之和"
+    )
+    
+    min = Column(
+        Float,
+        comment="最小值"
+    )
+    
+    max = Column(
+        Float,
+        comment="最大值"
+    )
+    
+    last_value = Column(
+        Float,
+        comment="桶内最后一个数据值"
+    )
+    
+    last_recorded_at = Column(
+        DateTime,
+        comment="桶内最后一个数据点的记录时间"
+    )
+    
+    # 关系定义
+    kpi = relationship("KPI")
+    
+    # 唯一约束
+    __table_args__ = (
+        UniqueConstraint('kpi_id', 'resolution', 'bucket_start', name='uq_kpi_rollup_bucket'),
+    )
+    
+    def __repr__(self):
+        return f"<KPIRollup(kpi_id={self.kpi_id}, resolution='{self.resolution}', bucket={self.bucket_start})>"
+    
+    @property
+    def avg(self) -> float:
+        """平均值"""
+        return self.sum / self.count if self.count else None
+
+
 class KPIAlert(BaseModel):
     """KPI预警表"""
     
@@ -264,6 +354,34 @@ class KPIAlert(BaseModel):
         return f"<KPIAlert(id={self.id}, kpi_id={self.kpi_id}, severity='{self.severity}')>"
 
 
+class KPIAlertLease(BaseModel):
+    """KPI预警后台任务租约表（多工作进程中只有持有租约的进程执行评估）"""
+
+    __tablename__ = "kpi_alert_leases"
+
+    name = Column(
+        String(50),
+        unique=True,
+        nullable=False,
+        comment="租约名称"
+    )
+
+    holder = Column(
+        String(100),
+        nullable=False,
+        comment="持有者（主机名:进程ID）"
+    )
+
+    expires_at = Column(
+        DateTime,
+        nullable=False,
+        comment="租约到期时间（之后其它进程可接管）"
+    )
+
+    def __repr__(self):
+        return f"<KPIAlertLease(name='{self.name}', holder='{self.holder}', expires_at={self.expires_at})>"
+
+
 class KPIDashboard(BaseModel):
     """KPI仪表盘表"""
     
@@ -370,6 +488,102 @@ class KPITarget(BaseModel):
         return f"<KPITarget(id={self.id}, kpi_id={self.kpi_id}, period='{self.target_period}')>"
 
 
+class KPIReportJob(BaseModel):
+    """KPI报告生成任务表"""
+    
+    __tablename__ = "kpi_report_jobs"
+    
+    requested_by = Column(
+        Integer,
+        ForeignKey("users.id"),
+        nullable=False,
+        comment="请求人ID"
+    )
+    
+    title = Column(
+        String(200),
+        nullable=False,
+        comment="报告标题"
+    )
+    
+    report_type = Column(
+        String(20),
+        nullable=False,
+        comment="报告类型: summary, detailed, trend, comparison"
+    )
+    
+    format = Column(
+        String(20),
+        nullable=False,
+        comment="输出格式: json, html, excel"
+    )
+    
+    period_start = Column(
+        DateTime,
+        nullable=False,
+        comment="报告周期开始"
+    )
+    
+    period_end = Column(
+        DateTime,
+        nullable=False,
+        comment="报告周期结束（含）"
+    )
+    
+    kpi_ids = Column(
+        Text,
+        nullable=False,
+        comment="KPI ID列表（JSON格式）"
+    )
+    
+    status = Column(
+        String(20),
+        default="pending",
+        nullable=False,
+        comment="状态: pending, running, completed, failed"
+    )
+    
+    progress = Column(
+        Float,
+        default=0.0,
+        nullable=False,
+        comment="进度（0-1）"
+    )
+    
+    rows_written = Column(
+        Integer,
+        default=0,
+        nullable=False,
+        comment="已写入行数"
+    )
+    
+    file_path = Column(
+        String(500),
+        comment="报告文件路径"
+    )
+    
+    error_message = Column(
+        Text,
+        comment="失败原因"
+    )
+    
+    started_at = Column(
+        DateTime,
+        comment="开始时间"
+    )
+    
+    finished_at = Column(
+        DateTime,
+        comment="结束时间"
+    )
+    
+    # 关系定义
+    requester = relationship("User")
+    
+    def __repr__(self):
+        return f"<KPIReportJob(id={self.id}, type='{self.report_type}', status='{self.status}')>"
+
+
 # 创建索引
 Index('idx_kpis_process', KPI.process_id)
 Index('idx_kpis_active', KPI.is_active)
@@ -383,6 +597,7 @@ Index('idx_kpi_data_kpi_time', KPIData.kpi_id, KPIData.recorded_at)
 Index('idx_kpi_alerts_kpi', KPIAlert.kpi_id)
 Index('idx_kpi_alerts_severity', KPIAlert.severity)
 Index('idx_kpi_alerts_acknowledged', KPIAlert.is_acknowledged)
+Index('idx_kpi_alerts_kpi_type', KPIAlert.kpi_id, KPIAlert.alert_type)
 
 Index('idx_kpi_dashboards_owner', KPIDashboard.owner_id)
 Index('idx_kpi_dashboards_public', KPIDashboard.is_public)
@@ -390,4 +605,39 @@ Index('idx_kpi_dashboards_public', KPIDashboard.is_public)
 Index('idx_kpi_targets_kpi', KPITarget.kpi_id)
 Index('idx_kpi_targets_period', KPITarget.target_period)
 Index('idx_kpi_targets_active', KPITarget.is_active)
-Index('idx_kpi_targets_dates', KPITarget.start_date, KPITarget.end_date)
\ No newline at end of file
+Index('idx_kpi_targets_dates', KPITarget.start_date, KPITarget.end_date)
+
+Index('idx_kpi_report_jobs_requester', KPIReportJob.requested_by)
+
+
+def ensure_kpi_latest_columns(connection) -> None:
+    """
+    为旧数据库补齐 kpis.latest_recorded_at 列（幂等）
+    
+    新增列后按 idx_kpi_data_kpi_time 索引回填每个KPI的最新数据点。
+    
+    Args:
+        connection: 数据库连接
+    """
+    if connection.dialect.name != "sqlite":
+        return
+    
+    columns = {row[1] for row in connection.execute(text("PRAGMA table_info(kpis)"))}
+    if not columns or "latest_recorded_at" in columns:
+        return
+    connection.execute(text("ALTER TABLE kpis ADD COLUMN latest_recorded_at DATETIME"))
+    latest = (
+        "SELECT {column} FROM kpi_data WHERE kpi_data.kpi_id = kpis.id AND kpi_data.is_deleted = 0 "
+        "ORDER BY kpi_data.recorded_at DESC, kpi_data.id DESC LIMIT 1"
+    )
+    connection.execute(text(
+        f"UPDATE kpis SET current_value = ({latest.format(column='value')}), "
+        f"latest_recorded_at = ({latest.format(column='recorded_at')}) "
+        "WHERE EXISTS (SELECT 1 FROM kpi_data WHERE kpi_data.kpi_id = kpis.id AND kpi_data.is_deleted = 0)"
+    ))
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_kpi_latest_columns(target, connection, **kw):
+    """create_all 完成后补齐KPI最新值缓存列"""
+    ensure_kpi_latest_columns(connection)
@@ -142,11 +142,6 @@ class BusinessProcess(BaseModel):
     def __repr__(self):
         return f"<BusinessProcess(id={self.id}, name='{self.name}')>"
     
-    @property
-    def full_name(self) -> str:
-        """获取完整名称（包含系统路径）"""
-        return f"{self.system.full_path} > {self.name}"
-    
     def get_next_processes(self) -> list:
         """获取下一步流程"""
         return [conn.to_process for conn in self.outgoing_connections]
@@ -0,0 +1,128 @@
+"""
+全文搜索索引（SQLite FTS5）
+
+为业务系统、业务流程、SOP和任务建立外部内容（external content）FTS5索引，
+由触发器在写入时同步维护，因此批量写入和直接执行的SQL语句同样会更新索引。
+使用 trigram 分词器，中文名称和SOP正文无需分词即可按子串匹配。
+非SQLite数据库不创建索引，搜索服务会退回到 LIKE 查询。
+"""
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection
+
+from selfmastery.config.database import Base
+
+
+@dataclass(frozen=True)
+class SearchIndexSpec:
+    """单个实体的全文索引定义"""
+
+    entity_type: str
+    table: str
+    title_column: str
+    columns: Tuple[str, ...]
+    # BM25 列权重，与 columns 一一对应（标题命中的权重高于正文）
+    weights: Tuple[float, ...]
+
+    @property
+    def fts_table(self) -> str:
+        """FTS5虚拟表名"""
+        return f"{self.table}_fts"
+
+
+SEARCH_INDEXES: Dict[str, SearchIndexSpec] = {
+    spec.entity_type: spec
+    for spec in (
+        SearchIndexSpec("system", "business_systems", "name", ("name", "description"), (10.0, 1.0)),
+        SearchIndexSpec("process", "business_processes", "name", ("name", "description"), (10.0, 1.0)),
+        SearchIndexSpec("sop", "sops", "title", ("title", "content"), (10.0, 1.0)),
+        SearchIndexSpec("task", "tasks", "title", ("title", "description", "tags"), (10.0, 1.0, 2.0)),
+    )
+}
+
+
+def _index_ddl(spec: SearchIndexSpec) -> Tuple[str, ...]:
+    """生成FTS5虚拟表及同步触发器的DDL"""
+    fts = spec.fts_table
+    cols = ", ".join(spec.columns)
+    new_values = ", ".join(f"new.{col}" for col in spec.columns)
+    old_values = ", ".join(f"old.{col}" for col in spec.columns)
+    delete_old = (
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values});"
+    )
+    insert_new = f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values});"
+    return (
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{cols}, content='{spec.table}', content_rowid='id', tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {spec.table} BEGIN "
+        f"{insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {spec.table} BEGIN "
+        f"{delete_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {spec.table} BEGIN "
+        f"{delete_old} {insert_new} END",
+    )
+
+
+def search_index_available(connection: Connection) -> bool:
+    """当前连接是否支持FTS5全文索引"""
+    return connection.dialect.name == "sqlite"
+
+
+def ensure_search_index(connection: Connection) -> None:
+    """
+    创建全文索引及同步触发器（幂等）
+
+    新建的索引会立即从业务表重建，已有数据库升级后也能直接搜索到历史数据。
+
+    Args:
+        connection: 数据库连接
+    """
+    if not search_index_available(connection):
+        return
+
+    for spec in SEARCH_INDEXES.values():
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": spec.fts_table}
+        ).first()
+        for ddl in _index_ddl(spec):
+            connection.execute(text(ddl))
+        if not exists:
+            connection.execute(
+                text(f"INSERT INTO {spec.fts_table}({spec.fts_table}) VALUES ('rebuild')")
+            )
+
+
+def rebuild_search_index(connection: Connection) -> None:
+    """
+    从业务表完整重建全文索引
+
+    Args:
+        connection: 数据库连接
+    """
+    if not search_index_available(connection):
+        return
+
+    ensure_search_index(connection)
+    for spec in SEARCH_INDEXES.values():
+        connection.execute(
+            text(f"INSERT INTO {spec.fts_table}({spec.fts_table}) VALUES ('rebuild')")
+        )
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_search_index(target, connection, **kw):
+    """create_all 完成后创建全文索引"""
+    ensure_search_index(connection)
+
+
+@event.listens_for(Base.metadata, "before_drop")
+def _drop_search_index(target, connection, **kw):
+    """drop_all 前删除全文索引（触发器随业务表一起删除）"""
+    if not search_index_available(connection):
+        return
+
+    for spec in SEARCH_INDEXES.values():
+        connection.execute(text(f"DROP TABLE IF EXISTS {spec.fts_table}"))
@@ -1,10 +1,15 @@
 """
 业务系统相关数据模型
 """
-from sqlalchemy import Column, String, Text, Integer, Float, Boolean, ForeignKey, Index
+from sqlalchemy import Column, String, Text, Integer, Float, Boolean, ForeignKey, Index, event, text
 from sqlalchemy.orm import relationship
+from selfmastery.config.database import Base
 from .base import BaseModel
 
+# 物化路径的排序上界后缀：路径只包含数字和"/"，均小于"~"，
+# 因此 path >= P AND path < P || '~' 恰好选中以 P 为前缀的所有路径，且可以使用索引
+PATH_UPPER_BOUND_SUFFIX = "~"
+
 
 class BusinessSystem(BaseModel):
     """业务系统表"""
@@ -64,6 +69,18 @@ class BusinessSystem(BaseModel):
         comment="是否激活"
     )
     
+    # 层级信息（SQLite 由数据库触发器维护，其它数据库由 SystemService 在插入和调整父系统时维护）
+    path = Column(
+        String(1000),
+        comment="物化路径，如 /1/4/9/（祖先ID依次排列，以自身ID结尾）"
+    )
+    
+    depth = Column(
+        Integer,
+        default=0,
+        comment="层级深度，根系统为0"
+    )
+    
     # 关系定义
     owner = relationship(
         "User",
@@ -93,37 +110,120 @@ class BusinessSystem(BaseModel):
         return f"<BusinessSystem(id={self.id}, name='{self.name}')>"
     
     @property
-    def full_path(self) -> str:
-        """获取完整路径"""
-        if self.parent:
-            return f"{self.parent.full_path} > {self.name}"
-        return self.name
+    def ancestor_ids(self) -> list:
+        """按从根到父的顺序返回祖先ID"""
+        if not self.path:
+            return []
+        return [int(part) for part in self.path.strip("/").split("/")[:-1]]
+    
+    def subtree_clause(self, include_self: bool = True):
+        """子树查询条件（基于物化路径的索引范围扫描）"""
+        clause = (
+            (BusinessSystem.path >= self.path)
+            & (BusinessSystem.path < self.path + PATH_UPPER_BOUND_SUFFIX)
+        )
+        if not include_self:
+            clause = clause & (BusinessSystem.id != self.id)
+        return clause
     
     @property
     def level(self) -> int:
         """获取层级深度"""
-        if self.parent:
-            return self.parent.level + 1
-        return 0
-    
-    def get_all_children(self) -> list:
-        """获取所有子系统（递归）"""
-        result = []
-        for child in self.children:
-            result.append(child)
-            result.extend(child.get_all_children())
-        return result
-    
-    def get_process_count(self) -> int:
-        """获取流程数量（包含子系统）"""
-        count = len(self.processes)
-        for child in self.children:
-            count += child.get_process_count()
-        return count
+        return self.depth or 0
+    
+    # 完整路径名称、全部子系统和包含子系统的流程数需要查询数据库，
+    # 见 SystemService.get_system_path / get_subtree / get_process_count
 
 
 # 创建索引
 Index('idx_business_systems_owner', BusinessSystem.owner_id)
 Index('idx_business_systems_parent', BusinessSystem.parent_id)
 Index('idx_business_systems_active', BusinessSystem.is_active)
-Index('idx_business_systems_name', BusinessSystem.name)
\ No newline at end of file
+Index('idx_business_systems_name', BusinessSystem.name)
+Index('idx_business_systems_path', BusinessSystem.path)
+
+
+def _hierarchy_ddl() -> tuple:
+    """生成维护物化路径的触发器DDL（SQLite）"""
+    parent_path = "(SELECT p.path FROM business_systems p WHERE p.id = new.parent_id)"
+    parent_depth = "(SELECT p.depth + 1 FROM business_systems p WHERE p.id = new.parent_id)"
+    return (
+        # 新建系统：路径 = 父路径 + 自身ID
+        "CREATE TRIGGER IF NOT EXISTS business_systems_path_ai "
+        "AFTER INSERT ON business_systems BEGIN "
+        f"UPDATE business_systems SET path = coalesce({parent_path}, '/') || new.id || '/', "
+        f"depth = coalesce({parent_depth}, 0) WHERE id = new.id; END",
+        # 禁止移动到自身或子系统下
+        "CREATE TRIGGER IF NOT EXISTS business_systems_path_bu "
+        "BEFORE UPDATE OF parent_id ON business_systems "
+        f"WHEN new.parent_id IS NOT NULL AND {parent_path} >= old.path "
+        f"AND {parent_path} < old.path || '{PATH_UPPER_BOUND_SUFFIX}' BEGIN "
+        "SELECT RAISE(ABORT, '不能将系统移动到自身或其子系统下'); END",
+        # 调整父系统：一次UPDATE改写整棵子树的路径前缀和深度
+        "CREATE TRIGGER IF NOT EXISTS business_systems_path_au "
+        "AFTER UPDATE OF parent_id ON business_systems "
+        "WHEN new.parent_id IS NOT old.parent_id BEGIN "
+        f"UPDATE business_systems SET "
+        f"path = coalesce({parent_path}, '/') || new.id || '/' || substr(path, length(old.path) + 1), "
+        f"depth = depth - old.depth + coalesce({parent_depth}, 0) "
+        f"WHERE path >= old.path AND path < old.path || '{PATH_UPPER_BOUND_SUFFIX}'; END",
+    )
+
+
+def rebuild_system_paths(connection) -> None:
+    """
+    通过递归CTE从 parent_id 重新计算所有业务系统的物化路径和深度
+    
+    Args:
+        connection: 数据库连接
+    """
+    connection.execute(text(
+        "WITH RECURSIVE tree(id, path, depth) AS ("
+        "SELECT id, '/' || id || '/', 0 FROM business_systems WHERE parent_id IS NULL "
+        "UNION ALL "
+        "SELECT c.id, tree.path || c.id || '/', tree.depth + 1 "
+        "FROM business_systems c JOIN tree ON c.parent_id = tree.id) "
+        "UPDATE business_systems SET "
+        "path = (SELECT tree.path FROM tree WHERE tree.id = business_systems.id), "
+        "depth = (SELECT tree.depth FROM tree WHERE tree.id = business_systems.id)"
+    ))
+
+
+def ensure_system_hierarchy(connection) -> None:
+    """
+    创建层级维护触发器（幂等）
+    
+    旧数据库缺少 path/depth 列时先补齐列和索引，再从 parent_id 回填。
+    其它数据库没有触发器，层级由 SystemService 维护，这里只回填路径为空的旧数据。
+    
+    Args:
+        connection: 数据库连接
+    """
+    if connection.dialect.name != "sqlite":
+        missing = connection.execute(text(
+            "SELECT 1 FROM business_systems WHERE path IS NULL LIMIT 1"
+        )).first()
+        if missing:
+            rebuild_system_paths(connection)
+        return
+    
+    columns = {row[1] for row in connection.execute(text("PRAGMA table_info(business_systems)"))}
+    if not columns:
+        return
+    backfill = "path" not in columns
+    if backfill:
+        connection.execute(text("ALTER TABLE business_systems ADD COLUMN path VARCHAR(1000)"))
+        connection.execute(text("ALTER TABLE business_systems ADD COLUMN depth INTEGER DEFAULT 0"))
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS idx_business_systems_path ON business_systems (path)"
+        ))
+    for ddl in _hierarchy_ddl():
+        connection.execute(text(ddl))
+    if backfill:
+        rebuild_system_paths(connection)
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_system_hierarchy(target, connection, **kw):
+    """create_all 完成后创建层级维护触发器"""
+    ensure_system_hierarchy(connection)
@@ -1,7 +1,7 @@
 """
 用户相关数据模型
 """
-from sqlalchemy import Column, String, Boolean, Index
+from sqlalchemy import Column, String, Boolean, Integer, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from .base import BaseModel
 
@@ -108,7 +108,43 @@ class User(BaseModel):
         return f"<User(id={self.id}, name='{self.name}', email='{self.email}')>"
 
 
+class RevokedToken(BaseModel):
+    """已撤销令牌表（登出后令牌在过期前不再可用）"""
+    
+    __tablename__ = "revoked_tokens"
+    
+    token_digest = Column(
+        String(64),
+        unique=True,
+        nullable=False,
+        comment="令牌SHA-256摘要"
+    )
+    
+    user_id = Column(
+        Integer,
+        ForeignKey("users.id"),
+        nullable=False,
+        comment="用户ID"
+    )
+    
+    token_type = Column(
+        String(20),
+        nullable=False,
+        comment="令牌类型: access, refresh"
+    )
+    
+    expires_at = Column(
+        DateTime,
+        nullable=False,
+        comment="令牌过期时间（之后记录可清理）"
+    )
+    
+    def __repr__(self):
+        return f"<RevokedToken(id={self.id}, user_id={self.user_id}, type='{self.token_type}')>"
+
+
 # 创建索引
 Index('idx_users_email', User.email)
 Index('idx_users_role', User.role)
-Index('idx_users_active', User.is_active)
\ No newline at end of file
+Index('idx_users_active', User.is_active)
+Index('idx_revoked_tokens_expires', RevokedToken.expires_at)
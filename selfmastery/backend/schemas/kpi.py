@@ -3,7 +3,7 @@ KPI相关数据模式
 """
 from typing import Optional, List, Dict, Any, Union
 from pydantic import BaseModel, validator
-from datetime import datetime, date
+from datetime import datetime, date, timezone
 from decimal import Decimal
 
 
@@ -105,7 +105,22 @@ class KPIDataBase(BaseModel):
 
 class KPIDataCreate(KPIDataBase):
     """KPI数据创建模式"""
+    period_start: Optional[date] = None
+    period_end: Optional[date] = None
     kpi_id: int
+    recorded_at: Optional[datetime] = None
+
+    @validator('recorded_at', always=True)
+    def validate_recorded_at(cls, v, values):
+        if v is not None:
+            # 带时区的时间转为UTC后去掉时区，与库中不带时区的UTC时间可以比较
+            if v.tzinfo is not None:
+                v = v.astimezone(timezone.utc).replace(tzinfo=None)
+            return v
+        period_end = values.get('period_end')
+        if period_end is None:
+            raise ValueError('必须提供 recorded_at 或 period_end')
+        return datetime.combine(period_end, datetime.min.time())
 
 
 class KPIDataUpdate(BaseModel):
@@ -247,6 +262,8 @@ class KPIAnalytics(BaseModel):
     trend_direction: Optional[str] = None
     volatility: Optional[float] = None
     achievement_rate: Optional[float] = None
+    resolution: Optional[str] = None
+    data_points: int = 0
 
 
 class KPIComparison(BaseModel):
@@ -271,7 +288,7 @@ class KPIReport(BaseModel):
     period_end: date
     kpi_ids: List[int]
     report_type: str = "summary"
-    format: str = "pdf"
+    format: str = "json"
 
     @validator('report_type')
     def validate_report_type(cls, v):
@@ -282,12 +299,32 @@ class KPIReport(BaseModel):
 
     @validator('format')
     def validate_format(cls, v):
-        allowed_formats = ['pdf', 'excel', 'html', 'json']
+        allowed_formats = ['json', 'html', 'excel']
         if v not in allowed_formats:
             raise ValueError(f'格式必须是以下之一: {", ".join(allowed_formats)}')
         return v
 
 
+class KPIReportJobResponse(BaseModel):
+    """KPI报告任务响应模式"""
+    id: int
+    title: str
+    report_type: str
+    format: str
+    period_start: datetime
+    period_end: datetime
+    status: str
+    progress: float
+    rows_written: int
+    error_message: Optional[str] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
 class KPIList(BaseModel):
     """KPI列表模式"""
     items: List[KPIResponse]
@@ -13,6 +13,7 @@ class BusinessSystemBase(BaseModel):
     industry: Optional[str] = None
     company_size: Optional[str] = None
     status: str = "active"
+    parent_id: Optional[int] = None
 
     @validator('status')
     def validate_status(cls, v):
@@ -42,6 +43,7 @@ class BusinessSystemUpdate(BaseModel):
     industry: Optional[str] = None
     company_size: Optional[str] = None
     status: Optional[str] = None
+    parent_id: Optional[int] = None
 
     @validator('status')
     def validate_status(cls, v):
@@ -64,6 +66,8 @@ class BusinessSystemResponse(BusinessSystemBase):
     """业务系统响应模式"""
     id: int
     owner_id: int
+    path: Optional[str] = None
+    depth: int = 0
     created_at: datetime
     updated_at: datetime
 
@@ -1,14 +1,19 @@
 """
 认证服务
 """
+import hashlib
+import secrets
+import threading
+import time
 import jwt
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from typing import Optional, Dict, Any, Tuple
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
 
-from ..models.user import User
+from ..models.user import User, RevokedToken
 from ..schemas.user import UserCreate, UserLogin, Token, TokenData
 from ..utils.exceptions import (
     AuthenticationError,
@@ -18,34 +23,115 @@ from ..utils.exceptions import (
     InvalidTokenError,
     DatabaseError
 )
-from .base_service import BaseService
+from .base_service import AsyncBaseService
+from .principal_service import Principal, load_principal
+from .password_hasher import password_hasher
+from .cache_versions import table_versions
 from config.settings import get_app_settings
 from ..utils.monitoring import set_user_context
 
 settings = get_app_settings()
 
-# 密码加密上下文
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+def token_digest(token: str) -> str:
+    """令牌的SHA-256摘要（缓存和撤销记录都不保存令牌原文）"""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
 
 
-class AuthService(BaseService[User]):
+class TokenCache:
+    """
+    已验证令牌的声明缓存（LRU，线程安全）
+
+    客户端轮询时反复携带同一令牌，命中缓存即可跳过签名校验和解码；
+    条目在令牌的 exp 时刻过期。
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+            return entry[1]
+
+    def put(self, digest: str, payload: Dict[str, Any]) -> None:
+        if self.max_size <= 0 or "exp" not in payload:
+            return
+        with self._lock:
+            self._entries[digest] = (float(payload["exp"]), payload)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, digest: str) -> None:
+        with self._lock:
+            self._entries.pop(digest, None)
+
+
+class TokenRevocationList:
+    """
+    已撤销令牌摘要（进程内副本，持久化在 revoked_tokens 表中）
+
+    首次使用时从数据库加载未过期的撤销记录；之后本进程的撤销立即生效，
+    其它工作进程的撤销在 revoked_tokens 表版本变化后重新加载。
+    """
+
+    def __init__(self):
+        self._revoked: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.loaded = False
+        # 加载时的 revoked_tokens 表版本
+        self.version: Optional[int] = None
+
+    def is_revoked(self, digest: str) -> bool:
+        return digest in self._revoked
+
+    def add(self, digest: str, expires_at: float) -> None:
+        with self._lock:
+            self._revoked[digest] = expires_at
+            self._purge_expired()
+
+    def replace(self, entries: Dict[str, float], version: Optional[int] = None) -> None:
+        with self._lock:
+            self._revoked = dict(entries)
+            self.loaded = True
+            self.version = version
+
+    def _purge_expired(self) -> None:
+        now = time.time()
+        for digest in [digest for digest, expires_at in self._revoked.items() if expires_at <= now]:
+            del self._revoked[digest]
+
+
+token_cache = TokenCache(settings.TOKEN_CACHE_SIZE)
+token_revocations = TokenRevocationList()
+
+
+class AuthService(AsyncBaseService[User]):
     """认证服务类"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         super().__init__(User, db)
     
-    def verify_password(self, plain_password: str, hashed_password: str) -> bool:
-        """验证密码"""
-        return pwd_context.verify(plain_password, hashed_password)
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        """验证密码（在专用线程池中执行，不阻塞事件循环）"""
+        return await password_hasher.verify(plain_password, hashed_password)
     
-    def get_password_hash(self, password: str) -> str:
-        """获取密码哈希"""
-        return pwd_context.hash(password)
+    async def get_password_hash(self, password: str) -> str:
+        """获取密码哈希（在专用线程池中执行，不阻塞事件循环）"""
+        return await password_hasher.hash(password)
     
-    def authenticate_user(self, email: str, password: str) -> Optional[User]:
+    async def authenticate_user(self, email: str, password: str) -> Optional[User]:
         """用户认证"""
         try:
-            user = self.get_by_field("email", email)
+            user = await self.get_by_field("email", email)
             if not user:
                 return None
             
@@ -55,7 +141,7 @@ class AuthService(BaseService[User]):
             if not user.password_hash:
                 return None
             
-            if not self.verify_password(password, user.password_hash):
+            if not await self.verify_password(password, user.password_hash):
                 return None
             
             return user
@@ -70,7 +156,8 @@ class AuthService(BaseService[User]):
         else:
             expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
         
-        to_encode.update({"exp": expire, "type": "access"})
+        # jti 保证同一秒内签发的令牌也互不相同（撤销按令牌摘要进行）
+        to_encode.update({"exp": expire, "type": "access", "jti": secrets.token_hex(8)})
         encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
         return encoded_jwt
     
@@ -82,14 +169,92 @@ class AuthService(BaseService[User]):
         else:
             expire = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
         
-        to_encode.update({"exp": expire, "type": "refresh"})
+        # jti 保证同一秒内签发的令牌也互不相同（撤销按令牌摘要进行）
+        to_encode.update({"exp": expire, "type": "refresh", "jti": secrets.token_hex(8)})
         encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
         return encoded_jwt
     
+    def _decode_token(self, token: str) -> Dict[str, Any]:
+        """
+        校验签名并解码令牌（已验证的令牌缓存到过期为止）
+        
+        Raises:
+            InvalidTokenError: 令牌无效或已被撤销
+            TokenExpiredError: 令牌已过期
+        """
+        digest = token_digest(token)
+        if token_revocations.is_revoked(digest):
+            raise InvalidTokenError("令牌已被撤销")
+        
+        payload = token_cache.get(digest)
+        if payload is None:
+            try:
+                payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+            except jwt.ExpiredSignatureError:
+                raise TokenExpiredError("令牌已过期")
+            except jwt.InvalidTokenError:
+                raise InvalidTokenError("无效的令牌")
+            token_cache.put(digest, payload)
+        return payload
+    
+    async def load_revoked_tokens(self, force: bool = False) -> None:
+        """从数据库加载未过期的撤销记录（首次使用时，以及任一进程撤销令牌后）"""
+        version = table_versions.version(RevokedToken.__tablename__)
+        if token_revocations.loaded and not force and version is not None and version == token_revocations.version:
+            return
+        try:
+            result = await self.db.execute(
+                select(RevokedToken.token_digest, RevokedToken.expires_at)
+                .where(RevokedToken.expires_at > datetime.utcnow())
+            )
+            token_revocations.replace({
+                digest: (expires_at - datetime(1970, 1, 1)).total_seconds()
+                for digest, expires_at in result.all()
+            }, version)
+        except SQLAlchemyError as e:
+            raise DatabaseError(f"加载令牌撤销记录失败: {str(e)}")
+    
+    async def revoke_token(self, token: str, token_type: str = "access", user_id: Optional[int] = None) -> None:
+        """
+        撤销令牌（登出），令牌在过期前不再可用
+        
+        Args:
+            token: 令牌
+            token_type: 令牌类型
+            user_id: 令牌须属于该用户（为None时不检查）
+        
+        Raises:
+            InvalidTokenError: 令牌无效、类型不匹配或不属于该用户
+            DatabaseError: 保存撤销记录失败
+        """
+        await self.load_revoked_tokens()
+        token_data = self.verify_token(token, token_type)
+        if user_id is not None and token_data.user_id != user_id:
+            raise InvalidTokenError("令牌不属于当前用户")
+        
+        digest = token_digest(token)
+        expires_at = float(self._decode_token(token)["exp"])
+        try:
+            # 顺带清理已过期的撤销记录
+            await self.db.execute(delete(RevokedToken).where(RevokedToken.expires_at <= datetime.utcnow()))
+            self.db.add(RevokedToken(
+                token_digest=digest,
+                user_id=token_data.user_id,
+                token_type=token_type,
+                expires_at=datetime.utcfromtimestamp(expires_at)
+            ))
+            await self.db.commit()
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            raise DatabaseError(f"令牌撤销失败: {str(e)}")
+        
+        token_revocations.add(digest, expires_at)
+        token_cache.discard(digest)
+    
     def verify_token(self, token: str, token_type: str = "access") -> TokenData:
         """验证令牌"""
         try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+            payload = self._decode_token(token)
             
             # 检查令牌类型
             if payload.get("type") != token_type:
@@ -106,22 +271,33 @@ class AuthService(BaseService[User]):
             
         except jwt.ExpiredSignatureError:
             raise TokenExpiredError("令牌已过期")
-        except jwt.JWTError:
+        except jwt.InvalidTokenError:
             raise InvalidTokenError("无效的令牌")
     
-    def get_current_user(self, token: str) -> User:
+    async def get_current_user(self, token: str) -> User:
         """获取当前用户"""
         token_data = self.verify_token(token)
-        user = self.get(token_data.user_id)
+        user = await self.get(token_data.user_id)
         if user is None:
             raise UserNotFoundError("用户不存在")
         if not user.is_active:
             raise AuthenticationError("用户已被禁用")
         return user
     
-    def login(self, login_data: UserLogin) -> Token:
+    async def get_current_principal(self, token: str) -> Principal:
+        """获取当前请求主体（用户信息和权限，短期缓存）"""
+        await self.load_revoked_tokens()
+        token_data = self.verify_token(token)
+        principal = await load_principal(self.db, token_data.user_id)
+        if principal is None:
+            raise UserNotFoundError("用户不存在")
+        if not principal.is_active:
+            raise AuthenticationError("用户已被禁用")
+        return principal
+    
+    async def login(self, login_data: UserLogin) -> Token:
         """用户登录"""
-        user = self.authenticate_user(login_data.email, login_data.password)
+        user = await self.authenticate_user(login_data.email, login_data.password)
         if not user:
             raise AuthenticationError("邮箱或密码错误")
         
@@ -157,10 +333,11 @@ class AuthService(BaseService[User]):
             expires_in=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
         )
     
-    def refresh_token(self, refresh_token: str) -> Token:
+    async def refresh_token(self, refresh_token: str) -> Token:
         """刷新令牌"""
+        await self.load_revoked_tokens()
         token_data = self.verify_token(refresh_token, "refresh")
-        user = self.get(token_data.user_id)
+        user = await self.get(token_data.user_id)
         
         if not user:
             raise UserNotFoundError("用户不存在")
@@ -182,49 +359,49 @@ class AuthService(BaseService[User]):
             expires_in=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
         )
     
-    def register(self, user_data: UserCreate) -> User:
+    async def register(self, user_data: UserCreate) -> User:
         """用户注册"""
         try:
             # 检查邮箱是否已存在
-            existing_user = self.get_by_field("email", user_data.email)
+            existing_user = await self.get_by_field("email", user_data.email)
             if existing_user:
                 raise UserAlreadyExistsError("邮箱已被注册")
             
             # 创建用户数据
             user_dict = user_data.dict()
-            user_dict["password_hash"] = self.get_password_hash(user_data.password)
+            user_dict["password_hash"] = await self.get_password_hash(user_data.password)
             del user_dict["password"]  # 删除明文密码
             
             # 创建用户
-            user = self.create(user_dict)
+            user = await self.create(user_dict)
             return user
             
         except SQLAlchemyError as e:
             raise DatabaseError(f"用户注册失败: {str(e)}")
     
-    def change_password(self, user_id: int, old_password: str, new_password: str) -> bool:
+    async def change_password(self, user_id: int, old_password: str, new_password: str) -> bool:
         """修改密码"""
         try:
-            user = self.get(user_id)
+            user = await self.get(user_id)
             if not user:
                 raise UserNotFoundError("用户不存在")
             
             # 验证旧密码
-            if not self.verify_password(old_password, user.password_hash):
+            if not await self.verify_password(old_password, user.password_hash):
                 raise AuthenticationError("原密码错误")
             
             # 更新密码
-            new_password_hash = self.get_password_hash(new_password)
-            self.update(user_id, {"password_hash": new_password_hash})
+            new_password_hash = await self.get_password_hash(new_password)
+            await self.update(user_id, {"password_hash": new_password_hash})
             
             return True
             
         except SQLAlchemyError as e:
             raise DatabaseError(f"密码修改失败: {str(e)}")
     
-    def reset_password(self, email: str) -> str:
+    async def reset_password(self, email: str) -> str:
         """重置密码 - 生成重置令牌"""
-        user = self.get_by_field("email", email)
+        user = await self.get_by_field("email", email)
         if not user:
             raise UserNotFoundError("用户不存在")
         
@@ -237,7 +414,7 @@ class AuthService(BaseService[User]):
         
         return reset_token
     
-    def confirm_password_reset(self, token: str, new_password: str) -> bool:
+    async def confirm_password_reset(self, token: str, new_password: str) -> bool:
         """确认密码重置"""
         try:
             payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
@@ -251,39 +428,39 @@ class AuthService(BaseService[User]):
                 raise InvalidTokenError("令牌中缺少用户信息")
             
             # 更新密码
-            new_password_hash = self.get_password_hash(new_password)
-            self.update(user_id, {"password_hash": new_password_hash})
+            new_password_hash = await self.get_password_hash(new_password)
+            await self.update(user_id, {"password_hash": new_password_hash})
             
             return True
             
         except jwt.ExpiredSignatureError:
             raise TokenExpiredError("重置令牌已过期")
-        except jwt.JWTError:
+        except jwt.InvalidTokenError:
             raise InvalidTokenError("无效的重置令牌")
         except SQLAlchemyError as e:
             raise DatabaseError(f"密码重置失败: {str(e)}")
     
-    def deactivate_user(self, user_id: int) -> bool:
+    async def deactivate_user(self, user_id: int) -> bool:
         """停用用户"""
         try:
-            user = self.get(user_id)
+            user = await self.get(user_id)
             if not user:
                 raise UserNotFoundError("用户不存在")
             
-            self.update(user_id, {"is_active": False})
+            await self.update(user_id, {"is_active": False})
             return True
             
         except SQLAlchemyError as e:
             raise DatabaseError(f"用户停用失败: {str(e)}")
     
-    def activate_user(self, user_id: int) -> bool:
+    async def activate_user(self, user_id: int) -> bool:
         """激活用户"""
         try:
-            user = self.get(user_id)
+            user = await self.get(user_id)
             if not user:
                 raise UserNotFoundError("用户不存在")
             
-            self.update(user_id, {"is_active": True})
+            await self.update(user_id, {"is_active": True})
             return True
             
         except SQLAlchemyError as e:
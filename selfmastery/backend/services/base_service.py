@@ -1,14 +1,266 @@
 """
 基础服务类，提供通用的CRUD操作
 """
-from typing import Type, TypeVar, Generic, List, Optional, Dict, Any
+from typing import Type, TypeVar, Generic, List, Optional, Dict, Any, Iterator, Tuple
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import and_, or_, desc, asc
+from sqlalchemy import and_, or_, desc, asc, select, func, insert, update, text
+from sqlalchemy.orm import aliased
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.elements import ColumnElement
 from ..models.base import BaseModel
+from ..utils.pagination import decode_cursor, next_cursor_for
+from .service_cache import cache_lookup, cache_store, is_miss, normalize_filters
 
 ModelType = TypeVar("ModelType", bound=BaseModel)
 
+# 批量操作默认每批处理的记录数
+DEFAULT_BULK_CHUNK_SIZE = 1000
+
+# 批量更新时不允许修改的字段（与 BaseModel.update_from_dict 保持一致）
+BULK_UPDATE_EXCLUDE = ('id', 'created_at', 'updated_at')
+
+# 分页总数模式：exact 精确计数（窗口函数），approximate 读取表统计信息估算，none 不计算
+TOTAL_MODES = ('exact', 'approximate', 'none')
+
+
+def _resolve_order_field(model: Type[BaseModel], order_by: Optional[str]) -> str:
+    """返回有效的排序字段名，无效时回退为主键"""
+    if order_by and hasattr(model, order_by):
+        return order_by
+    return "id"
+
+
+def _order_clauses(model: Type[BaseModel], order_by: str, order_desc: bool) -> list:
+    """
+    构建 (order_by, id) 排序子句
+
+    以主键作为次级排序保证顺序稳定，NULL 统一视为最小值，
+    使 SQLite 与 PostgreSQL 的排序一致，可用于游标分页。
+    """
+    id_clause = desc(model.id) if order_desc else asc(model.id)
+    if order_by == "id":
+        return [id_clause]
+    order_field = getattr(model, order_by)
+    if order_desc:
+        return [desc(order_field).nulls_last(), id_clause]
+    return [asc(order_field).nulls_first(), id_clause]
+
+
+def _keyset_clause(
+    model: Type[BaseModel],
+    order_by: str,
+    order_desc: bool,
+    cursor: str
+) -> ColumnElement:
+    """
+    构建游标分页的定位条件（seek），与 _order_clauses 的排序一致
+
+    Args:
+        model: 数据模型类
+        order_by: 排序字段名
+        order_desc: 是否降序排列
+        cursor: 上一页返回的游标
+
+    Returns:
+        WHERE 条件表达式
+    """
+    last_value, last_id = decode_cursor(cursor, order_by)
+    if order_by == "id":
+        return model.id < last_id if order_desc else model.id > last_id
+
+    order_field = getattr(model, order_by)
+    if order_desc:
+        id_after = model.id < last_id
+        if last_value is None:
+            return and_(order_field.is_(None), id_after)
+        return or_(
+            order_field < last_value,
+            order_field.is_(None),
+            and_(order_field == last_value, id_after)
+        )
+
+    id_after = model.id > last_id
+    if last_value is None:
+        return or_(order_field.isnot(None), and_(order_field.is_(None), id_after))
+    return or_(order_field > last_value, and_(order_field == last_value, id_after))
+
+
+def _filtered_select(
+    model: Type[BaseModel],
+    include_deleted: bool = False,
+    filters: Optional[Dict[str, Any]] = None,
+    search_term: Optional[str] = None,
+    search_fields: Optional[List[str]] = None
+) -> Select:
+    """
+    构建带软删除、过滤和搜索条件的查询语句
+    
+    Args:
+        model: 数据模型类
+        include_deleted: 是否包含已删除的记录
+        filters: 过滤条件字典，值为列表时使用 IN
+        search_term: 搜索关键词
+        search_fields: 搜索字段列表
+        
+    Returns:
+        查询语句
+    """
+    stmt = select(model)
+    
+    # 软删除过滤
+    if not include_deleted and hasattr(model, 'is_deleted'):
+        stmt = stmt.where(model.is_deleted == False)
+    
+    # 应用过滤条件
+    if filters:
+        for field, value in filters.items():
+            if hasattr(model, field):
+                if isinstance(value, list):
+                    stmt = stmt.where(getattr(model, field).in_(value))
+                else:
+                    stmt = stmt.where(getattr(model, field) == value)
+    
+    # 构建搜索条件
+    if search_term and search_fields:
+        search_conditions = [
+            getattr(model, field).ilike(f"%{search_term}%")
+            for field in search_fields
+            if hasattr(model, field)
+        ]
+        if search_conditions:
+            stmt = stmt.where(or_(*search_conditions))
+    
+    return stmt
+
+
+def _ordered(
+    stmt: Select,
+    entity: Any,
+    order_by: Optional[str],
+    order_desc: bool,
+    cursor: Optional[str]
+) -> Tuple[Select, bool]:
+    """
+    应用排序和游标定位条件
+    
+    Returns:
+        (查询语句, 是否按游标定位)
+    """
+    if not (order_by or cursor):
+        return stmt, False
+    order_field = _resolve_order_field(entity, order_by)
+    stmt = stmt.order_by(*_order_clauses(entity, order_field, order_desc))
+    if cursor:
+        stmt = stmt.where(_keyset_clause(entity, order_field, order_desc, cursor))
+    return stmt, bool(cursor)
+
+
+def _page_statement(
+    model: Type[BaseModel],
+    base_stmt: Select,
+    skip: int,
+    limit: int,
+    order_by: str,
+    order_desc: bool,
+    cursor: Optional[str],
+    with_total: bool
+) -> Select:
+    """
+    构建分页查询：多取一条用于判断是否有下一页
+    
+    with_total 为True时，在过滤后的子查询上附加 COUNT(*) OVER() 列，
+    总数与当前页在同一条查询中返回；窗口在游标定位和 LIMIT 之前计算，
+    因此游标分页时也是满足过滤条件的完整总数。
+    """
+    if with_total:
+        inner = base_stmt.add_columns(func.count().over().label("total_count")).subquery()
+        entity = aliased(model, inner)
+        stmt = select(entity, inner.c.total_count)
+    else:
+        entity = model
+        stmt = base_stmt
+    
+    stmt, seeking = _ordered(stmt, entity, order_by, order_desc, cursor)
+    if not seeking:
+        stmt = stmt.offset(skip)
+    return stmt.limit(limit + 1)
+
+
+def _count_statement(base_stmt: Select) -> Select:
+    """构建与查询条件一致的计数语句"""
+    return select(func.count()).select_from(base_stmt.subquery())
+
+
+def _row_estimate_statement(dialect_name: str, table_name: str):
+    """
+    构建读取表行数统计信息的语句
+    
+    SQLite 读取 ANALYZE 生成的 sqlite_stat1，PostgreSQL 读取 pg_class.reltuples，
+    其它数据库返回None。
+    """
+    if dialect_name == "sqlite":
+        return text("SELECT stat FROM sqlite_stat1 WHERE tbl = :table").bindparams(table=table_name)
+    if dialect_name == "postgresql":
+        return text(
+            "SELECT reltuples::bigint FROM pg_class WHERE relname = :table"
+        ).bindparams(table=table_name)
+    return None
+
+
+def _parse_row_estimate(dialect_name: str, rows: list) -> Optional[int]:
+    """解析表行数统计信息，没有可用统计时返回None"""
+    if not rows:
+        return None
+    if dialect_name == "sqlite":
+        # stat 列格式为 "总行数 每个索引前缀的平均行数..."
+        estimates = [int(str(row[0]).split()[0]) for row in rows if row[0]]
+        return max(estimates) if estimates else None
+    estimate = rows[0][0]
+    return int(estimate) if estimate is not None and estimate >= 0 else None
+
+
+def _chunked(items: List[Any], chunk_size: int) -> Iterator[List[Any]]:
+    """按固定大小切分列表"""
+    if chunk_size <= 0:
+        raise ValueError("chunk_size 必须大于0")
+    for start in range(0, len(items), chunk_size):
+        yield items[start:start + chunk_size]
+
+
+def _group_bulk_updates(
+    model: Type[BaseModel],
+    updates: List[Dict[str, Any]]
+) -> Dict[Tuple[str, ...], List[Dict[str, Any]]]:
+    """
+    按更新字段集合对批量更新数据分组
+    
+    同一分组内的记录更新相同的列，可以用一条 executemany UPDATE 完成。
+    未知字段和受保护字段会被忽略，与 update_from_dict 的行为一致。
+    
+    Args:
+        model: 数据模型类
+        updates: 更新数据列表，每个字典必须包含'id'字段
+        
+    Returns:
+        {字段元组: [包含id的参数字典, ...]}
+    """
+    columns = model.__table__.columns.keys()
+    groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+    for update_data in updates:
+        obj_id = update_data.get('id')
+        if obj_id is None:
+            continue
+        values = {
+            key: value for key, value in update_data.items()
+            if key in columns and key not in BULK_UPDATE_EXCLUDE
+        }
+        if not values:
+            continue
+        groups.setdefault(tuple(sorted(values)), []).append({"id": obj_id, **values})
+    return groups
+
 
 class BaseService(Generic[ModelType]):
     """基础服务类"""
@@ -58,12 +310,35 @@ class BaseService(Generic[ModelType]):
         Returns:
             对象实例或None
         """
+        key, cached = cache_lookup(self.db, self.model, "get", obj_id, include_deleted)
+        if not is_miss(cached):
+            return cached[0] if cached else None
+        
         query = self.db.query(self.model).filter(self.model.id == obj_id)
         
         if not include_deleted and hasattr(self.model, 'is_deleted'):
             query = query.filter(self.model.is_deleted == False)
         
-        return query.first()
+        obj = query.first()
+        cache_store(key, [obj] if obj else [])
+        return obj
+    
+    def _build_select(
+        self,
+        include_deleted: bool = False,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> Select:
+        """
+        构建带软删除和过滤条件的查询语句
+        
+        Args:
+            include_deleted: 是否包含已删除的记录
+            filters: 过滤条件字典
+            
+        Returns:
+            查询语句
+        """
+        return _filtered_select(self.model, include_deleted, filters)
     
     def get_multi(
         self,
@@ -72,46 +347,144 @@ class BaseService(Generic[ModelType]):
         include_deleted: bool = False,
         filters: Optional[Dict[str, Any]] = None,
         order_by: Optional[str] = None,
-        order_desc: bool = False
+        order_desc: bool = False,
+        cursor: Optional[str] = None
     ) -> List[ModelType]:
         """
         获取多个记录
         
         Args:
-            skip: 跳过记录数
+            skip: 跳过记录数（游标分页时忽略）
             limit: 限制记录数
             include_deleted: 是否包含已删除的记录
             filters: 过滤条件字典
             order_by: 排序字段
             order_desc: 是否降序排列
+            cursor: 上一页返回的游标，提供时按 (order_by, id) 定位而不是跳过记录
             
         Returns:
             对象实例列表
         """
-        query = self.db.query(self.model)
+        key, cached = cache_lookup(
+            self.db, self.model, "get_multi", skip, limit, include_deleted,
+            normalize_filters(filters), order_by, order_desc, cursor
+        )
+        if not is_miss(cached):
+            return cached
         
-        # 软删除过滤
-        if not include_deleted and hasattr(self.model, 'is_deleted'):
-            query = query.filter(self.model.is_deleted == False)
+        stmt, seeking = _ordered(
+            self._build_select(include_deleted, filters),
+            self.model, order_by, order_desc, cursor
+        )
+        if not seeking:
+            stmt = stmt.offset(skip)
+        objs = list(self.db.scalars(stmt.limit(limit)).all())
+        cache_store(key, objs)
+        return objs
+    
+    def get_page(
+        self,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        skip: int = 0,
+        include_deleted: bool = False,
+        filters: Optional[Dict[str, Any]] = None,
+        order_by: Optional[str] = None,
+        order_desc: bool = False,
+        total_mode: str = "exact"
+    ) -> Tuple[List[ModelType], Optional[int], Optional[str], str]:
+        """
+        获取一页记录、总数及下一页游标
+        
+        提供游标时按 (order_by, id) 定位，翻页耗时与页码深度无关；
+        此时 exact 模式不再计算总数（总数已随首页返回），避免每页都扫描完整结果集。
+        
+        Args:
+            limit: 每页记录数
+            cursor: 上一页返回的游标，为None时按 skip 偏移分页
+            skip: 跳过记录数（提供游标时忽略）
+            include_deleted: 是否包含已删除的记录
+            filters: 过滤条件字典
+            order_by: 排序字段，默认按主键
+            order_desc: 是否降序排列
+            total_mode: 总数模式，exact 在同一查询中用窗口函数精确计数（提供游标时不计算），
+                approximate 在无过滤条件时读取表统计信息估算，none 不计算
+            
+        Returns:
+            (对象实例列表, 总数, 下一页游标, 实际使用的总数模式)，没有更多数据时游标为None；
+            估算模式没有可用统计信息时退回精确计数，实际模式为 exact
+        """
+        return self._fetch_page(
+            self._build_select(include_deleted, filters),
+            limit, cursor, skip, order_by, order_desc,
+            total_mode if not filters else self._exact_if_approximate(total_mode)
+        )
+    
+    def _exact_if_approximate(self, total_mode: str) -> str:
+        """表统计信息无法反映过滤条件，有过滤时估算模式退化为精确计数"""
+        return "exact" if total_mode == "approximate" else total_mode
+    
+    def _fetch_page(
+        self,
+        base_stmt: Select,
+        limit: int,
+        cursor: Optional[str],
+        skip: int,
+        order_by: Optional[str],
+        order_desc: bool,
+        total_mode: str
+    ) -> Tuple[List[ModelType], Optional[int], Optional[str], str]:
+        """执行分页查询，返回 (对象实例列表, 总数, 下一页游标, 实际使用的总数模式)"""
+        if total_mode not in TOTAL_MODES:
+            raise ValueError(f"total_mode 必须是以下之一: {', '.join(TOTAL_MODES)}")
+        if cursor and total_mode == "exact":
+            # 游标翻页不再计算精确总数，每页只读取 limit + 1 行
+            total_mode = "none"
+        
+        order_field = _resolve_order_field(self.model, order_by)
+        with_total = total_mode == "exact"
+        stmt = _page_statement(
+            self.model, base_stmt, skip, limit, order_field, order_desc, cursor, with_total
+        )
+        
+        total = None
+        if with_total:
+            rows = self.db.execute(stmt).all()
+            items = [row[0] for row in rows]
+            if rows:
+                total = rows[0].total_count
+        else:
+            items = list(self.db.scalars(stmt).all())
+        
+        if total_mode == "approximate":
+            total = self.estimate_count()
+            if total is None:
+                total_mode = "exact"
+        if total is None and total_mode != "none":
+            # 当前页为空（越过末页）或没有统计信息时单独计数
+            total = self.db.scalar(_count_statement(base_stmt))
+        
+        return items[:limit], total, next_cursor_for(items, limit, order_field), total_mode
+    
+    def estimate_count(self) -> Optional[int]:
+        """
+        读取数据库维护的表行数统计信息（近似值，包含软删除记录）
+        
+        SQLite 需要先执行过 ANALYZE，没有可用统计信息时返回None。
         
-        # 应用过滤条件
-        if filters:
-            for field, value in filters.items():
-                if hasattr(self.model, field):
-                    if isinstance(value, list):
-                        query = query.filter(getattr(self.model, field).in_(value))
-                    else:
-                        query = query.filter(getattr(self.model, field) == value)
-        
-        # 排序
-        if order_by and hasattr(self.model, order_by):
-            order_field = getattr(self.model, order_by)
-            if order_desc:
-                query = query.order_by(desc(order_field))
-            else:
-                query = query.order_by(asc(order_field))
-        
-        return query.offset(skip).limit(limit).all()
+        Returns:
+            估算的行数或None
+        """
+        dialect_name = self.db.get_bind().dialect.name
+        stmt = _row_estimate_statement(dialect_name, self.model.__tablename__)
+        if stmt is None:
+            return None
+        try:
+            rows = self.db.execute(stmt).all()
+        except SQLAlchemyError:
+            # 例如 SQLite 尚未执行 ANALYZE，sqlite_stat1 不存在
+            return None
+        return _parse_row_estimate(dialect_name, rows)
     
     def update(self, obj_id: int, obj_data: Dict[str, Any]) -> Optional[ModelType]:
         """
@@ -202,22 +575,13 @@ class BaseService(Generic[ModelType]):
         Returns:
             记录数量
         """
-        query = self.db.query(self.model)
-        
-        # 软删除过滤
-        if not include_deleted and hasattr(self.model, 'is_deleted'):
-            query = query.filter(self.model.is_deleted == False)
-        
-        # 应用过滤条件
-        if filters:
-            for field, value in filters.items():
-                if hasattr(self.model, field):
-                    if isinstance(value, list):
-                        query = query.filter(getattr(self.model, field).in_(value))
-                    else:
-                        query = query.filter(getattr(self.model, field) == value)
+        key, cached = cache_lookup(self.db, self.model, "count", normalize_filters(filters), include_deleted)
+        if not is_miss(cached):
+            return cached
         
-        return query.count()
+        total = self.db.scalar(_count_statement(self._build_select(include_deleted, filters)))
+        cache_store(key, total)
+        return total
     
     def exists(self, obj_id: int, include_deleted: bool = False) -> bool:
         """
@@ -238,7 +602,11 @@ class BaseService(Generic[ModelType]):
         search_fields: List[str],
         skip: int = 0,
         limit: int = 100,
-        include_deleted: bool = False
+        include_deleted: bool = False,
+        filters: Optional[Dict[str, Any]] = None,
+        order_by: Optional[str] = None,
+        order_desc: bool = False,
+        cursor: Optional[str] = None
     ) -> List[ModelType]:
         """
         搜索记录
@@ -246,62 +614,138 @@ class BaseService(Generic[ModelType]):
         Args:
             search_term: 搜索关键词
             search_fields: 搜索字段列表
-            skip: 跳过记录数
+            skip: 跳过记录数（游标分页时忽略）
             limit: 限制记录数
             include_deleted: 是否包含已删除的记录
+            filters: 过滤条件字典
+            order_by: 排序字段
+            order_desc: 是否降序排列
+            cursor: 上一页返回的游标
             
         Returns:
             匹配的对象实例列表
         """
-        query = self.db.query(self.model)
-        
-        # 软删除过滤
-        if not include_deleted and hasattr(self.model, 'is_deleted'):
-            query = query.filter(self.model.is_deleted == False)
+        stmt, seeking = _ordered(
+            _filtered_select(self.model, include_deleted, filters, search_term, search_fields),
+            self.model, order_by, order_desc, cursor
+        )
+        if not seeking:
+            stmt = stmt.offset(skip)
+        return list(self.db.scalars(stmt.limit(limit)).all())
+    
+    def search_page(
+        self,
+        search_term: str,
+        search_fields: List[str],
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        skip: int = 0,
+        include_deleted: bool = False,
+        filters: Optional[Dict[str, Any]] = None,
+        order_by: Optional[str] = None,
+        order_desc: bool = False,
+        total_mode: str = "exact"
+    ) -> Tuple[List[ModelType], Optional[int], Optional[str], str]:
+        """
+        搜索一页记录、匹配总数及下一页游标
         
-        # 构建搜索条件
-        if search_term and search_fields:
-            search_conditions = []
-            for field in search_fields:
-                if hasattr(self.model, field):
-                    field_attr = getattr(self.model, field)
-                    search_conditions.append(field_attr.ilike(f"%{search_term}%"))
+        Args:
+            search_term: 搜索关键词
+            search_fields: 搜索字段列表
+            limit: 每页记录数
+            cursor: 上一页返回的游标，为None时按 skip 偏移分页
+            skip: 跳过记录数（提供游标时忽略）
+            include_deleted: 是否包含已删除的记录
+            filters: 过滤条件字典
+            order_by: 排序字段，默认按主键
+            order_desc: 是否降序排列
+            total_mode: 总数模式，exact 在同一查询中用窗口函数精确计数（提供游标时不计算），
+                approximate 在无过滤和搜索条件时读取表统计信息估算，none 不计算
             
-            if search_conditions:
-                query = query.filter(or_(*search_conditions))
+        Returns:
+            (对象实例列表, 总数, 下一页游标, 实际使用的总数模式)，没有更多数据时游标为None；
+            估算模式没有可用统计信息时退回精确计数，实际模式为 exact
+        """
+        base_stmt = _filtered_select(self.model, include_deleted, filters, search_term, search_fields)
+        if filters or (search_term and search_fields):
+            total_mode = self._exact_if_approximate(total_mode)
+        return self._fetch_page(base_stmt, limit, cursor, skip, order_by, order_desc, total_mode)
+    
+    def get_by_ids(
+        self,
+        obj_ids: List[int],
+        include_deleted: bool = False,
+        chunk_size: int = DEFAULT_BULK_CHUNK_SIZE,
+        populate_existing: bool = False
+    ) -> List[ModelType]:
+        """
+        根据ID列表批量获取记录
+        
+        每批执行一条 IN 查询，结果按传入ID的顺序返回，不存在的ID被忽略。
         
-        return query.offset(skip).limit(limit).all()
+        Args:
+            obj_ids: 对象ID列表
+            include_deleted: 是否包含已删除的记录
+            chunk_size: 每条查询包含的ID数量
+            populate_existing: 是否用查询结果覆盖会话中已加载的对象
+            
+        Returns:
+            对象实例列表
+        """
+        found: Dict[int, ModelType] = {}
+        for chunk in _chunked(list(dict.fromkeys(obj_ids)), chunk_size):
+            stmt = self._build_select(include_deleted).where(self.model.id.in_(chunk))
+            if populate_existing:
+                stmt = stmt.execution_options(populate_existing=True)
+            found.update((obj.id, obj) for obj in self.db.scalars(stmt).all())
+        return [found[obj_id] for obj_id in dict.fromkeys(obj_ids) if obj_id in found]
     
-    def bulk_create(self, obj_data_list: List[Dict[str, Any]]) -> List[ModelType]:
+    def bulk_create(
+        self,
+        obj_data_list: List[Dict[str, Any]],
+        chunk_size: int = DEFAULT_BULK_CHUNK_SIZE
+    ) -> List[ModelType]:
         """
         批量创建记录
         
+        每批执行一条 INSERT ... RETURNING id（executemany），提交后再按批
+        用 IN 查询加载新对象，不再逐条 refresh。
+        
         Args:
             obj_data_list: 对象数据字典列表
+            chunk_size: 每批插入的记录数
             
         Returns:
-            创建的对象实例列表
+            创建的对象实例列表（与输入顺序一致）
             
         Raises:
             SQLAlchemyError: 数据库操作异常
         """
         try:
-            db_objs = [self.model(**obj_data) for obj_data in obj_data_list]
-            self.db.add_all(db_objs)
+            new_ids: List[int] = []
+            stmt = insert(self.model).returning(self.model.id, sort_by_parameter_order=True)
+            for chunk in _chunked(obj_data_list, chunk_size):
+                new_ids.extend(self.db.scalars(stmt, chunk).all())
             self.db.commit()
-            for db_obj in db_objs:
-                self.db.refresh(db_obj)
-            return db_objs
+            return self.get_by_ids(new_ids, include_deleted=True, chunk_size=chunk_size)
         except SQLAlchemyError as e:
             self.db.rollback()
             raise e
     
-    def bulk_update(self, updates: List[Dict[str, Any]]) -> List[ModelType]:
+    def bulk_update(
+        self,
+        updates: List[Dict[str, Any]],
+        chunk_size: int = DEFAULT_BULK_CHUNK_SIZE
+    ) -> List[ModelType]:
         """
         批量更新记录
         
+        按更新字段集合分组，每组每批执行一条按主键的 executemany UPDATE，
+        已软删除的记录不会被更新。
+        
         Args:
             updates: 更新数据列表，每个字典必须包含'id'字段
+            chunk_size: 每批更新的记录数
             
         Returns:
             更新后的对象实例列表
@@ -310,18 +754,19 @@ class BaseService(Generic[ModelType]):
             SQLAlchemyError: 数据库操作异常
         """
         try:
-            updated_objs = []
-            for update_data in updates:
-                obj_id = update_data.pop('id')
-                db_obj = self.get(obj_id)
-                if db_obj:
-                    db_obj.update_from_dict(update_data)
-                    updated_objs.append(db_obj)
+            # 会话中已加载的对象在提交后统一重新加载，不逐条同步
+            stmt = update(self.model).execution_options(synchronize_session=None)
+            if hasattr(self.model, 'is_deleted'):
+                stmt = stmt.where(self.model.is_deleted == False)
+            
+            updated_ids: List[int] = []
+            for rows in _group_bulk_updates(self.model, updates).values():
+                for chunk in _chunked(rows, chunk_size):
+                    self.db.execute(stmt, chunk)
+                    updated_ids.extend(row["id"] for row in chunk)
             
             self.db.commit()
-            for db_obj in updated_objs:
-                self.db.refresh(db_obj)
-            return updated_objs
+            return self.get_by_ids(updated_ids, chunk_size=chunk_size, populate_existing=True)
         except SQLAlchemyError as e:
             self.db.rollback()
             raise e
@@ -341,9 +786,556 @@ class BaseService(Generic[ModelType]):
         if not hasattr(self.model, field):
             return None
         
+        key, cached = cache_lookup(self.db, self.model, "get_by_field", field, value, include_deleted)
+        if not is_miss(cached):
+            return cached[0] if cached else None
+        
         query = self.db.query(self.model).filter(getattr(self.model, field) == value)
         
         if not include_deleted and hasattr(self.model, 'is_deleted'):
             query = query.filter(self.model.is_deleted == False)
         
-        return query.first()
\ No newline at end of file
+        obj = query.first()
+        cache_store(key, [obj] if obj else [])
+        return obj
+
+
+class AsyncBaseService(Generic[ModelType]):
+    """异步基础服务类
+
+    与 BaseService 提供相同的CRUD接口，基于 AsyncSession 执行查询，
+    数据库I/O期间不会阻塞事件循环。
+    """
+    
+    def __init__(self, model: Type[ModelType], db: AsyncSession):
+        """
+        初始化异步基础服务
+        
+        Args:
+            model: 数据模型类
+            db: 异步数据库会话
+        """
+        self.model = model
+        self.db = db
+    
+    async def create(self, obj_data: Dict[str, Any]) -> ModelType:
+        """
+        创建新记录
+        
+        Args:
+            obj_data: 对象数据字典
+            
+        Returns:
+            创建的对象实例
+            
+        Raises:
+            SQLAlchemyError: 数据库操作异常
+        """
+        try:
+            db_obj = self.model(**obj_data)
+            self.db.add(db_obj)
+            await self.db.commit()
+            await self.db.refresh(db_obj)
+            return db_obj
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            raise e
+    
+    async def get(self, obj_id: int, include_deleted: bool = False) -> Optional[ModelType]:
+        """
+        根据ID获取单个记录
+        
+        Args:
+            obj_id: 对象ID
+            include_deleted: 是否包含已删除的记录
+            
+        Returns:
+            对象实例或None
+        """
+        key, cached = cache_lookup(self.db.sync_session, self.model, "get", obj_id, include_deleted)
+        if not is_miss(cached):
+            return cached[0] if cached else None
+        
+        stmt = self._build_select(include_deleted).where(self.model.id == obj_id)
+        result = await self.db.execute(stmt)
+        obj = result.scalars().first()
+        cache_store(key, [obj] if obj else [])
+        return obj
+    
+    def _build_select(
+        self,
+        include_deleted: bool = False,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> Select:
+        """
+        构建带软删除和过滤条件的查询语句
+        
+        Args:
+            include_deleted: 是否包含已删除的记录
+            filters: 过滤条件字典
+            
+        Returns:
+            查询语句
+        """
+        return _filtered_select(self.model, include_deleted, filters)
+    
+    async def get_multi(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        include_deleted: bool = False,
+        filters: Optional[Dict[str, Any]] = None,
+        order_by: Optional[str] = None,
+        order_desc: bool = False,
+        cursor: Optional[str] = None
+    ) -> List[ModelType]:
+        """
+        获取多个记录
+        
+        Args:
+            skip: 跳过记录数（游标分页时忽略）
+            limit: 限制记录数
+            include_deleted: 是否包含已删除的记录
+            filters: 过滤条件字典
+            order_by: 排序字段
+            order_desc: 是否降序排列
+            cursor: 上一页返回的游标，提供时按 (order_by, id) 定位而不是跳过记录
+            
+        Returns:
+            对象实例列表
+        """
+        key, cached = cache_lookup(
+            self.db.sync_session, self.model, "get_multi", skip, limit, include_deleted,
+            normalize_filters(filters), order_by, order_desc, cursor
+        )
+        if not is_miss(cached):
+            return cached
+        
+        stmt, seeking = _ordered(
+            self._build_select(include_deleted, filters),
+            self.model, order_by, order_desc, cursor
+        )
+        if not seeking:
+            stmt = stmt.offset(skip)
+        objs = list((await self.db.scalars(stmt.limit(limit))).all())
+        cache_store(key, objs)
+        return objs
+    
+    async def get_page(
+        self,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        skip: int = 0,
+        include_deleted: bool = False,
+        filters: Optional[Dict[str, Any]] = None,
+        order_by: Optional[str] = None,
+        order_desc: bool = False,
+        total_mode: str = "exact"
+    ) -> Tuple[List[ModelType], Optional[int], Optional[str], str]:
+        """
+        获取一页记录、总数及下一页游标
+        
+        提供游标时按 (order_by, id) 定位，翻页耗时与页码深度无关；
+        此时 exact 模式不再计算总数（总数已随首页返回），避免每页都扫描完整结果集。
+        
+        Args:
+            limit: 每页记录数
+            cursor: 上一页返回的游标，为None时按 skip 偏移分页
+            skip: 跳过记录数（提供游标时忽略）
+            include_deleted: 是否包含已删除的记录
+            filters: 过滤条件字典
+            order_by: 排序字段，默认按主键
+            order_desc: 是否降序排列
+            total_mode: 总数模式，exact 在同一查询中用窗口函数精确计数（提供游标时不计算），
+                approximate 在无过滤条件时读取表统计信息估算，none 不计算
+            
+        Returns:
+            (对象实例列表, 总数, 下一页游标, 实际使用的总数模式)，没有更多数据时游标为None；
+            估算模式没有可用统计信息时退回精确计数，实际模式为 exact
+        """
+        return await self._fetch_page(
+            self._build_select(include_deleted, filters),
+            limit, cursor, skip, order_by, order_desc,
+            total_mode if not filters else self._exact_if_approximate(total_mode)
+        )
+    
+    def _exact_if_approximate(self, total_mode: str) -> str:
+        """表统计信息无法反映过滤条件，有过滤时估算模式退化为精确计数"""
+        return "exact" if total_mode == "approximate" else total_mode
+    
+    async def _fetch_page(
+        self,
+        base_stmt: Select,
+        limit: int,
+        cursor: Optional[str],
+        skip: int,
+        order_by: Optional[str],
+        order_desc: bool,
+        total_mode: str
+    ) -> Tuple[List[ModelType], Optional[int], Optional[str], str]:
+        """执行分页查询，返回 (对象实例列表, 总数, 下一页游标, 实际使用的总数模式)"""
+        if total_mode not in TOTAL_MODES:
+            raise ValueError(f"total_mode 必须是以下之一: {', '.join(TOTAL_MODES)}")
+        if cursor and total_mode == "exact":
+            # 游标翻页不再计算精确总数，每页只读取 limit + 1 行
+            total_mode = "none"
+        
+        order_field = _resolve_order_field(self.model, order_by)
+        with_total = total_mode == "exact"
+        stmt = _page_statement(
+            self.model, base_stmt, skip, limit, order_field, order_desc, cursor, with_total
+        )
+        
+        total = None
+        if with_total:
+            rows = (await self.db.execute(stmt)).all()
+            items = [row[0] for row in rows]
+            if rows:
+                total = rows[0].total_count
+        else:
+            items = list((await self.db.scalars(stmt)).all())
+        
+        if total_mode == "approximate":
+            total = await self.estimate_count()
+            if total is None:
+                total_mode = "exact"
+        if total is None and total_mode != "none":
+            # 当前页为空（越过末页）或没有统计信息时单独计数
+            total = await self.db.scalar(_count_statement(base_stmt))
+        
+        return items[:limit], total, next_cursor_for(items, limit, order_field), total_mode
+    
+    async def estimate_count(self) -> Optional[int]:
+        """
+        读取数据库维护的表行数统计信息（近似值，包含软删除记录）
+        
+        SQLite 需要先执行过 ANALYZE，没有可用统计信息时返回None。
+        
+        Returns:
+            估算的行数或None
+        """
+        dialect_name = self.db.get_bind().dialect.name
+        stmt = _row_estimate_statement(dialect_name, self.model.__tablename__)
+        if stmt is None:
+            return None
+        try:
+            rows = (await self.db.execute(stmt)).all()
+        except SQLAlchemyError:
+            # 例如 SQLite 尚未执行 ANALYZE，sqlite_stat1 不存在
+            return None
+        return _parse_row_estimate(dialect_name, rows)
+    
+    async def update(self, obj_id: int, obj_data: Dict[str, Any]) -> Optional[ModelType]:
+        """
+        更新记录
+        
+        Args:
+            obj_id: 对象ID
+            obj_data: 更新数据字典
+            
+        Returns:
+            更新后的对象实例或None
+            
+        Raises:
+            SQLAlchemyError: 数据库操作异常
+        """
+        try:
+            db_obj = await self.get(obj_id)
+            if db_obj:
+                db_obj.update_from_dict(obj_data)
+                await self.db.commit()
+                await self.db.refresh(db_obj)
+            return db_obj
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            raise e
+    
+    async def delete(self, obj_id: int, soft_delete: bool = True) -> bool:
+        """
+        删除记录
+        
+        Args:
+            obj_id: 对象ID
+            soft_delete: 是否软删除
+            
+        Returns:
+            是否删除成功
+            
+        Raises:
+            SQLAlchemyError: 数据库操作异常
+        """
+        try:
+            db_obj = await self.get(obj_id)
+            if db_obj:
+                if soft_delete and hasattr(db_obj, 'soft_delete'):
+                    db_obj.soft_delete()
+                else:
+                    await self.db.delete(db_obj)
+                await self.db.commit()
+                return True
+            return False
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            raise e
+    
+    async def restore(self, obj_id: int) -> Optional[ModelType]:
+        """
+        恢复软删除的记录
+        
+        Args:
+            obj_id: 对象ID
+            
+        Returns:
+            恢复后的对象实例或None
+            
+        Raises:
+            SQLAlchemyError: 数据库操作异常
+        """
+        try:
+            db_obj = await self.get(obj_id, include_deleted=True)
+            if db_obj and hasattr(db_obj, 'restore'):
+                db_obj.restore()
+                await self.db.commit()
+                await self.db.refresh(db_obj)
+                return db_obj
+            return None
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            raise e
+    
+    async def count(self, filters: Optional[Dict[str, Any]] = None, include_deleted: bool = False) -> int:
+        """
+        统计记录数量
+        
+        Args:
+            filters: 过滤条件字典
+            include_deleted: 是否包含已删除的记录
+            
+        Returns:
+            记录数量
+        """
+        key, cached = cache_lookup(
+            self.db.sync_session, self.model, "count", normalize_filters(filters), include_deleted
+        )
+        if not is_miss(cached):
+            return cached
+        
+        total = await self.db.scalar(_count_statement(self._build_select(include_deleted, filters)))
+        cache_store(key, total)
+        return total
+    
+    async def exists(self, obj_id: int, include_deleted: bool = False) -> bool:
+        """
+        检查记录是否存在
+        
+        Args:
+            obj_id: 对象ID
+            include_deleted: 是否包含已删除的记录
+            
+        Returns:
+            是否存在
+        """
+        return await self.get(obj_id, include_deleted) is not None
+    
+    async def search(
+        self,
+        search_term: str,
+        search_fields: List[str],
+        skip: int = 0,
+        limit: int = 100,
+        include_deleted: bool = False,
+        filters: Optional[Dict[str, Any]] = None,
+        order_by: Optional[str] = None,
+        order_desc: bool = False,
+        cursor: Optional[str] = None
+    ) -> List[ModelType]:
+        """
+        搜索记录
+        
+        Args:
+            search_term: 搜索关键词
+            search_fields: 搜索字段列表
+            skip: 跳过记录数（游标分页时忽略）
+            limit: 限制记录数
+            include_deleted: 是否包含已删除的记录
+            filters: 过滤条件字典
+            order_by: 排序字段
+            order_desc: 是否降序排列
+            cursor: 上一页返回的游标
+            
+        Returns:
+            匹配的对象实例列表
+        """
+        stmt, seeking = _ordered(
+            _filtered_select(self.model, include_deleted, filters, search_term, search_fields),
+            self.model, order_by, order_desc, cursor
+        )
+        if not seeking:
+            stmt = stmt.offset(skip)
+        return list((await self.db.scalars(stmt.limit(limit))).all())
+    
+    async def search_page(
+        self,
+        search_term: str,
+        search_fields: List[str],
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        skip: int = 0,
+        include_deleted: bool = False,
+        filters: Optional[Dict[str, Any]] = None,
+        order_by: Optional[str] = None,
+        order_desc: bool = False,
+        total_mode: str = "exact"
+    ) -> Tuple[List[ModelType], Optional[int], Optional[str], str]:
+        """
+        搜索一页记录、匹配总数及下一页游标
+        
+        Args:
+            search_term: 搜索关键词
+            search_fields: 搜索字段列表
+            limit: 每页记录数
+            cursor: 上一页返回的游标，为None时按 skip 偏移分页
+            skip: 跳过记录数（提供游标时忽略）
+            include_deleted: 是否包含已删除的记录
+            filters: 过滤条件字典
+            order_by: 排序字段，默认按主键
+            order_desc: 是否降序排列
+            total_mode: 总数模式，exact 在同一查询中用窗口函数精确计数（提供游标时不计算），
+                approximate 在无过滤和搜索条件时读取表统计信息估算，none 不计算
+            
+        Returns:
+            (对象实例列表, 总数, 下一页游标, 实际使用的总数模式)，没有更多数据时游标为None；
+            估算模式没有可用统计信息时退回精确计数，实际模式为 exact
+        """
+        base_stmt = _filtered_select(self.model, include_deleted, filters, search_term, search_fields)
+        if filters or (search_term and search_fields):
+            total_mode = self._exact_if_approximate(total_mode)
+        return await self._fetch_page(base_stmt, limit, cursor, skip, order_by, order_desc, total_mode)
+    
+    async def get_by_ids(
+        self,
+        obj_ids: List[int],
+        include_deleted: bool = False,
+        chunk_size: int = DEFAULT_BULK_CHUNK_SIZE,
+        populate_existing: bool = False
+    ) -> List[ModelType]:
+        """
+        根据ID列表批量获取记录
+        
+        每批执行一条 IN 查询，结果按传入ID的顺序返回，不存在的ID被忽略。
+        
+        Args:
+            obj_ids: 对象ID列表
+            include_deleted: 是否包含已删除的记录
+            chunk_size: 每条查询包含的ID数量
+            populate_existing: 是否用查询结果覆盖会话中已加载的对象
+            
+        Returns:
+            对象实例列表
+        """
+        found: Dict[int, ModelType] = {}
+        for chunk in _chunked(list(dict.fromkeys(obj_ids)), chunk_size):
+            stmt = self._build_select(include_deleted).where(self.model.id.in_(chunk))
+            if populate_existing:
+                stmt = stmt.execution_options(populate_existing=True)
+            result = await self.db.execute(stmt)
+            found.update((obj.id, obj) for obj in result.scalars().all())
+        return [found[obj_id] for obj_id in dict.fromkeys(obj_ids) if obj_id in found]
+    
+    async def bulk_create(
+        self,
+        obj_data_list: List[Dict[str, Any]],
+        chunk_size: int = DEFAULT_BULK_CHUNK_SIZE
+    ) -> List[ModelType]:
+        """
+        批量创建记录
+        
+        每批执行一条 INSERT ... RETURNING id（executemany），提交后再按批
+        用 IN 查询加载新对象，不再逐条 refresh。
+        
+        Args:
+            obj_data_list: 对象数据字典列表
+            chunk_size: 每批插入的记录数
+            
+        Returns:
+            创建的对象实例列表（与输入顺序一致）
+            
+        Raises:
+            SQLAlchemyError: 数据库操作异常
+        """
+        try:
+            new_ids: List[int] = []
+            stmt = insert(self.model).returning(self.model.id, sort_by_parameter_order=True)
+            for chunk in _chunked(obj_data_list, chunk_size):
+                new_ids.extend((await self.db.scalars(stmt, chunk)).all())
+            await self.db.commit()
+            return await self.get_by_ids(new_ids, include_deleted=True, chunk_size=chunk_size)
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            raise e
+    
+    async def bulk_update(
+        self,
+        updates: List[Dict[str, Any]],
+        chunk_size: int = DEFAULT_BULK_CHUNK_SIZE
+    ) -> List[ModelType]:
+        """
+        批量更新记录
+        
+        按更新字段集合分组，每组每批执行一条按主键的 executemany UPDATE，
+        已软删除的记录不会被更新。
+        
+        Args:
+            updates: 更新数据列表，每个字典必须包含'id'字段
+            chunk_size: 每批更新的记录数
+            
+        Returns:
+            更新后的对象实例列表
+            
+        Raises:
+            SQLAlchemyError: 数据库操作异常
+        """
+        try:
+            # 会话中已加载的对象在提交后统一重新加载，不逐条同步
+            stmt = update(self.model).execution_options(synchronize_session=None)
+            if hasattr(self.model, 'is_deleted'):
+                stmt = stmt.where(self.model.is_deleted == False)
+            
+            updated_ids: List[int] = []
+            for rows in _group_bulk_updates(self.model, updates).values():
+                for chunk in _chunked(rows, chunk_size):
+                    await self.db.execute(stmt, chunk)
+                    updated_ids.extend(row["id"] for row in chunk)
+            
+            await self.db.commit()
+            return await self.get_by_ids(updated_ids, chunk_size=chunk_size, populate_existing=True)
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            raise e
+    
+    async def get_by_field(self, field: str, value: Any, include_deleted: bool = False) -> Optional[ModelType]:
+        """
+        根据指定字段获取记录
+        
+        Args:
+            field: 字段名
+            value: 字段值
+            include_deleted: 是否包含已删除的记录
+            
+        Returns:
+            对象实例或None
+        """
+        if not hasattr(self.model, field):
+            return None
+        
+        key, cached = cache_lookup(
+            self.db.sync_session, self.model, "get_by_field", field, value, include_deleted
+        )
+        if not is_miss(cached):
+            return cached[0] if cached else None
+        
+        stmt = self._build_select(include_deleted).where(getattr(self.model, field) == value)
+        result = await self.db.execute(stmt)
+        obj = result.scalars().first()
+        cache_store(key, [obj] if obj else [])
+        return obj
@@ -0,0 +1,235 @@
+"""
+缓存一致性（表版本号）
+
+进程内的缓存（BaseService 读缓存、Principal 缓存、令牌撤销列表、流程图和KPI分析
+缓存）都以表的版本号判断是否过期：事务提交后涉及表的版本加一，按旧版本保存的缓存项
+不再使用。
+
+版本号存储可替换：
+- memory: 进程内计数，单进程部署
+- sqlite: 共享的 SQLite 文件（CACHE_VERSION_DB_PATH），多个 uvicorn 工作进程共用同一组
+  版本号。读取前先执行 PRAGMA data_version（只有其它连接提交后才会变化，开销在微秒级），
+  变化时才重新读取版本表，因此一个工作进程提交的修改会让所有工作进程的缓存随即失效。
+"""
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+from config.settings import get_app_settings
+
+settings = get_app_settings()
+logger = logging.getLogger(__name__)
+
+
+class TableVersions:
+    """进程内的表版本号（线程安全）"""
+
+    shared = False
+
+    def __init__(self):
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[Set[str]], None]] = []
+        self.bumps = 0
+        self.remote_changes = 0
+
+    def subscribe(self, listener: Callable[[Set[str]], None]) -> None:
+        """注册版本变化回调（参数为版本发生变化的表名集合）"""
+        self._listeners.append(listener)
+
+    def refresh(self) -> bool:
+        """同步其它进程提交的版本，返回版本是否可信（进程内存储无需同步）"""
+        return True
+
+    def version(self, table: str) -> Optional[int]:
+        """
+        表的当前版本
+
+        Returns:
+            版本号；共享存储不可用、无法确认版本时为None（调用方应绕过缓存）
+        """
+        if not self.refresh():
+            return None
+        return self._versions.get(table, 0)
+
+    def bump(self, tables: Iterable[str]) -> None:
+        """表的版本加一（事务提交后调用）"""
+        tables = set(tables)
+        if not tables:
+            return
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+            self.bumps += len(tables)
+        self._notify(tables)
+
+    def _notify(self, tables: Set[str]) -> None:
+        for listener in self._listeners:
+            listener(tables)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "store": "sqlite" if self.shared else "memory",
+                "tables": len(self._versions),
+                "bumps": self.bumps,
+                "remote_changes": self.remote_changes,
+            }
+
+
+class SQLiteTableVersions(TableVersions):
+    """共享 SQLite 文件中的表版本号（多工作进程共用）"""
+
+    shared = True
+
+    def __init__(self, path: Path):
+        super().__init__()
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_table_versions ("
+            "table_name TEXT PRIMARY KEY, version INTEGER NOT NULL)"
+        )
+        self.refresh()
+
+    def _connect(self) -> sqlite3.Connection:
+        """每个线程一个连接（自动提交模式，事务显式开启）"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.data_version = None
+        return conn
+
+    def _apply(self, versions: Dict[str, int], local_tables: Set[str] = frozenset()) -> None:
+        """合并读到的版本（只前进不后退），通知发生变化的表"""
+        with self._lock:
+            changed = {table for table, version in versions.items() if version > self._versions.get(table, 0)}
+            for table in changed:
+                self._versions[table] = versions[table]
+            self.remote_changes += len(changed - local_tables)
+        if changed:
+            self._notify(changed)
+
+    def refresh(self) -> bool:
+        try:
+            conn = self._connect()
+            data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version == self._local.data_version:
+                return True
+            versions = dict(conn.execute("SELECT table_name, version FROM cache_table_versions").fetchall())
+            self._local.data_version = data_version
+        except sqlite3.Error as e:
+            logger.warning(f"读取缓存版本失败: {e}")
+            return False
+        self._apply(versions)
+        return True
+
+    def bump(self, tables: Iterable[str]) -> None:
+        tables = set(tables)
+        if not tables:
+            return
+        try:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "INSERT INTO cache_table_versions (table_name, version) VALUES (?, 1) "
+                    "ON CONFLICT(table_name) DO UPDATE SET version = version + 1",
+                    [(table,) for table in sorted(tables)]
+                )
+                versions = dict(conn.execute("SELECT table_name, version FROM cache_table_versions").fetchall())
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            # 只清理本进程的缓存（版本号不动，以免本地版本超前于共享版本而漏掉其它进程的修改），
+            # 其它工作进程要等缓存过期（CACHE_TTL）才能看到这次修改
+            logger.error(f"更新缓存版本失败，仅在本进程内失效: {e}")
+            self._notify(tables)
+            return
+        with self._lock:
+            self.bumps += len(tables)
+        self._apply(versions, tables)
+
+
+def create_table_versions() -> TableVersions:
+    """按配置创建版本号存储"""
+    if settings.CACHE_VERSION_STORE == "sqlite":
+        return SQLiteTableVersions(Path(settings.CACHE_VERSION_DB_PATH))
+    return TableVersions()
+
+
+table_versions = create_table_versions()
+
+
+class VersionedCache:
+    """
+    依赖一组表的计算结果缓存（LRU + TTL，线程安全）
+
+    缓存项记录写入时各依赖表的版本（stamp）；任一依赖表的版本变化后清空缓存，
+    读取时版本与当前不一致的缓存项也不会返回。调用方在读取数据库之前取 stamp，
+    写入时 stamp 已过期（期间有提交）的结果不保存。
+    """
+
+    def __init__(
+        self,
+        tables: Iterable[str],
+        max_size: int,
+        ttl: Optional[float] = None,
+        versions: TableVersions = table_versions
+    ):
+        self.tables = tuple(sorted(tables))
+        self.max_size = max_size
+        self.ttl = settings.CACHE_TTL if ttl is None else ttl
+        self.versions = versions
+        self._entries: "OrderedDict[Hashable, Tuple[Tuple[int, ...], float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        versions.subscribe(self._on_tables_changed)
+
+    def stamp(self) -> Optional[Tuple[int, ...]]:
+        """依赖表的当前版本，无法确认时为None（不使用缓存）"""
+        stamp = tuple(self.versions.version(table) for table in self.tables)
+        return None if None in stamp else stamp
+
+    def get(self, key: Hashable) -> Any:
+        """读取缓存，未命中返回None"""
+        stamp = self.stamp()
+        if stamp is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] != stamp or entry[1] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def put(self, key: Hashable, value: Any, stamp: Optional[Tuple[int, ...]]) -> None:
+        """写入缓存（stamp 为读取数据前取得的版本）"""
+        if stamp is None or self.max_size <= 0 or self.ttl <= 0 or stamp != self.stamp():
+            return
+        with self._lock:
+            self._entries[key] = (stamp, time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _on_tables_changed(self, tables: Set[str]) -> None:
+        if not tables.isdisjoint(self.tables):
+            self.clear()
@@ -0,0 +1,296 @@
+"""
+KPI阈值预警服务
+
+周期性地按ID分批加载启用的KPI及其缓存的最新值，用NumPy一次性判定整批KPI的
+阈值状态，只为状态发生变化的KPI批量写入 kpi_alerts。每个KPI的上一次状态取自
+其最新一条阈值预警，恢复正常时写入 info 级别的预警。阈值方向不是 above/below
+的KPI不参与评估（与 KPI.status 一致，视为正常）。
+
+多工作进程部署时每个进程都会启动评估循环，但只有持有 kpi_alert_leases 中租约的
+进程执行评估；持有者退出后租约到期，由其它进程接管。
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import select, insert, update, func, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from ..models.kpi import KPI, KPIAlert, KPIAlertLease
+from ..utils.exceptions import DatabaseError
+
+logger = logging.getLogger(__name__)
+
+# 阈值状态，下标即严重程度等级（info 表示正常/已恢复）
+SEVERITY_LEVELS = ("info", "warning", "critical")
+
+THRESHOLD_ALERT_TYPE = "threshold"
+
+# 参与评估的阈值方向
+THRESHOLD_DIRECTIONS = ("above", "below")
+
+# 阈值评估循环的租约名称
+ALERT_LEASE_NAME = "threshold_evaluation"
+
+# 每批评估的KPI数量
+DEFAULT_ALERT_BATCH_SIZE = 5000
+
+
+def evaluate_thresholds(
+    values: np.ndarray,
+    warning: np.ndarray,
+    critical: np.ndarray,
+    below: np.ndarray
+) -> np.ndarray:
+    """
+    批量判定阈值状态，判定规则与 KPI.status 一致
+
+    Args:
+        values: 当前值
+        warning: 警告阈值（未设置为NaN）
+        critical: 严重阈值（未设置为NaN）
+        below: 阈值方向是否为 below
+
+    Returns:
+        状态等级数组（SEVERITY_LEVELS 的下标）
+    """
+    with np.errstate(invalid="ignore"):
+        # 与NaN比较恒为False，未设置的阈值不会触发
+        hit_critical = np.where(below, values <= critical, values >= critical)
+        hit_warning = np.where(below, values <= warning, values >= warning)
+    levels = np.zeros(len(values), dtype=np.int8)
+    levels[hit_warning] = 1
+    levels[hit_critical] = 2
+    return levels
+
+
+def _threshold_array(thresholds: List[Optional[float]]) -> np.ndarray:
+    """阈值转为数组，KPI.status 不会使用的阈值（未设置或为0）记为NaN"""
+    return np.array([value if value else np.nan for value in thresholds], dtype=np.float64)
+
+
+def _alert_message(name: str, level: int, value: float, threshold: Optional[float], below: bool) -> str:
+    """生成预警消息"""
+    if level == 0:
+        return f"KPI「{name}」已恢复正常，当前值 {value:g}"
+    label = "严重阈值" if level == 2 else "警告阈值"
+    direction = "低于" if below else "高于"
+    return f"KPI「{name}」当前值 {value:g} {direction}{label} {threshold:g}"
+
+
+class KPIAlertService:
+    """KPI阈值预警服务类"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def _previous_levels(self, first_id: int, last_id: int) -> Dict[int, int]:
+        """读取ID区间内各KPI最新一条阈值预警的状态等级"""
+        latest_ids = (
+            select(func.max(KPIAlert.id))
+            .where(
+                KPIAlert.alert_type == THRESHOLD_ALERT_TYPE,
+                KPIAlert.kpi_id.between(first_id, last_id)
+            )
+            .group_by(KPIAlert.kpi_id)
+        )
+        result = await self.db.execute(
+            select(KPIAlert.kpi_id, KPIAlert.severity).where(KPIAlert.id.in_(latest_ids))
+        )
+        return {kpi_id: SEVERITY_LEVELS.index(severity) for kpi_id, severity in result.all()}
+
+    async def _evaluate_batch(self, rows: List[Any], now: datetime) -> int:
+        """评估一批KPI并写入状态变化的预警，返回写入的预警数"""
+        kpi_ids = np.array([row.id for row in rows], dtype=np.int64)
+        values = np.array([row.current_value or 0.0 for row in rows], dtype=np.float64)
+        warning = _threshold_array([row.warning_threshold for row in rows])
+        critical = _threshold_array([row.critical_threshold for row in rows])
+        below = np.array([row.threshold_direction == "below" for row in rows], dtype=bool)
+
+        levels = evaluate_thresholds(values, warning, critical, below)
+
+        previous = await self._previous_levels(int(kpi_ids[0]), int(kpi_ids[-1]))
+        previous_levels = np.array(
+            [previous.get(kpi_id, 0) for kpi_id in kpi_ids.tolist()], dtype=np.int8
+        )
+        changed = np.flatnonzero(levels != previous_levels)
+        if not len(changed):
+            return 0
+
+        alerts = []
+        for i in changed.tolist():
+            level = int(levels[i])
+            threshold = rows[i].critical_threshold if level == 2 else rows[i].warning_threshold
+            alerts.append({
+                "kpi_id": int(kpi_ids[i]),
+                "alert_type": THRESHOLD_ALERT_TYPE,
+                "severity": SEVERITY_LEVELS[level],
+                "message": _alert_message(rows[i].name, level, float(values[i]), threshold, bool(below[i])),
+                "trigger_value": float(values[i]),
+                "is_acknowledged": False,
+                "created_at": now,
+                "updated_at": now,
+            })
+        await self.db.execute(insert(KPIAlert), alerts)
+        return len(alerts)
+
+    async def run_cycle(
+        self,
+        after_id: int = 0,
+        time_budget: Optional[float] = None,
+        batch_size: int = DEFAULT_ALERT_BATCH_SIZE
+    ) -> Dict[str, Any]:
+        """
+        执行一轮阈值评估
+
+        按ID顺序分批处理，每批单独提交；超出时间预算时在批次边界停止，
+        返回的 next_id 供下一轮从断点继续。没有数据点或阈值方向无效的KPI不参与评估。
+
+        Args:
+            after_id: 从该ID之后的KPI开始评估
+            time_budget: 本轮时间预算（秒），为None时不限制
+            batch_size: 每批KPI数量
+
+        Returns:
+            包含 evaluated（评估的KPI数）、alerts（写入的预警数）、
+            next_id（未完成时的断点，完成时为None）和 elapsed（耗时）的字典
+
+        Raises:
+            DatabaseError: 数据库操作失败
+        """
+        started = time.perf_counter()
+        evaluated = alerts = 0
+        cursor = after_id
+        try:
+            while True:
+                rows = (await self.db.execute(
+                    select(
+                        KPI.id, KPI.name, KPI.current_value, KPI.warning_threshold,
+                        KPI.critical_threshold, KPI.threshold_direction
+                    )
+                    .where(
+                        KPI.id > cursor,
+                        KPI.is_active == True,
+                        KPI.is_deleted == False,
+                        KPI.latest_recorded_at.isnot(None),
+                        KPI.threshold_direction.in_(THRESHOLD_DIRECTIONS)
+                    )
+                    .order_by(KPI.id)
+                    .limit(batch_size)
+                )).all()
+                if not rows:
+                    cursor = None
+                    break
+
+                alerts += await self._evaluate_batch(rows, datetime.utcnow())
+                await self.db.commit()
+                evaluated += len(rows)
+                cursor = rows[-1].id
+
+                if len(rows) < batch_size:
+                    cursor = None
+                    break
+                if time_budget is not None and time.perf_counter() - started >= time_budget:
+                    break
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            raise DatabaseError(f"KPI阈值评估失败: {str(e)}")
+
+        return {
+            "evaluated": evaluated,
+            "alerts": alerts,
+            "next_id": cursor,
+            "elapsed": time.perf_counter() - started,
+        }
+
+
+def lease_holder() -> str:
+    """当前进程的租约持有者标识"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+async def acquire_lease(db: AsyncSession, name: str, holder: str, duration: float) -> bool:
+    """
+    获取或续期租约
+
+    条件更新（租约属于自己或已到期）保证同一时刻只有一个持有者；
+    租约不存在时插入，并发插入由唯一约束裁决。
+
+    Args:
+        db: 数据库会话
+        name: 租约名称
+        holder: 持有者标识
+        duration: 租约时长（秒）
+
+    Returns:
+        是否持有租约
+    """
+    now = datetime.utcnow()
+    leases = KPIAlertLease.__table__
+    result = await db.execute(
+        update(leases)
+        .where(
+            leases.c.name == name,
+            or_(leases.c.holder == holder, leases.c.expires_at < now)
+        )
+        .values(holder=holder, expires_at=now + timedelta(seconds=duration), updated_at=now)
+    )
+    if result.rowcount:
+        await db.commit()
+        return True
+
+    exists = await db.scalar(select(leases.c.id).where(leases.c.name == name))
+    await db.rollback()
+    if exists is not None:
+        return False
+    try:
+        await db.execute(insert(leases).values(
+            name=name, holder=holder, expires_at=now + timedelta(seconds=duration),
+            created_at=now, updated_at=now
+        ))
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        return False
+    return True
+
+
+async def run_alert_loop(session_factory, interval: float, time_budget: float) -> None:
+    """
+    周期性执行阈值评估（在应用生命周期内作为后台任务运行）
+
+    每轮先获取或续期租约，未持有租约的工作进程跳过本轮。租约时长覆盖两轮
+    间隔，持有者异常退出后最多约两轮由其它进程接管。
+
+    Args:
+        session_factory: 异步会话工厂
+        interval: 两轮评估之间的间隔（秒）
+        time_budget: 每轮时间预算（秒）
+    """
+    holder = lease_holder()
+    lease_duration = 2 * (interval + time_budget)
+    after_id = 0
+    while True:
+        try:
+            async with session_factory() as db:
+                if await acquire_lease(db, ALERT_LEASE_NAME, holder, lease_duration):
+                    stats = await KPIAlertService(db).run_cycle(after_id, time_budget)
+                    after_id = stats["next_id"] or 0
+                    if stats["alerts"]:
+                        logger.info(
+                            f"KPI阈值评估: 评估 {stats['evaluated']} 个KPI，"
+                            f"新增 {stats['alerts']} 条预警，耗时 {stats['elapsed']:.2f}s"
+                        )
+                else:
+                    after_id = 0
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"KPI阈值评估失败: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,330 @@
+"""
+KPI分析服务
+
+从汇总表按 (kpi_id, 时间) 顺序一次读出所有KPI的时间桶，拼成连续的NumPy数组，
+用分段归约（reduceat）一次算出每个KPI的均值、极值、趋势、波动率和达成率。
+结果按 (KPI, 周期, 粒度) 缓存，kpi_rollups 或 kpis 的表版本变化（数据写入、汇总重建、
+KPI配置变更提交）后失效。
+"""
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import SQLAlchemyError
+
+from ..models.kpi import KPI, KPIRollup
+from ..models.process import BusinessProcess
+from ..models.system import BusinessSystem, PATH_UPPER_BOUND_SUFFIX
+from ..schemas.kpi import KPIAnalytics
+from ..utils.exceptions import (
+    DatabaseError, KPINotFoundError, ProcessNotFoundError, SystemNotFoundError, ValidationError
+)
+from .cache_versions import TableVersions, VersionedCache, table_versions
+from .kpi_service import ROLLUP_RESOLUTIONS, DEFAULT_MAX_SERIES_POINTS, bucket_start, choose_resolution
+
+# 缓存的分析结果条数
+ANALYTICS_CACHE_SIZE = 4096
+
+# 分析结果依赖的表（kpi_data 的写入经触发器依赖连带使 kpis 版本变化）
+ANALYTICS_CACHE_TABLES = ("kpi_rollups", "kpis")
+
+# 周期内线性趋势的变化量超过均值的该比例时判定为上升/下降
+TREND_THRESHOLD = 0.05
+
+
+def compute_analytics(
+    kpi_ids: np.ndarray,
+    times: np.ndarray,
+    counts: np.ndarray,
+    sums: np.ndarray,
+    mins: np.ndarray,
+    maxs: np.ndarray,
+    lasts: np.ndarray,
+    targets: Dict[int, Optional[float]]
+) -> Dict[int, Dict[str, object]]:
+    """
+    对按 (KPI, 时间) 排序的时间桶数组分段计算统计量
+
+    趋势为各桶均值对时间的最小二乘斜率在整个周期上的变化量相对均值的比例；
+    波动率为各桶均值的变异系数；达成率为周期内最后一个值相对目标值的百分比。
+
+    Args:
+        kpi_ids: 每个时间桶所属的KPI
+        times: 时间桶起始时间（天）
+        counts, sums, mins, maxs, lasts: 时间桶的数据点数、和、最小值、最大值、最后值
+        targets: {KPI ID: 目标值}
+
+    Returns:
+        {KPI ID: 统计量字典}
+    """
+    if not len(kpi_ids):
+        return {}
+
+    starts = np.flatnonzero(np.r_[True, kpi_ids[1:] != kpi_ids[:-1]])
+    ends = np.r_[starts[1:], len(kpi_ids)]
+    n = (ends - starts).astype(np.float64)
+
+    bucket_avg = sums / counts
+    x = times - np.repeat(times[starts], ends - starts)
+    sx = np.add.reduceat(x, starts)
+    sy = np.add.reduceat(bucket_avg, starts)
+    sxx = np.add.reduceat(x * x, starts)
+    sxy = np.add.reduceat(x * bucket_avg, starts)
+    syy = np.add.reduceat(bucket_avg * bucket_avg, starts)
+
+    denom = n * sxx - sx * sx
+    slope = np.divide(n * sxy - sx * sy, denom, out=np.zeros_like(denom), where=denom > 0)
+    mean = sy / n
+    scale = np.abs(mean)
+    change = slope * x[ends - 1]
+    relative = np.divide(change, scale, out=np.sign(change), where=scale > 0)
+    std = np.sqrt(np.clip(syy / n - mean * mean, 0.0, None))
+    volatility = np.divide(std, scale, out=np.full_like(std, np.nan), where=scale > 0)
+
+    average = np.add.reduceat(sums, starts) / np.add.reduceat(counts, starts)
+    minimum = np.minimum.reduceat(mins, starts)
+    maximum = np.maximum.reduceat(maxs, starts)
+    last = lasts[ends - 1]
+    points = np.add.reduceat(counts, starts)
+
+    results = {}
+    for i, kpi_id in enumerate(kpi_ids[starts].tolist()):
+        if relative[i] > TREND_THRESHOLD:
+            trend = "up"
+        elif relative[i] < -TREND_THRESHOLD:
+            trend = "down"
+        else:
+            trend = "stable"
+        target = targets.get(kpi_id)
+        results[kpi_id] = {
+            "average_value": float(average[i]),
+            "min_value": float(minimum[i]),
+            "max_value": float(maximum[i]),
+            "trend_direction": trend,
+            "volatility": None if np.isnan(volatility[i]) else float(volatility[i]),
+            "achievement_rate": float(last[i] / target * 100) if target else None,
+            "data_points": int(points[i]),
+        }
+    return results
+
+
+class KPIAnalyticsCache(VersionedCache):
+    """KPI分析结果缓存（LRU + TTL，汇总表或KPI表版本变化后失效）"""
+
+    def __init__(
+        self,
+        max_size: int = ANALYTICS_CACHE_SIZE,
+        ttl: Optional[float] = None,
+        versions: TableVersions = table_versions
+    ):
+        super().__init__(ANALYTICS_CACHE_TABLES, max_size, ttl, versions)
+
+
+kpi_analytics_cache = KPIAnalyticsCache()
+
+
+class KPIAnalyticsService:
+    """KPI分析服务类"""
+
+    def __init__(self, db: AsyncSession, cache: KPIAnalyticsCache = kpi_analytics_cache):
+        self.db = db
+        self.cache = cache
+
+    @staticmethod
+    def _resolve_period(period_start: date, period_end: date, resolution: str) -> Tuple[datetime, datetime, str]:
+        """周期转换为 [开始, 结束) 时间范围并确定汇总粒度"""
+        if period_end < period_start:
+            raise ValidationError("结束日期不能早于开始日期")
+        start = datetime.combine(period_start, time.min)
+        end = datetime.combine(period_end + timedelta(days=1), time.min)
+        if resolution == "auto":
+            resolution = choose_resolution(start, end, DEFAULT_MAX_SERIES_POINTS)
+        if resolution not in ROLLUP_RESOLUTIONS:
+            raise ValidationError(f"不支持的汇总粒度: {resolution}")
+        return start, end, resolution
+
+    async def _compute(
+        self,
+        kpi_ids: List[int],
+        start: datetime,
+        end: datetime,
+        resolution: str
+    ) -> Dict[int, Dict[str, object]]:
+        """一次查询读取所有KPI的时间桶并计算统计量"""
+        rows = (await self.db.execute(
+            select(
+                KPIRollup.kpi_id, KPIRollup.bucket_start, KPIRollup.count, KPIRollup.sum,
+                KPIRollup.min, KPIRollup.max, KPIRollup.last_value
+            )
+            .where(
+                KPIRollup.kpi_id.in_(kpi_ids),
+                KPIRollup.resolution == resolution,
+                KPIRollup.bucket_start >= bucket_start(start, resolution),
+                KPIRollup.bucket_start < end,
+                KPIRollup.count > 0
+            )
+            .order_by(KPIRollup.kpi_id, KPIRollup.bucket_start)
+        )).all()
+        targets = dict((await self.db.execute(
+            select(KPI.id, KPI.target_value).where(KPI.id.in_(kpi_ids))
+        )).all())
+        if not rows:
+            return {}
+
+        kpi_col, time_col, count_col, sum_col, min_col, max_col, last_col = zip(*rows)
+        times = np.array(time_col, dtype="datetime64[s]").astype(np.float64) / 86400.0
+        return compute_analytics(
+            np.array(kpi_col, dtype=np.int64),
+            times,
+            np.array(count_col, dtype=np.float64),
+            np.array(sum_col, dtype=np.float64),
+            np.array(min_col, dtype=np.float64),
+            np.array(max_col, dtype=np.float64),
+            np.array(last_col, dtype=np.float64),
+            targets
+        )
+
+    async def get_batch_analytics(
+        self,
+        kpi_ids: List[int],
+        period_start: date,
+        period_end: date,
+        resolution: str = "auto"
+    ) -> List[KPIAnalytics]:
+        """
+        批量获取KPI分析结果
+
+        未命中缓存的KPI合并为一次查询计算。
+
+        Args:
+            kpi_ids: KPI ID列表
+            period_start: 周期开始日期
+            period_end: 周期结束日期（含）
+            resolution: hour, day, month 或 auto（按周期长度选择）
+
+        Returns:
+            与 kpi_ids 顺序一致的分析结果；周期内没有数据的KPI只有 kpi_id 和周期
+
+        Raises:
+            ValidationError: 参数无效
+            DatabaseError: 查询失败
+        """
+        start, end, resolution = self._resolve_period(period_start, period_end, resolution)
+        kpi_ids = list(dict.fromkeys(kpi_ids))
+
+        results: Dict[int, KPIAnalytics] = {}
+        missing = []
+        stamp = self.cache.stamp()
+        for kpi_id in kpi_ids:
+            cached = self.cache.get((kpi_id, period_start, period_end, resolution))
+            if cached is None:
+                missing.append(kpi_id)
+            else:
+                results[kpi_id] = cached
+
+        if missing:
+            try:
+                computed = await self._compute(missing, start, end, resolution)
+            except SQLAlchemyError as e:
+                raise DatabaseError(f"KPI分析计算失败: {str(e)}")
+            for kpi_id in missing:
+                result = KPIAnalytics(
+                    kpi_id=kpi_id,
+                    period_start=period_start,
+                    period_end=period_end,
+                    resolution=resolution,
+                    **computed.get(kpi_id, {})
+                )
+                self.cache.put((kpi_id, period_start, period_end, resolution), result, stamp)
+                results[kpi_id] = result
+
+        return [results[kpi_id] for kpi_id in kpi_ids]
+
+    async def get_analytics(
+        self,
+        kpi_id: int,
+        period_start: date,
+        period_end: date,
+        resolution: str = "auto"
+    ) -> KPIAnalytics:
+        """
+        获取单个KPI的分析结果
+
+        Raises:
+            KPINotFoundError: KPI不存在
+        """
+        exists = await self.db.scalar(
+            select(KPI.id).where(KPI.id == kpi_id, KPI.is_deleted == False)
+        )
+        if exists is None:
+            raise KPINotFoundError("KPI不存在")
+        return (await self.get_batch_analytics([kpi_id], period_start, period_end, resolution))[0]
+
+    async def get_process_analytics(
+        self,
+        process_id: int,
+        period_start: date,
+        period_end: date,
+        resolution: str = "auto"
+    ) -> List[KPIAnalytics]:
+        """
+        获取流程下所有KPI的分析结果
+
+        Raises:
+            ProcessNotFoundError: 流程不存在
+        """
+        process = await self.db.scalar(
+            select(BusinessProcess.id).where(
+                BusinessProcess.id == process_id, BusinessProcess.is_deleted == False
+            )
+        )
+        if process is None:
+            raise ProcessNotFoundError("业务流程不存在")
+        kpi_ids = (await self.db.scalars(
+            select(KPI.id).where(KPI.process_id == process_id, KPI.is_deleted == False).order_by(KPI.id)
+        )).all()
+        return await self.get_batch_analytics(list(kpi_ids), period_start, period_end, resolution)
+
+    async def get_system_analytics(
+        self,
+        system_id: int,
+        period_start: date,
+        period_end: date,
+        resolution: str = "auto",
+        include_subsystems: bool = False
+    ) -> List[KPIAnalytics]:
+        """
+        获取业务系统下所有流程KPI的分析结果
+
+        Args:
+            include_subsystems: 是否包含子系统的KPI
+
+        Raises:
+            SystemNotFoundError: 业务系统不存在
+        """
+        system = await self.db.scalar(
+            select(BusinessSystem).where(
+                BusinessSystem.id == system_id, BusinessSystem.is_deleted == False
+            )
+        )
+        if system is None:
+            raise SystemNotFoundError("业务系统不存在")
+
+        if include_subsystems:
+            in_scope = and_(
+                BusinessSystem.path >= system.path,
+                BusinessSystem.path < system.path + PATH_UPPER_BOUND_SUFFIX,
+                BusinessSystem.is_deleted == False
+            )
+        else:
+            in_scope = BusinessSystem.id == system_id
+        kpi_ids = (await self.db.scalars(
+            select(KPI.id)
+            .join(BusinessProcess, BusinessProcess.id == KPI.process_id)
+            .join(BusinessSystem, BusinessSystem.id == BusinessProcess.system_id)
+            .where(in_scope, BusinessProcess.is_deleted == False, KPI.is_deleted == False)
+            .order_by(KPI.id)
+        )).all()
+        return await self.get_batch_analytics(list(kpi_ids), period_start, period_end, resolution)
@@ -0,0 +1,499 @@
+"""
+KPI历史数据按月归档服务
+
+kpi_data 只保留最近 KPI_HOT_MONTHS 个月的热数据；更早的数据按月搬到独立的
+SQLite 归档文件（archive/kpi_data_YYYY_MM.db），归档文件写入后执行 VACUUM 压缩
+并设为只读。主库的索引和 WAL 只随热数据增长。
+
+查询接口 get_data_points / get_data_page / iter_data_points 同时读取热表和时间
+范围内涉及的归档文件，只查询热数据窗口时不会打开任何归档文件。查询时间统一
+按不带时区的UTC时间处理，带时区的参数先转换。
+"""
+import asyncio
+import os
+import stat
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from sqlalchemy import create_engine, select, delete, func, text, and_, or_
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import SQLAlchemyError
+
+from config.database import db_settings
+from ..models.kpi import KPIData
+from ..utils.exceptions import DatabaseError, ValidationError
+from ..utils.pagination import decode_cursor, encode_cursor
+
+# 归档时每次从热表读取的行数
+ARCHIVE_BATCH_SIZE = 10000
+
+ARCHIVE_FILE_PREFIX = "kpi_data_"
+
+# 数据点分页游标的排序字段
+DATA_POINT_CURSOR_FIELD = "recorded_at"
+
+
+def to_naive_utc(value: datetime) -> datetime:
+    """带时区的时间转为UTC后去掉时区，与库中不带时区的UTC时间可以比较"""
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def month_start(value: datetime) -> datetime:
+    """所在月份的第一天零点"""
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    """月份加减（month 须为月初）"""
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def archive_file_name(month: datetime) -> str:
+    """归档文件名"""
+    return f"{ARCHIVE_FILE_PREFIX}{month.year:04d}_{month.month:02d}.db"
+
+
+def _archive_engine(path: Path, read_only: bool) -> Engine:
+    """创建归档文件的同步引擎"""
+    if read_only:
+        return create_engine(f"sqlite:///file:{path}?mode=ro&uri=true")
+    return create_engine(f"sqlite:///{path}")
+
+
+def _append_rows(engine: Engine, rows: List[Dict[str, Any]]) -> None:
+    """写入归档文件（按ID去重，重复执行归档不会产生重复数据）"""
+    with engine.begin() as conn:
+        conn.execute(KPIData.__table__.insert().prefix_with("OR IGNORE"), rows)
+
+
+def _compact(engine: Engine, path: Path) -> None:
+    """压缩归档文件并设为只读"""
+    with engine.connect() as conn:
+        conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
+    engine.dispose()
+    os.chmod(path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+
+
+def _point_filters(kpi_ids: Optional[List[int]], start: datetime, end: datetime) -> list:
+    """数据点查询条件（kpi_ids 为None时不限KPI）"""
+    filters = [
+        KPIData.recorded_at >= start,
+        KPIData.recorded_at < end,
+        KPIData.is_deleted == False
+    ]
+    if kpi_ids is not None:
+        filters.append(KPIData.kpi_id.in_(kpi_ids))
+    return filters
+
+
+def _after_clause(after: Tuple[datetime, int]):
+    """按 (记录时间, ID) 排序时位于 after 之后的条件"""
+    recorded_at, point_id = after
+    return or_(
+        KPIData.recorded_at > recorded_at,
+        and_(KPIData.recorded_at == recorded_at, KPIData.id > point_id)
+    )
+
+
+def _points_query(
+    kpi_ids: Optional[List[int]],
+    start: datetime,
+    end: datetime,
+    after: Optional[Tuple[datetime, int]],
+    limit: Optional[int]
+):
+    """按 (记录时间, ID) 排序的数据点查询（after/limit 用于分批读取）"""
+    stmt = (
+        select(KPIData.__table__)
+        .where(*_point_filters(kpi_ids, start, end))
+        .order_by(KPIData.recorded_at, KPIData.id)
+        .limit(limit)
+    )
+    if after is not None:
+        stmt = stmt.where(_after_clause(after))
+    return stmt
+
+
+def _read_archive(
+    path: Path,
+    kpi_ids: Optional[List[int]],
+    start: datetime,
+    end: datetime,
+    after: Optional[Tuple[datetime, int]] = None,
+    limit: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """以只读方式读取归档文件中的数据点（按 (记录时间, ID) 排序，after/limit 用于分批读取）"""
+    engine = _archive_engine(path, read_only=True)
+    try:
+        with engine.connect() as conn:
+            result = conn.execute(_points_query(kpi_ids, start, end, after, limit))
+            return [dict(row) for row in result.mappings()]
+    finally:
+        engine.dispose()
+
+
+def _read_archive_latest(path: Path, kpi_ids: List[int]) -> Dict[int, Tuple[float, datetime]]:
+    """读取归档文件中各KPI记录时间最新的数据点（SQLite 中 MAX() 聚合时裸列取自最大值所在行）"""
+    engine = _archive_engine(path, read_only=True)
+    try:
+        with engine.connect() as conn:
+            result = conn.execute(
+                select(KPIData.kpi_id, KPIData.value, func.max(KPIData.recorded_at))
+                .where(KPIData.kpi_id.in_(kpi_ids), KPIData.is_deleted == False)
+                .group_by(KPIData.kpi_id)
+            )
+            return {kpi_id: (value, recorded_at) for kpi_id, value, recorded_at in result.all()}
+    finally:
+        engine.dispose()
+
+
+def _count_archive(path: Path, kpi_ids: Optional[List[int]], start: datetime, end: datetime) -> int:
+    """统计归档文件中的数据点数"""
+    engine = _archive_engine(path, read_only=True)
+    try:
+        with engine.connect() as conn:
+            return conn.scalar(
+                select(func.count(KPIData.id)).where(*_point_filters(kpi_ids, start, end))
+            )
+    finally:
+        engine.dispose()
+
+
+class KPIArchiveService:
+    """KPI历史数据归档服务类"""
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        archive_dir: Optional[Path] = None,
+        hot_months: Optional[int] = None
+    ):
+        self.db = db
+        self.archive_dir = Path(archive_dir or db_settings.kpi_archive_dir)
+        self.hot_months = hot_months if hot_months is not None else db_settings.KPI_HOT_MONTHS
+        if self.hot_months < 1:
+            raise ValidationError("热数据保留月数必须大于0")
+
+    def hot_cutoff(self, now: Optional[datetime] = None) -> datetime:
+        """热数据窗口的起始时间，早于该时间的数据归档"""
+        return add_months(month_start(now or datetime.utcnow()), 1 - self.hot_months)
+
+    def archive_path(self, month: datetime) -> Path:
+        """月份对应的归档文件路径"""
+        return self.archive_dir / archive_file_name(month)
+
+    def list_partitions(self) -> List[Dict[str, Any]]:
+        """
+        列出已有的归档分区
+
+        Returns:
+            按月份排序的分区列表，包含 month、path、size
+        """
+        partitions = []
+        for path in sorted(self.archive_dir.glob(f"{ARCHIVE_FILE_PREFIX}*.db")):
+            year, month = path.stem[len(ARCHIVE_FILE_PREFIX):].split("_")
+            partitions.append({
+                "month": datetime(int(year), int(month), 1),
+                "path": str(path),
+                "size": path.stat().st_size,
+            })
+        return partitions
+
+    async def _archive_month(self, month: datetime) -> int:
+        """
+        将一个月的热数据搬到归档文件，返回搬移的行数
+
+        按ID分批复制：每批写入归档文件后，只删除并提交这一批复制过的行。
+        归档过程中补录到该月的数据不会被误删，下次归档时再搬移。
+        """
+        next_month = add_months(month, 1)
+        in_month = (KPIData.recorded_at >= month, KPIData.recorded_at < next_month)
+        if await self.db.scalar(select(KPIData.id).where(*in_month).limit(1)) is None:
+            return 0
+        path = self.archive_path(month)
+
+        # 补录到已归档月份的数据追加到原文件
+        if path.exists():
+            os.chmod(path, stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP | stat.S_IROTH)
+        engine = _archive_engine(path, read_only=False)
+        await asyncio.to_thread(KPIData.__table__.create, engine, checkfirst=True)
+
+        moved = 0
+        after_id = 0
+        while True:
+            result = await self.db.execute(
+                select(KPIData.__table__)
+                .where(*in_month, KPIData.id > after_id)
+                .order_by(KPIData.id)
+                .limit(ARCHIVE_BATCH_SIZE)
+            )
+            rows = [dict(row) for row in result.mappings()]
+            if not rows:
+                break
+            # 归档文件写入后才删除热数据，且只删除写入的行
+            await asyncio.to_thread(_append_rows, engine, rows)
+            ids = [row["id"] for row in rows]
+            await self.db.execute(delete(KPIData).where(KPIData.id.in_(ids)))
+            await self.db.commit()
+            moved += len(rows)
+            after_id = ids[-1]
+        await asyncio.to_thread(_compact, engine, path)
+        return moved
+
+    async def archive(self, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """
+        归档热数据窗口之前的所有月份
+
+        按批提交；中途失败时已搬移的批次保持归档状态，重新执行即可继续。
+
+        Args:
+            now: 当前时间（默认UTC当前时间）
+
+        Returns:
+            每个归档月份的 month、rows
+
+        Raises:
+            ValidationError: 当前数据库不是SQLite
+            DatabaseError: 归档失败
+        """
+        if self.db.get_bind().dialect.name != "sqlite":
+            raise ValidationError("按月归档文件仅适用于SQLite数据库")
+
+        cutoff = self.hot_cutoff(now)
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        archived = []
+        try:
+            oldest = await self.db.scalar(
+                select(func.min(KPIData.recorded_at)).where(KPIData.recorded_at < cutoff)
+            )
+            month = month_start(oldest) if oldest else cutoff
+            while month < cutoff:
+                rows = await self._archive_month(month)
+                if rows:
+                    archived.append({"month": month, "rows": rows})
+                month = add_months(month, 1)
+            if archived:
+                # 搬走的数据不再留在WAL中
+                await self.db.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
+        except (SQLAlchemyError, OSError) as e:
+            await self.db.rollback()
+            raise DatabaseError(f"KPI数据归档失败: {str(e)}")
+        return archived
+
+    async def get_data_points(
+        self,
+        kpi_id: int,
+        start: datetime,
+        end: datetime,
+        now: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        跨热表和归档分区查询KPI数据点
+
+        Args:
+            kpi_id: KPI ID
+            start: 开始时间
+            end: 结束时间（不含）
+            now: 当前时间（默认UTC当前时间，用于确定热数据窗口）
+
+        Returns:
+            按记录时间排序的数据点字典列表
+
+        Raises:
+            ValidationError: 时间范围无效
+            DatabaseError: 查询失败
+        """
+        start, end = to_naive_utc(start), to_naive_utc(end)
+        if end <= start:
+            raise ValidationError("结束时间必须晚于开始时间")
+
+        try:
+            result = await self.db.execute(_points_query([kpi_id], start, end, None, None))
+            points = [dict(row) for row in result.mappings()]
+
+            for path in self._archived_paths(start, end, now):
+                points.extend(await asyncio.to_thread(_read_archive, path, [kpi_id], start, end))
+        except (SQLAlchemyError, OSError) as e:
+            raise DatabaseError(f"KPI数据查询失败: {str(e)}")
+
+        points.sort(key=lambda point: (point["recorded_at"], point["id"]))
+        return points
+
+    async def get_data_page(
+        self,
+        kpi_id: int,
+        start: datetime,
+        end: datetime,
+        limit: int,
+        cursor: Optional[str] = None,
+        now: Optional[datetime] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        按 (记录时间, ID) 游标分页查询KPI数据点（跨热表和归档分区）
+
+        热表和每个归档分区都按游标定位后最多读取 limit + 1 行；归档分区按月份
+        顺序读取，已读够一页时不再打开更晚的分区。补录到已归档月份、仍留在热表中
+        的数据点与归档数据合并排序，不会被跳过。
+
+        Args:
+            kpi_id: KPI ID
+            start: 开始时间
+            end: 结束时间（不含）
+            limit: 每页数据点数
+            cursor: 上一页返回的游标
+            now: 当前时间（默认UTC当前时间，用于确定热数据窗口）
+
+        Returns:
+            (按记录时间排序的数据点字典列表, 下一页游标)，没有更多数据时游标为None
+
+        Raises:
+            ValidationError: 时间范围或游标无效
+            DatabaseError: 查询失败
+        """
+        start, end = to_naive_utc(start), to_naive_utc(end)
+        if end <= start:
+            raise ValidationError("结束时间必须晚于开始时间")
+        after = None
+        archive_start = start
+        if cursor:
+            after = decode_cursor(cursor, DATA_POINT_CURSOR_FIELD)
+            if not isinstance(after[0], datetime):
+                raise ValidationError("无效的分页游标")
+            archive_start = max(start, after[0])
+
+        try:
+            result = await self.db.execute(_points_query([kpi_id], start, end, after, limit + 1))
+            points = [dict(row) for row in result.mappings()]
+
+            archived = 0
+            for path in self._archived_paths(archive_start, end, now):
+                if archived > limit:
+                    break
+                batch = await asyncio.to_thread(_read_archive, path, [kpi_id], start, end, after, limit + 1)
+                archived += len(batch)
+                points.extend(batch)
+        except (SQLAlchemyError, OSError) as e:
+            raise DatabaseError(f"KPI数据查询失败: {str(e)}")
+
+        points.sort(key=lambda point: (point["recorded_at"], point["id"]))
+        if len(points) <= limit:
+            return points, None
+        last = points[limit - 1]
+        return points[:limit], encode_cursor(DATA_POINT_CURSOR_FIELD, last["recorded_at"], last["id"])
+
+    def _archived_paths(self, start: datetime, end: datetime, now: Optional[datetime] = None) -> List[Path]:
+        """时间范围涉及的已有归档文件（按月份排序）"""
+        paths = []
+        month = month_start(start)
+        while month < min(end, self.hot_cutoff(now)):
+            path = self.archive_path(month)
+            if path.exists():
+                paths.append(path)
+            month = add_months(month, 1)
+        return paths
+
+    async def iter_data_points(
+        self,
+        kpi_ids: Optional[List[int]],
+        start: datetime,
+        end: datetime,
+        batch_size: int = ARCHIVE_BATCH_SIZE,
+        now: Optional[datetime] = None
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        分批读取多个KPI在时间范围内的数据点（跨归档分区和热表）
+
+        先按月份顺序读取归档分区，再按 (记录时间, ID) 分批读取热表；每批最多
+        batch_size 行，内存占用与数据总量无关。每批都已完整读取，调用方可以在
+        批次之间使用同一会话写入。
+
+        Args:
+            kpi_ids: KPI ID列表，为None时读取全部KPI
+            start: 开始时间
+            end: 结束时间（不含）
+            batch_size: 每批行数
+            now: 当前时间（默认UTC当前时间，用于确定热数据窗口）
+
+        Yields:
+            数据点字典列表
+        """
+        start, end = to_naive_utc(start), to_naive_utc(end)
+        for path in self._archived_paths(start, end, now):
+            after = None
+            while True:
+                batch = await asyncio.to_thread(
+                    _read_archive, path, kpi_ids, start, end, after, batch_size
+                )
+                if not batch:
+                    break
+                yield batch
+                after = (batch[-1]["recorded_at"], batch[-1]["id"])
+
+        after = None
+        while True:
+            stmt = _points_query(kpi_ids, start, end, after, batch_size)
+            batch = [dict(row) for row in (await self.db.execute(stmt)).mappings()]
+            if not batch:
+                break
+            yield batch
+            after = (batch[-1]["recorded_at"], batch[-1]["id"])
+
+    async def count_data_points(
+        self,
+        kpi_ids: Optional[List[int]],
+        start: datetime,
+        end: datetime,
+        now: Optional[datetime] = None
+    ) -> int:
+        """统计多个KPI在时间范围内的数据点数（跨归档分区和热表）"""
+        start, end = to_naive_utc(start), to_naive_utc(end)
+        total = await self.db.scalar(
+            select(func.count(KPIData.id)).where(*_point_filters(kpi_ids, start, end))
+        )
+        for path in self._archived_paths(start, end, now):
+            total += await asyncio.to_thread(_count_archive, path, kpi_ids, start, end)
+        return total
+
+    async def data_range(self) -> Optional[Tuple[datetime, datetime]]:
+        """
+        热表和归档分区中数据点覆盖的时间范围
+
+        Returns:
+            (最早记录时间所在月的月初, 最晚记录时间之后)，没有任何数据时为None
+        """
+        oldest, newest = (await self.db.execute(
+            select(func.min(KPIData.recorded_at), func.max(KPIData.recorded_at))
+        )).one()
+        partitions = self.list_partitions()
+        starts = [value for value in (oldest, partitions[0]["month"] if partitions else None) if value]
+        if not starts:
+            return None
+        ends = [value for value in (newest, add_months(partitions[-1]["month"], 1) if partitions else None) if value]
+        return month_start(min(starts)), max(ends) + timedelta(microseconds=1)
+
+    async def get_latest_archived_points(self, kpi_ids: List[int]) -> Dict[int, Tuple[float, datetime]]:
+        """
+        各KPI在归档分区中记录时间最新的数据点
+
+        从最新的分区往前查找，找到的KPI不再查询更早的分区。
+
+        Args:
+            kpi_ids: KPI ID列表
+
+        Returns:
+            {KPI ID: (数值, 记录时间)}，归档中没有数据的KPI不出现在结果中
+        """
+        latest: Dict[int, Tuple[float, datetime]] = {}
+        remaining = list(kpi_ids)
+        for partition in reversed(self.list_partitions()):
+            if not remaining:
+                break
+            found = await asyncio.to_thread(_read_archive_latest, Path(partition["path"]), remaining)
+            latest.update(found)
+            remaining = [kpi_id for kpi_id in remaining if kpi_id not in found]
+        return latest
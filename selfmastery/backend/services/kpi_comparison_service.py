@@ -0,0 +1,218 @@
+"""
+KPI对比服务
+
+将多个KPI不规则的历史数据对齐到同一时间网格后向量化比较。数据取自汇总表
+（最细为小时粒度），一年跨度的比较也只需读取几百个时间桶/每KPI，
+与原始数据点的数量无关。
+"""
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, List
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import SQLAlchemyError
+
+from ..models.kpi import KPI, KPIRollup
+from ..utils.exceptions import DatabaseError, KPINotFoundError, ValidationError
+from .kpi_archive_service import add_months
+from .kpi_service import ROLLUP_RESOLUTIONS, DEFAULT_MAX_SERIES_POINTS, bucket_start, choose_resolution
+
+COMPARISON_TYPES = ("value", "trend", "achievement")
+
+# 单次比较的最大KPI数
+MAX_COMPARISON_KPIS = 100
+
+
+def time_grid(start: datetime, end: datetime, resolution: str) -> List[datetime]:
+    """生成 [start, end) 范围内的时间桶起始时间"""
+    grid = []
+    current = bucket_start(start, resolution)
+    while current < end:
+        grid.append(current)
+        if resolution == "month":
+            current = add_months(current, 1)
+        else:
+            current += ROLLUP_RESOLUTIONS[resolution]
+    return grid
+
+
+def forward_fill(values: np.ndarray) -> np.ndarray:
+    """按行向前填充缺失值（每行第一个观测值之前保持NaN）"""
+    observed = ~np.isnan(values)
+    index = np.where(observed, np.arange(values.shape[1]), 0)
+    np.maximum.accumulate(index, axis=1, out=index)
+    filled = values[np.arange(values.shape[0])[:, None], index]
+    filled[~np.logical_or.accumulate(observed, axis=1)] = np.nan
+    return filled
+
+
+def pairwise_correlation(values: np.ndarray, min_overlap: int = 3) -> np.ndarray:
+    """
+    按两两共同观测的时间桶计算皮尔逊相关系数矩阵
+
+    Args:
+        values: KPI × 时间桶矩阵，缺失为NaN
+        min_overlap: 共同观测少于该数量时结果为NaN
+
+    Returns:
+        KPI × KPI 相关系数矩阵
+    """
+    mask = (~np.isnan(values)).astype(np.float64)
+    x = np.nan_to_num(values)
+    n = mask @ mask.T
+    sx = x @ mask.T
+    sxx = (x * x) @ mask.T
+    sxy = x @ x.T
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = n * sxy - sx * sx.T
+        var = (n * sxx - sx * sx) * (n * sxx - sx * sx).T
+        corr = cov / np.sqrt(var)
+    corr[(n < min_overlap) | ~np.isfinite(corr)] = np.nan
+    return np.clip(corr, -1.0, 1.0)
+
+
+def _to_list(values: np.ndarray) -> List[Any]:
+    """数组转为可序列化的列表（NaN 转为 None）"""
+    return np.where(np.isnan(values), None, np.round(values, 6)).tolist()
+
+
+class KPIComparisonService:
+    """KPI对比服务类"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def _load_matrix(
+        self,
+        kpi_ids: List[int],
+        grid: List[datetime],
+        resolution: str
+    ) -> np.ndarray:
+        """读取汇总数据并填入 KPI × 时间桶 矩阵（桶均值，缺失为NaN）"""
+        rows = (await self.db.execute(
+            select(KPIRollup.kpi_id, KPIRollup.bucket_start, KPIRollup.count, KPIRollup.sum)
+            .where(
+                KPIRollup.kpi_id.in_(kpi_ids),
+                KPIRollup.resolution == resolution,
+                KPIRollup.bucket_start >= grid[0],
+                KPIRollup.bucket_start <= grid[-1],
+                KPIRollup.count > 0
+            )
+        )).all()
+
+        values = np.full((len(kpi_ids), len(grid)), np.nan)
+        if not rows:
+            return values
+        kpi_col, time_col, count_col, sum_col = zip(*rows)
+        row_of = {kpi_id: i for i, kpi_id in enumerate(kpi_ids)}
+        grid_times = np.array(grid, dtype="datetime64[s]")
+        columns = np.searchsorted(grid_times, np.array(time_col, dtype="datetime64[s]"))
+        rows_index = np.fromiter((row_of[kpi_id] for kpi_id in kpi_col), dtype=np.int64, count=len(kpi_col))
+        values[rows_index, columns] = np.array(sum_col, dtype=np.float64) / np.array(count_col, dtype=np.float64)
+        return values
+
+    async def compare(
+        self,
+        kpi_ids: List[int],
+        period_start: date,
+        period_end: date,
+        comparison_type: str = "value",
+        resolution: str = "auto",
+        max_points: int = DEFAULT_MAX_SERIES_POINTS
+    ) -> Dict[str, Any]:
+        """
+        对齐并比较多个KPI
+
+        - value: 对齐后的桶均值序列
+        - trend: 相邻时间桶的变化率序列
+        - achievement: 相对目标值的达成率序列（未设置目标的KPI为空）
+
+        缺失的时间桶沿用上一个观测值；相关系数只按两个KPI都有观测的时间桶计算。
+
+        Args:
+            kpi_ids: KPI ID列表
+            period_start: 周期开始日期
+            period_end: 周期结束日期（含）
+            comparison_type: value, trend 或 achievement
+            resolution: hour, day, month 或 auto（桶数量不超过 max_points 的最细粒度）
+            max_points: 自动选择粒度时的最大时间桶数
+
+        Returns:
+            包含 resolution、grid、kpi_ids、series（KPI × 时间桶）、
+            correlation（KPI × KPI）和 summary（每个KPI的首值、末值、均值、变化率）的字典
+
+        Raises:
+            ValidationError: 参数无效
+            KPINotFoundError: KPI不存在
+            DatabaseError: 查询失败
+        """
+        kpi_ids = list(dict.fromkeys(kpi_ids))
+        if not 1 <= len(kpi_ids) <= MAX_COMPARISON_KPIS:
+            raise ValidationError(f"对比的KPI数量必须在1到{MAX_COMPARISON_KPIS}之间")
+        if comparison_type not in COMPARISON_TYPES:
+            raise ValidationError(f"不支持的比较类型: {comparison_type}")
+        if period_end < period_start:
+            raise ValidationError("结束日期不能早于开始日期")
+
+        start = datetime.combine(period_start, time.min)
+        end = datetime.combine(period_end + timedelta(days=1), time.min)
+        if resolution == "auto":
+            resolution = choose_resolution(start, end, max_points)
+        if resolution not in ROLLUP_RESOLUTIONS:
+            raise ValidationError(f"不支持的汇总粒度: {resolution}")
+        grid = time_grid(start, end, resolution)
+
+        try:
+            targets = dict((await self.db.execute(
+                select(KPI.id, KPI.target_value).where(KPI.id.in_(kpi_ids), KPI.is_deleted == False)
+            )).all())
+            missing = [kpi_id for kpi_id in kpi_ids if kpi_id not in targets]
+            if missing:
+                raise KPINotFoundError(f"KPI不存在: {', '.join(map(str, missing))}")
+            observed = await self._load_matrix(kpi_ids, grid, resolution)
+        except SQLAlchemyError as e:
+            raise DatabaseError(f"KPI对比查询失败: {str(e)}")
+
+        if comparison_type == "achievement":
+            target = np.array([targets[kpi_id] or np.nan for kpi_id in kpi_ids], dtype=np.float64)
+            observed = observed / target[:, None] * 100
+        filled = forward_fill(observed)
+
+        if comparison_type == "trend":
+            previous = filled[:, :-1]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                changes = (filled[:, 1:] - previous) / np.abs(previous)
+            changes[~np.isfinite(changes)] = np.nan
+            series = np.concatenate([np.full((len(kpi_ids), 1), np.nan), changes], axis=1)
+            sampled = series
+        else:
+            series = filled
+            sampled = observed
+        correlation = pairwise_correlation(sampled)
+
+        # 首末值和变化率基于观测值；均值基于实际观测的时间桶（trend 为变化率的均值）
+        has_data = ~np.all(np.isnan(observed), axis=1)
+        first_index = np.argmax(~np.isnan(observed), axis=1)
+        first = np.where(has_data, observed[np.arange(len(kpi_ids)), first_index], np.nan)
+        last = filled[:, -1]
+        counts = np.sum(~np.isnan(sampled), axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.nansum(sampled, axis=1) / counts
+            change = (last - first) / np.abs(first)
+        change[~np.isfinite(change)] = np.nan
+
+        return {
+            "comparison_type": comparison_type,
+            "resolution": resolution,
+            "grid": grid,
+            "kpi_ids": kpi_ids,
+            "series": _to_list(series),
+            "correlation": _to_list(correlation),
+            "summary": [
+                {"kpi_id": kpi_id, "first": first_value, "last": last_value, "mean": mean_value, "change": change_value}
+                for kpi_id, first_value, last_value, mean_value, change_value in zip(
+                    kpi_ids, _to_list(first), _to_list(last), _to_list(mean), _to_list(change)
+                )
+            ],
+        }
@@ -0,0 +1,324 @@
+"""
+KPI数据流式导入服务
+
+逐行解析 NDJSON 或 CSV 请求体，每行（CSV 为每条记录，引号内的字段可以跨行）
+按 KPIDataCreate 校验，校验通过的数据点攒满一批后通过 KPIService.record_data_points
+批量写入并提交。单行错误只记录行号和原因，不会中断整个导入。
+"""
+import codecs
+import csv
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError as PydanticValidationError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.kpi import KPI
+from ..schemas.kpi import KPIDataCreate
+from ..utils.exceptions import ValidationError
+from .base_service import DEFAULT_BULK_CHUNK_SIZE
+from .kpi_service import KPIService
+
+INGEST_FORMATS = ("ndjson", "csv")
+
+# 响应中最多返回的错误行数（错误总数仍完整统计）
+MAX_REPORTED_ERRORS = 1000
+
+# 单行最大长度，防止没有换行符的请求体占满内存
+MAX_LINE_LENGTH = 64 * 1024
+
+
+def detect_format(content_type: Optional[str]) -> str:
+    """
+    根据 Content-Type 判断请求体格式
+
+    Args:
+        content_type: 请求头 Content-Type
+
+    Returns:
+        ndjson 或 csv
+
+    Raises:
+        ValidationError: 不支持的格式
+    """
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+        return "ndjson"
+    if media_type in ("text/csv", "application/csv"):
+        return "csv"
+    raise ValidationError("请求体必须是 NDJSON（application/x-ndjson）或 CSV（text/csv）")
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], skip_blank: bool = True) -> AsyncIterator[Tuple[int, str]]:
+    """
+    将字节流增量切分为文本行
+
+    Args:
+        chunks: 请求体字节块
+        skip_blank: 是否跳过空行（CSV 引号字段内的空行需要保留）
+
+    Yields:
+        (行号, 行内容)，行号从1开始
+
+    Raises:
+        ValidationError: 单行超过 MAX_LINE_LENGTH 或编码不是UTF-8
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    line_no = 0
+    try:
+        async for chunk in chunks:
+            buffer += decoder.decode(chunk)
+            *lines, buffer = buffer.split("\n")
+            for line in lines:
+                line_no += 1
+                line = line.rstrip("\r")
+                if line.strip() or not skip_blank:
+                    yield line_no, line
+            if len(buffer) > MAX_LINE_LENGTH:
+                raise ValidationError(f"第 {line_no + 1} 行超过最大长度 {MAX_LINE_LENGTH}")
+        buffer += decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        raise ValidationError(f"第 {line_no + 1} 行不是有效的UTF-8编码")
+    if buffer.strip():
+        yield line_no + 1, buffer.rstrip("\r")
+
+
+def _ends_in_quoted_field(line: str, in_quoted: bool) -> bool:
+    """
+    按 csv 默认方言扫描一行，判断行尾是否仍在引号字段内（即记录延续到下一行）
+
+    引号只在字段开头才开始引号字段，引号字段内 "" 为转义的引号。
+
+    Args:
+        line: 行内容
+        in_quoted: 行首是否处于引号字段内
+
+    Returns:
+        行尾是否处于引号字段内
+    """
+    field_start = not in_quoted
+    i = 0
+    while i < len(line):
+        char = line[i]
+        if in_quoted:
+            if char == '"':
+                if line[i + 1:i + 2] == '"':
+                    i += 1
+                else:
+                    in_quoted = False
+        elif char == '"' and field_start:
+            in_quoted = True
+        field_start = not in_quoted and char == ","
+        i += 1
+    return in_quoted
+
+
+class _RecordFeed:
+    """csv.reader 的输入，每次提供一条完整记录的文本"""
+
+    def __init__(self):
+        self.record: Optional[str] = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        record, self.record = self.record, None
+        if record is None:
+            raise StopIteration
+        return record
+
+
+async def iter_csv_rows(
+    lines: AsyncIterator[Tuple[int, str]]
+) -> AsyncIterator[Tuple[int, Optional[List[str]], Optional[str]]]:
+    """
+    将文本行组合为CSV记录并解析（引号字段可以包含换行）
+
+    Args:
+        lines: iter_lines(..., skip_blank=False) 产出的文本行
+
+    Yields:
+        (记录起始行号, 字段列表, 错误信息)，引号未闭合时字段列表为None
+
+    Raises:
+        ValidationError: 单条记录超过 MAX_LINE_LENGTH
+    """
+    feed = _RecordFeed()
+    reader = csv.reader(feed)
+    parts: List[str] = []
+    first_line = 0
+    in_quoted = False
+    async for line_no, line in lines:
+        if not parts:
+            if not line.strip():
+                continue
+            first_line = line_no
+        parts.append(line)
+        in_quoted = _ends_in_quoted_field(line, in_quoted)
+        if in_quoted:
+            if sum(len(part) + 1 for part in parts) > MAX_LINE_LENGTH:
+                raise ValidationError(f"第 {first_line} 行起的记录超过最大长度 {MAX_LINE_LENGTH}")
+            continue
+        feed.record = "\n".join(parts)
+        parts = []
+        yield first_line, next(reader), None
+    if parts:
+        yield first_line, None, "引号字段未闭合"
+
+
+async def iter_records(
+    lines: AsyncIterator[Tuple[int, str]],
+    fmt: str
+) -> AsyncIterator[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+    """
+    将文本行解析为记录字典
+
+    CSV 第一条记录为表头；字段值为空字符串时视为未提供。行号为记录起始行。
+
+    Yields:
+        (行号, 记录字典, 错误信息)，解析失败时记录为None
+    """
+    if fmt == "csv":
+        header: Optional[List[str]] = None
+        async for line_no, values, error in iter_csv_rows(lines):
+            if error is not None:
+                yield line_no, None, error
+                continue
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            if len(values) != len(header):
+                yield line_no, None, f"列数 {len(values)} 与表头列数 {len(header)} 不一致"
+                continue
+            yield line_no, {name: value for name, value in zip(header, values) if value != ""}, None
+        return
+
+    async for line_no, line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_no, None, f"JSON解析失败: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield line_no, None, "每行必须是JSON对象"
+            continue
+        yield line_no, record, None
+
+
+def _validation_message(error: PydanticValidationError) -> str:
+    """将模式校验错误压缩为一行"""
+    return "; ".join(
+        f"{'.'.join(str(loc) for loc in item['loc'])}: {item['msg']}" for item in error.errors()
+    )
+
+
+class KPIIngestService:
+    """KPI数据流式导入服务类"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.kpi_service = KPIService(db)
+
+    async def _writable_kpi_ids(self, kpi_ids: List[int]) -> set:
+        """筛选出存在且启用的KPI"""
+        result = await self.db.scalars(
+            select(KPI.id).where(
+                KPI.id.in_(kpi_ids),
+                KPI.is_active == True,
+                KPI.is_deleted == False
+            )
+        )
+        return set(result.all())
+
+    async def _flush(
+        self,
+        pending: List[Tuple[int, Dict[str, Any]]],
+        errors: List[Dict[str, Any]],
+        chunk_size: int
+    ) -> Tuple[int, int]:
+        """写入一批数据点，返回 (写入数, 拒绝数)"""
+        writable = await self._writable_kpi_ids(list({point["kpi_id"] for _, point in pending}))
+        points = []
+        rejected = 0
+        for line_no, point in pending:
+            if point["kpi_id"] in writable:
+                points.append(point)
+            else:
+                rejected += 1
+                self._add_error(errors, line_no, f"KPI {point['kpi_id']} 不存在或未启用")
+        await self.kpi_service.record_data_points(points, chunk_size=chunk_size)
+        return len(points), rejected
+
+    @staticmethod
+    def _add_error(errors: List[Dict[str, Any]], line_no: int, message: str) -> None:
+        """记录错误行（超过上限后只计数）"""
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({"line": line_no, "error": message})
+
+    async def ingest(
+        self,
+        chunks: AsyncIterator[bytes],
+        fmt: str,
+        chunk_size: int = DEFAULT_BULK_CHUNK_SIZE
+    ) -> Dict[str, Any]:
+        """
+        流式导入KPI数据点
+
+        每攒满 chunk_size 个有效数据点写入并提交一次，内存占用与批大小成正比；
+        每批内每个KPI的 current_value 只更新一次。
+
+        Args:
+            chunks: 请求体字节块
+            fmt: ndjson 或 csv
+            chunk_size: 每批写入的数据点数
+
+        Returns:
+            包含 accepted（写入数）、rejected（错误行数）、errors（错误明细，
+            最多 MAX_REPORTED_ERRORS 条）的字典
+
+        Raises:
+            ValidationError: 格式或参数无效
+            DatabaseError: 写入失败（已提交的批次不会回滚）
+        """
+        if fmt not in INGEST_FORMATS:
+            raise ValidationError(f"不支持的导入格式: {fmt}")
+        if chunk_size <= 0:
+            raise ValidationError("chunk_size 必须大于0")
+
+        accepted = rejected = 0
+        errors: List[Dict[str, Any]] = []
+        pending: List[Tuple[int, Dict[str, Any]]] = []
+
+        lines = iter_lines(chunks, skip_blank=fmt == "ndjson")
+        async for line_no, record, error in iter_records(lines, fmt):
+            if error is None:
+                try:
+                    data = KPIDataCreate(**record)
+                except PydanticValidationError as e:
+                    error = _validation_message(e)
+            if error is not None:
+                rejected += 1
+                self._add_error(errors, line_no, error)
+                continue
+
+            pending.append((line_no, {
+                "kpi_id": data.kpi_id,
+                "value": data.value,
+                "recorded_at": data.recorded_at,
+                "source": data.data_source,
+                "notes": data.notes,
+            }))
+            if len(pending) >= chunk_size:
+                written, failed = await self._flush(pending, errors, chunk_size)
+                accepted, rejected = accepted + written, rejected + failed
+                pending = []
+
+        if pending:
+            written, failed = await self._flush(pending, errors, chunk_size)
+            accepted, rejected = accepted + written, rejected + failed
+
+        errors.sort(key=lambda item: item["line"])
+        return {"accepted": accepted, "rejected": rejected, "errors": errors}
@@ -0,0 +1,456 @@
+"""
+KPI报告生成服务
+
+报告以后台任务运行：按批从数据库流式读取数据行并追加写入报告文件，
+内存占用与批大小成正比，与报告行数无关。任务状态和进度保存在
+kpi_report_jobs 表中，任意工作进程都可以查询和下载。
+
+执行中的任务每写入一批都会更新进度；超过 REPORT_JOB_STALE_SECONDS 没有更新的
+未完成任务（工作进程重启后遗留）在启动时或查询时标记为失败。
+"""
+import asyncio
+import html
+import json
+import logging
+from datetime import date, datetime, time, timedelta, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config.settings import get_app_settings
+from ..models.kpi import KPI, KPIRollup, KPIReportJob
+from ..schemas.kpi import KPIReport
+from ..utils.exceptions import NotFoundError, InsufficientPermissionError, ValidationError
+from .kpi_analytics_service import KPIAnalyticsService
+from .kpi_archive_service import KPIArchiveService
+from .kpi_comparison_service import KPIComparisonService, MAX_COMPARISON_KPIS
+from .kpi_service import DEFAULT_MAX_SERIES_POINTS, bucket_start, choose_resolution
+
+logger = logging.getLogger(__name__)
+
+# 支持的输出格式及文件扩展名
+REPORT_FORMATS = {"json": "json", "html": "html", "excel": "xlsx"}
+
+REPORT_MEDIA_TYPES = {
+    "json": "application/json",
+    "html": "text/html",
+    "excel": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+# 单个报告的最大KPI数
+MAX_REPORT_KPIS = 10000
+
+# 每批读取和写入的行数
+REPORT_BATCH_SIZE = 5000
+
+# 汇总报告每次计算分析结果的KPI数
+SUMMARY_KPI_CHUNK = 500
+
+# 未完成的任务状态
+UNFINISHED_STATUSES = ("pending", "running")
+
+INTERRUPTED_MESSAGE = "任务已中断（服务重启），请重新创建"
+
+
+def report_dir() -> Path:
+    """报告文件目录"""
+    return Path(get_app_settings().REPORT_DIR)
+
+
+def _stale_cutoff(stale_after: Optional[float] = None) -> datetime:
+    """早于该时间没有进度更新的未完成任务视为已中断"""
+    if stale_after is None:
+        stale_after = get_app_settings().REPORT_JOB_STALE_SECONDS
+    return datetime.utcnow() - timedelta(seconds=stale_after)
+
+
+class _JSONReportWriter:
+    """JSON报告（rows 为与 columns 对应的数组）"""
+
+    def __init__(self, path: Path):
+        self.file = open(path, "w", encoding="utf-8")
+        self.first_row = True
+
+    def begin(self, meta: Dict[str, Any], columns: List[str]) -> None:
+        header = json.dumps({**meta, "columns": columns}, ensure_ascii=False, default=str)
+        self.file.write(header[:-1] + ', "rows": [\n')
+
+    def write_rows(self, rows: List[List[Any]]) -> None:
+        for row in rows:
+            if not self.first_row:
+                self.file.write(",\n")
+            self.file.write(json.dumps(row, ensure_ascii=False, default=str))
+            self.first_row = False
+
+    def end(self) -> None:
+        self.file.write("\n]}\n")
+        self.file.close()
+
+    def abort(self) -> None:
+        self.file.close()
+
+
+class _HTMLReportWriter:
+    """HTML报告（单个表格）"""
+
+    def __init__(self, path: Path):
+        self.file = open(path, "w", encoding="utf-8")
+
+    def begin(self, meta: Dict[str, Any], columns: List[str]) -> None:
+        title = html.escape(str(meta["title"]))
+        self.file.write(
+            f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>{title}</title></head><body>\n"
+            f"<h1>{title}</h1>\n<p>周期: {meta['period_start']} ~ {meta['period_end']}，"
+            f"生成时间: {meta['generated_at']:%Y-%m-%d %H:%M:%S}</p>\n<table border=\"1\">\n<thead><tr>"
+            + "".join(f"<th>{html.escape(column)}</th>" for column in columns)
+            + "</tr></thead>\n<tbody>\n"
+        )
+
+    def write_rows(self, rows: List[List[Any]]) -> None:
+        self.file.write("".join(
+            "<tr>" + "".join(
+                f"<td>{'' if value is None else html.escape(str(value))}</td>" for value in row
+            ) + "</tr>\n"
+            for row in rows
+        ))
+
+    def end(self) -> None:
+        self.file.write("</tbody>\n</table>\n</body></html>\n")
+        self.file.close()
+
+    def abort(self) -> None:
+        self.file.close()
+
+
+class _ExcelReportWriter:
+    """Excel报告（openpyxl 只写模式，行数据落盘不驻留内存）"""
+
+    def __init__(self, path: Path):
+        from openpyxl import Workbook
+
+        self.path = path
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet("KPI报告")
+
+    def begin(self, meta: Dict[str, Any], columns: List[str]) -> None:
+        self.sheet.append([meta["title"]])
+        self.sheet.append([f"周期: {meta['period_start']} ~ {meta['period_end']}"])
+        self.sheet.append(columns)
+
+    def write_rows(self, rows: List[List[Any]]) -> None:
+        for row in rows:
+            self.sheet.append(row)
+
+    def end(self) -> None:
+        self.workbook.save(self.path)
+
+    def abort(self) -> None:
+        self.workbook.close()
+
+
+REPORT_WRITERS = {
+    "json": _JSONReportWriter,
+    "html": _HTMLReportWriter,
+    "excel": _ExcelReportWriter,
+}
+
+
+class KPIReportService:
+    """KPI报告服务类"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def create_job(self, report: KPIReport, user_id: int) -> KPIReportJob:
+        """
+        创建报告任务（由调用方安排后台执行 run_report_job）
+
+        Args:
+            report: 报告参数
+            user_id: 请求人ID
+
+        Returns:
+            报告任务
+
+        Raises:
+            ValidationError: 参数无效
+        """
+        if report.format not in REPORT_FORMATS:
+            raise ValidationError(f"暂不支持 {report.format} 格式，可选: {', '.join(REPORT_FORMATS)}")
+        if report.period_end < report.period_start:
+            raise ValidationError("结束日期不能早于开始日期")
+        kpi_ids = list(dict.fromkeys(report.kpi_ids))
+        if not 1 <= len(kpi_ids) <= MAX_REPORT_KPIS:
+            raise ValidationError(f"报告的KPI数量必须在1到{MAX_REPORT_KPIS}之间")
+        if report.report_type == "comparison" and len(kpi_ids) > MAX_COMPARISON_KPIS:
+            raise ValidationError(f"对比报告最多包含{MAX_COMPARISON_KPIS}个KPI")
+
+        job = KPIReportJob(
+            requested_by=user_id,
+            title=report.title,
+            report_type=report.report_type,
+            format=report.format,
+            period_start=datetime.combine(report.period_start, time.min),
+            period_end=datetime.combine(report.period_end, time.min),
+            kpi_ids=json.dumps(kpi_ids),
+            status="pending",
+            progress=0.0,
+            rows_written=0
+        )
+        self.db.add(job)
+        await self.db.commit()
+        await self.db.refresh(job)
+        return job
+
+    async def get_job(self, job_id: int, user_id: int, is_admin: bool = False) -> KPIReportJob:
+        """
+        获取报告任务
+
+        Raises:
+            NotFoundError: 任务不存在
+            InsufficientPermissionError: 不是请求人
+        """
+        job = await self.db.get(KPIReportJob, job_id)
+        if job is None or job.is_deleted:
+            raise NotFoundError("报告任务不存在")
+        if job.requested_by != user_id and not is_admin:
+            raise InsufficientPermissionError("无权访问该报告")
+        if job.status in UNFINISHED_STATUSES and job.updated_at < _stale_cutoff():
+            job.status = "failed"
+            job.error_message = INTERRUPTED_MESSAGE
+            job.finished_at = datetime.utcnow()
+            await self.db.commit()
+            await self.db.refresh(job)
+        return job
+
+
+class _ReportBuilder:
+    """按报告类型流式产出表头和数据行"""
+
+    def __init__(self, db: AsyncSession, job: KPIReportJob):
+        self.db = db
+        self.job = job
+        self.kpi_ids: List[int] = json.loads(job.kpi_ids)
+        self.period_start: date = job.period_start.date()
+        self.period_end: date = job.period_end.date()
+        self.start = job.period_start
+        self.end = job.period_end + timedelta(days=1)
+
+    async def _kpi_names(self) -> Dict[int, Tuple[str, Optional[str], Optional[float]]]:
+        result = await self.db.execute(
+            select(KPI.id, KPI.name, KPI.unit, KPI.target_value).where(
+                KPI.id.in_(self.kpi_ids), KPI.is_deleted == False
+            )
+        )
+        return {kpi_id: (name, unit, target) for kpi_id, name, unit, target in result.all()}
+
+    async def build(self) -> Tuple[List[str], int, AsyncIterator[List[List[Any]]]]:
+        """返回 (表头, 预计行数, 数据行批次迭代器)"""
+        builder = getattr(self, f"_{self.job.report_type}")
+        return await builder()
+
+    async def _summary(self):
+        names = await self._kpi_names()
+        columns = ["KPI ID", "名称", "单位", "目标值", "均值", "最小值", "最大值", "趋势", "波动率", "达成率(%)", "数据点数"]
+
+        async def rows():
+            service = KPIAnalyticsService(self.db)
+            for i in range(0, len(self.kpi_ids), SUMMARY_KPI_CHUNK):
+                chunk = [kpi_id for kpi_id in self.kpi_ids[i:i + SUMMARY_KPI_CHUNK] if kpi_id in names]
+                analytics = await service.get_batch_analytics(chunk, self.period_start, self.period_end)
+                yield [
+                    [
+                        item.kpi_id, *names[item.kpi_id], item.average_value, item.min_value,
+                        item.max_value, item.trend_direction, item.volatility,
+                        item.achievement_rate, item.data_points
+                    ]
+                    for item in analytics
+                ]
+
+        return columns, len(names), rows()
+
+    async def _detailed(self):
+        names = await self._kpi_names()
+        archive = KPIArchiveService(self.db)
+        total = await archive.count_data_points(self.kpi_ids, self.start, self.end)
+        columns = ["KPI ID", "名称", "记录时间", "数值", "来源", "备注"]
+
+        async def rows():
+            async for batch in archive.iter_data_points(self.kpi_ids, self.start, self.end, REPORT_BATCH_SIZE):
+                yield [
+                    [
+                        point["kpi_id"], names.get(point["kpi_id"], ("",))[0], point["recorded_at"],
+                        point["value"], point["source"], point["notes"]
+                    ]
+                    for point in batch
+                ]
+
+        return columns, total, rows()
+
+    async def _trend(self):
+        names = await self._kpi_names()
+        resolution = choose_resolution(self.start, self.end, DEFAULT_MAX_SERIES_POINTS)
+        in_range = (
+            KPIRollup.kpi_id.in_(self.kpi_ids),
+            KPIRollup.resolution == resolution,
+            KPIRollup.bucket_start >= bucket_start(self.start, resolution),
+            KPIRollup.bucket_start < self.end
+        )
+        total = await self.db.scalar(select(func.count(KPIRollup.id)).where(*in_range))
+        columns = ["KPI ID", "名称", f"时间（{resolution}）", "数据点数", "均值", "最小值", "最大值", "期末值"]
+
+        async def rows():
+            stream = await self.db.stream(
+                select(
+                    KPIRollup.kpi_id, KPIRollup.bucket_start, KPIRollup.count, KPIRollup.sum,
+                    KPIRollup.min, KPIRollup.max, KPIRollup.last_value
+                )
+                .where(*in_range)
+                .order_by(KPIRollup.kpi_id, KPIRollup.bucket_start)
+                .execution_options(yield_per=REPORT_BATCH_SIZE)
+            )
+            async for partition in stream.partitions():
+                yield [
+                    [
+                        kpi_id, names.get(kpi_id, ("",))[0], start, count,
+                        total_sum / count if count else None, minimum, maximum, last
+                    ]
+                    for kpi_id, start, count, total_sum, minimum, maximum, last in partition
+                ]
+
+        return columns, total, rows()
+
+    async def _comparison(self):
+        names = await self._kpi_names()
+        result = await KPIComparisonService(self.db).compare(
+            self.kpi_ids, self.period_start, self.period_end, "value"
+        )
+        columns = ["时间"] + [names.get(kpi_id, (str(kpi_id),))[0] for kpi_id in result["kpi_ids"]]
+        grid, series = result["grid"], result["series"]
+
+        async def rows():
+            for i in range(0, len(grid), REPORT_BATCH_SIZE):
+                yield [
+                    [grid[j]] + [values[j] for values in series]
+                    for j in range(i, min(i + REPORT_BATCH_SIZE, len(grid)))
+                ]
+
+        return columns, len(grid), rows()
+
+
+async def _update_job(session_factory, job_id: int, **values) -> None:
+    """在独立会话中更新任务状态（不影响正在流式读取的会话）"""
+    async with session_factory() as db:
+        job = await db.get(KPIReportJob, job_id)
+        for key, value in values.items():
+            setattr(job, key, value)
+        await db.commit()
+
+
+async def recover_report_jobs(session_factory, stale_after: float) -> int:
+    """
+    清理重启前遗留的报告任务（应用启动时调用）
+
+    超过 stale_after 秒没有进度更新的 pending/running 任务标记为失败，并删除这些
+    任务及长时间未写入的临时文件（.part）。其它工作进程中仍在执行的任务每批都会
+    更新进度和临时文件，不会被误判。
+
+    Args:
+        session_factory: 异步会话工厂
+        stale_after: 判定任务中断的无更新时长（秒），单工作进程部署启动时可为0
+
+    Returns:
+        标记为失败的任务数
+    """
+    now = datetime.utcnow()
+    cutoff = _stale_cutoff(stale_after)
+    stale = (
+        KPIReportJob.status.in_(UNFINISHED_STATUSES),
+        KPIReportJob.updated_at <= cutoff
+    )
+    async with session_factory() as db:
+        job_ids = set((await db.scalars(select(KPIReportJob.id).where(*stale))).all())
+        if job_ids:
+            await db.execute(
+                update(KPIReportJob)
+                .where(KPIReportJob.id.in_(job_ids), *stale)
+                .values(status="failed", error_message=INTERRUPTED_MESSAGE, finished_at=now, updated_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+
+    directory = report_dir()
+    if directory.is_dir():
+        cutoff_timestamp = cutoff.replace(tzinfo=timezone.utc).timestamp()
+        for path in directory.glob("kpi_report_*.part"):
+            job_id = path.name[len("kpi_report_"):].split(".", 1)[0]
+            try:
+                if (job_id.isdigit() and int(job_id) in job_ids) or path.stat().st_mtime <= cutoff_timestamp:
+                    path.unlink()
+            except FileNotFoundError:
+                pass
+    return len(job_ids)
+
+
+async def run_report_job(session_factory, job_id: int) -> None:
+    """
+    执行报告任务（作为后台任务运行）
+
+    报告先写入临时文件，完成后改名，下载时不会读到未写完的文件。
+
+    Args:
+        session_factory: 异步会话工厂
+        job_id: 报告任务ID
+    """
+    await _update_job(session_factory, job_id, status="running", started_at=datetime.utcnow())
+    writer = None
+    path = tmp_path = None
+    try:
+        async with session_factory() as db:
+            job = await db.get(KPIReportJob, job_id)
+            directory = report_dir()
+            directory.mkdir(parents=True, exist_ok=True)
+            path = directory / f"kpi_report_{job.id}.{REPORT_FORMATS[job.format]}"
+            tmp_path = path.with_suffix(path.suffix + ".part")
+
+            columns, total, batches = await _ReportBuilder(db, job).build()
+            meta = {
+                "title": job.title,
+                "report_type": job.report_type,
+                "period_start": job.period_start.date(),
+                "period_end": job.period_end.date(),
+                "generated_at": datetime.utcnow(),
+            }
+            writer = await asyncio.to_thread(REPORT_WRITERS[job.format], tmp_path)
+            await asyncio.to_thread(writer.begin, meta, columns)
+
+            written = 0
+            async for rows in batches:
+                await asyncio.to_thread(writer.write_rows, rows)
+                written += len(rows)
+                await _update_job(
+                    session_factory, job_id,
+                    rows_written=written,
+                    progress=min(written / total, 0.99) if total else 0.99
+                )
+
+            await asyncio.to_thread(writer.end)
+            writer = None
+            tmp_path.replace(path)
+
+        await _update_job(
+            session_factory, job_id,
+            status="completed", progress=1.0, file_path=str(path), finished_at=datetime.utcnow()
+        )
+    except Exception as e:
+        logger.error(f"KPI报告 {job_id} 生成失败: {e}")
+        if writer is not None:
+            writer.abort()
+        if tmp_path is not None and tmp_path.exists():
+            tmp_path.unlink()
+        await _update_job(
+            session_factory, job_id,
+            status="failed", error_message=str(e), finished_at=datetime.utcnow()
+        )
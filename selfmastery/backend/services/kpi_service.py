@@ -0,0 +1,451 @@
+"""
+KPI服务
+"""
+from datetime import datetime, timedelta
+from typing import List, Optional, Dict, Any, Iterable, Tuple
+from sqlalchemy import select, insert, update, delete, bindparam, or_, func, case
+from sqlalchemy.dialects import sqlite, postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import aliased
+
+from ..models.kpi import KPI, KPIData, KPIRollup
+from ..utils.exceptions import DatabaseError, KPINotFoundError, ValidationError
+from .base_service import AsyncBaseService, DEFAULT_BULK_CHUNK_SIZE
+from .kpi_archive_service import KPIArchiveService, to_naive_utc
+
+# 数据点允许写入的字段
+DATA_POINT_FIELDS = ("kpi_id", "value", "recorded_at", "source", "notes")
+
+# 汇总粒度，从细到粗排列，值为单个时间桶的近似时长
+ROLLUP_RESOLUTIONS = {
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+    "month": timedelta(days=30),
+}
+
+# 自动选择粒度时单条序列的默认最大点数
+DEFAULT_MAX_SERIES_POINTS = 500
+
+# 回填汇总时每次从原始表读取的行数
+ROLLUP_BACKFILL_BATCH_SIZE = 10000
+
+# 从归档分区修正最新值时每次查询的KPI数
+ARCHIVED_LATEST_CHUNK = 500
+
+
+def latest_per_kpi(points: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+    """
+    找出一批数据点中每个KPI记录时间最新的点（时间相同时取后写入的）
+
+    Args:
+        points: 数据点字典列表
+
+    Returns:
+        {KPI ID: 数据点}
+    """
+    latest: Dict[int, Dict[str, Any]] = {}
+    for point in points:
+        current = latest.get(point["kpi_id"])
+        if current is None or point["recorded_at"] >= current["recorded_at"]:
+            latest[point["kpi_id"]] = point
+    return latest
+
+
+def bucket_start(recorded_at: datetime, resolution: str) -> datetime:
+    """计算记录时间所在时间桶的起始时间"""
+    if resolution == "hour":
+        return recorded_at.replace(minute=0, second=0, microsecond=0)
+    if resolution == "day":
+        return recorded_at.replace(hour=0, minute=0, second=0, microsecond=0)
+    if resolution == "month":
+        return recorded_at.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"不支持的汇总粒度: {resolution}")
+
+
+def aggregate_rollups(points: Iterable[Dict[str, Any]]) -> Dict[Tuple[int, str, datetime], Dict[str, Any]]:
+    """
+    将一批数据点汇总到各粒度的时间桶
+
+    Args:
+        points: 数据点字典，包含 kpi_id、value、recorded_at
+
+    Returns:
+        {(KPI ID, 粒度, 桶起始时间): 汇总值字典}
+    """
+    buckets: Dict[Tuple[int, str, datetime], Dict[str, Any]] = {}
+    for point in points:
+        value, recorded_at = point["value"], point["recorded_at"]
+        for resolution in ROLLUP_RESOLUTIONS:
+            key = (point["kpi_id"], resolution, bucket_start(recorded_at, resolution))
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = {
+                    "count": 1, "sum": value, "min": value, "max": value,
+                    "last_value": value, "last_recorded_at": recorded_at
+                }
+                continue
+            bucket["count"] += 1
+            bucket["sum"] += value
+            bucket["min"] = min(bucket["min"], value)
+            bucket["max"] = max(bucket["max"], value)
+            if recorded_at >= bucket["last_recorded_at"]:
+                bucket["last_value"] = value
+                bucket["last_recorded_at"] = recorded_at
+    return buckets
+
+
+def choose_resolution(start: datetime, end: datetime, max_points: int = DEFAULT_MAX_SERIES_POINTS) -> str:
+    """
+    选择能满足时间范围的汇总粒度：桶数量不超过 max_points 的最细粒度
+
+    Args:
+        start: 开始时间
+        end: 结束时间
+        max_points: 序列最大点数
+
+    Returns:
+        汇总粒度
+    """
+    span = end - start
+    for resolution, width in ROLLUP_RESOLUTIONS.items():
+        if span / width <= max_points:
+            return resolution
+    return "month"
+
+
+class KPIService(AsyncBaseService[KPI]):
+    """KPI服务类"""
+
+    def __init__(self, db: AsyncSession):
+        super().__init__(KPI, db)
+
+    async def _advance_latest(self, points: List[Dict[str, Any]]) -> None:
+        """
+        推进KPI行上的最新值缓存，每个KPI只执行一次更新
+
+        条件更新保证补录的历史数据不会覆盖更新的值。
+        """
+        latest = latest_per_kpi(points)
+        if not latest:
+            return
+        kpis = KPI.__table__
+        stmt = (
+            update(kpis)
+            .where(
+                kpis.c.id == bindparam("b_kpi_id"),
+                or_(
+                    kpis.c.latest_recorded_at.is_(None),
+                    kpis.c.latest_recorded_at <= bindparam("b_recorded_at")
+                )
+            )
+            .values(
+                current_value=bindparam("b_value"),
+                latest_recorded_at=bindparam("b_recorded_at")
+            )
+        )
+        await self.db.execute(stmt, [
+            {"b_kpi_id": kpi_id, "b_value": point["value"], "b_recorded_at": point["recorded_at"]}
+            for kpi_id, point in latest.items()
+        ])
+
+    async def record_data_points(
+        self,
+        points: List[Dict[str, Any]],
+        chunk_size: int = DEFAULT_BULK_CHUNK_SIZE,
+        commit: bool = True
+    ) -> int:
+        """
+        批量写入KPI数据点
+
+        数据点按批插入 kpi_data，并在同一事务中更新各KPI的 current_value 和
+        latest_recorded_at，读取最新值时无需再扫描历史数据；同时把每批数据
+        合并进小时/天/月汇总表，每个时间桶每批只写一次。
+
+        Args:
+            points: 数据点字典列表，包含 kpi_id、value，可选 recorded_at（默认当前时间）、source、notes
+            chunk_size: 每批写入的记录数
+            commit: 是否提交事务
+
+        Returns:
+            写入的数据点数量
+
+        Raises:
+            DatabaseError: 写入失败
+        """
+        if chunk_size <= 0:
+            raise ValueError("chunk_size 必须大于0")
+        if not points:
+            return 0
+
+        now = datetime.utcnow()
+        rows = []
+        for point in points:
+            row = {field: point.get(field) for field in DATA_POINT_FIELDS}
+            row["recorded_at"] = row["recorded_at"] or now
+            rows.append(row)
+
+        try:
+            for start in range(0, len(rows), chunk_size):
+                chunk = rows[start:start + chunk_size]
+                await self.db.execute(insert(KPIData), chunk)
+                await self._advance_latest(chunk)
+                await self._merge_rollups(aggregate_rollups(chunk))
+            if commit:
+                await self.db.commit()
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            raise DatabaseError(f"KPI数据写入失败: {str(e)}")
+
+        return len(rows)
+
+    async def _merge_rollups(self, buckets: Dict[Tuple[int, str, datetime], Dict[str, Any]]) -> None:
+        """将一批时间桶汇总合并进 kpi_rollups（INSERT ... ON CONFLICT DO UPDATE）"""
+        if not buckets:
+            return
+        dialect_name = self.db.get_bind().dialect.name
+        if dialect_name == "sqlite":
+            stmt = sqlite.insert(KPIRollup)
+            least, greatest = func.min, func.max
+        elif dialect_name == "postgresql":
+            stmt = postgresql.insert(KPIRollup)
+            least, greatest = func.least, func.greatest
+        else:
+            raise DatabaseError(f"汇总表不支持当前数据库: {dialect_name}")
+
+        current = KPIRollup.__table__.c
+        excluded = stmt.excluded
+        newer = excluded.last_recorded_at >= current.last_recorded_at
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["kpi_id", "resolution", "bucket_start"],
+            set_={
+                "count": current.count + excluded.count,
+                "sum": current.sum + excluded.sum,
+                "min": least(current.min, excluded.min),
+                "max": greatest(current.max, excluded.max),
+                "last_value": case((newer, excluded.last_value), else_=current.last_value),
+                "last_recorded_at": greatest(current.last_recorded_at, excluded.last_recorded_at),
+                "updated_at": datetime.utcnow(),
+            }
+        )
+        await self.db.execute(stmt, [
+            {"kpi_id": kpi_id, "resolution": resolution, "bucket_start": start, **values}
+            for (kpi_id, resolution, start), values in buckets.items()
+        ])
+
+    async def rebuild_rollups(self, kpi_ids: Optional[List[int]] = None) -> int:
+        """
+        从原始数据重建汇总表（用于首次上线回填或修正数据）
+
+        原始数据经 KPIArchiveService.iter_data_points 读取，包含已归档月份，
+        重建后的汇总不会丢失归档数据。每批汇总后合并进汇总表（跨批次的时间桶由
+        ON CONFLICT 累加），内存占用只与批大小有关。每批读取完毕后才写入，
+        写入时同一连接上没有未读完的游标（asyncpg 不允许）。
+
+        Args:
+            kpi_ids: 需要重建的KPI ID列表，为None时重建全部
+
+        Returns:
+            处理的原始数据点数量
+        """
+        archive = KPIArchiveService(self.db)
+        try:
+            clear = delete(KPIRollup)
+            if kpi_ids is not None:
+                clear = clear.where(KPIRollup.kpi_id.in_(kpi_ids))
+            data_range = await archive.data_range()
+            await self.db.execute(clear)
+
+            processed = 0
+            if data_range is not None:
+                async for batch in archive.iter_data_points(
+                    kpi_ids, *data_range, batch_size=ROLLUP_BACKFILL_BATCH_SIZE
+                ):
+                    await self._merge_rollups(aggregate_rollups(batch))
+                    processed += len(batch)
+            await self.db.commit()
+            return processed
+        except (SQLAlchemyError, OSError) as e:
+            await self.db.rollback()
+            raise DatabaseError(f"KPI汇总重建失败: {str(e)}")
+
+    async def get_series(
+        self,
+        kpi_id: int,
+        start: datetime,
+        end: datetime,
+        resolution: str = "auto",
+        max_points: int = DEFAULT_MAX_SERIES_POINTS
+    ) -> Dict[str, Any]:
+        """
+        获取KPI时间序列
+
+        resolution 为 auto 时选择桶数量不超过 max_points 的最细汇总粒度，
+        一个月的趋势只需读取几百行汇总数据；raw 直接读取原始数据点（包括已归档的月份）。
+
+        Args:
+            kpi_id: KPI ID
+            start: 开始时间
+            end: 结束时间（不含）
+            resolution: raw, hour, day, month 或 auto
+            max_points: 自动选择粒度时的最大点数
+
+        Returns:
+            {"resolution": 实际粒度, "points": [{"time", "count", "sum", "min", "max", "avg", "last"}]}
+
+        Raises:
+            KPINotFoundError: KPI不存在
+            ValidationError: 参数无效
+        """
+        start, end = to_naive_utc(start), to_naive_utc(end)
+        if end <= start:
+            raise ValidationError("结束时间必须晚于开始时间")
+        if resolution == "auto":
+            resolution = choose_resolution(start, end, max_points)
+        if resolution != "raw" and resolution not in ROLLUP_RESOLUTIONS:
+            raise ValidationError(f"不支持的汇总粒度: {resolution}")
+        if not await self.exists(kpi_id):
+            raise KPINotFoundError("KPI不存在")
+
+        if resolution == "raw":
+            data_points = await KPIArchiveService(self.db).get_data_points(kpi_id, start, end)
+            points = [
+                {"time": point["recorded_at"], "count": 1, "sum": point["value"], "min": point["value"],
+                 "max": point["value"], "avg": point["value"], "last": point["value"]}
+                for point in data_points
+            ]
+        else:
+            result = await self.db.scalars(
+                select(KPIRollup)
+                .where(
+                    KPIRollup.kpi_id == kpi_id,
+                    KPIRollup.resolution == resolution,
+                    KPIRollup.bucket_start >= bucket_start(start, resolution),
+                    KPIRollup.bucket_start < end
+                )
+                .order_by(KPIRollup.bucket_start)
+            )
+            points = [
+                {"time": rollup.bucket_start, "count": rollup.count, "sum": rollup.sum,
+                 "min": rollup.min, "max": rollup.max, "avg": rollup.avg, "last": rollup.last_value}
+                for rollup in result.all()
+            ]
+
+        return {"resolution": resolution, "points": points}
+
+    async def get_latest_values(self, kpi_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        批量获取KPI最新值（读取KPI行上的缓存，一次主键查询）
+
+        Args:
+            kpi_ids: KPI ID列表
+
+        Returns:
+            {KPI ID: {"value": 最新值, "recorded_at": 记录时间}}，不存在的KPI不出现在结果中
+        """
+        if not kpi_ids:
+            return {}
+        result = await self.db.execute(
+            select(KPI.id, KPI.current_value, KPI.latest_recorded_at)
+            .where(KPI.id.in_(kpi_ids), KPI.is_deleted == False)
+        )
+        return {
+            kpi_id: {"value": value, "recorded_at": recorded_at}
+            for kpi_id, value, recorded_at in result.all()
+        }
+
+    def _latest_point_column(self, column_name: str = "id"):
+        """每个KPI最新数据点指定列的相关子查询，沿 idx_kpi_data_kpi_time 索引倒序取第一条"""
+        point = aliased(KPIData)
+        return (
+            select(getattr(point, column_name))
+            .where(point.kpi_id == KPI.id, point.is_deleted == False)
+            .order_by(point.recorded_at.desc(), point.id.desc())
+            .limit(1)
+            .scalar_subquery()
+        )
+
+    async def get_latest_points(self, kpi_ids: List[int]) -> Dict[int, KPIData]:
+        """
+        批量获取KPI最新的原始数据点
+
+        每个KPI通过 idx_kpi_data_kpi_time 索引只读取一行，不加载历史数据。
+
+        Args:
+            kpi_ids: KPI ID列表
+
+        Returns:
+            {KPI ID: 最新数据点}，没有数据的KPI不出现在结果中
+        """
+        if not kpi_ids:
+            return {}
+        result = await self.db.scalars(
+            select(KPIData)
+            .join(KPI, KPIData.id == self._latest_point_column())
+            .where(KPI.id.in_(kpi_ids))
+        )
+        return {point.kpi_id: point for point in result.all()}
+
+    async def refresh_latest_values(self, kpi_ids: Optional[List[int]] = None) -> None:
+        """
+        从原始数据重新计算最新值缓存（用于数据修正或删除数据点之后）
+
+        先按热表计算；热表中没有数据点或最新点早于热数据窗口的KPI，
+        再用归档分区中更新的数据点修正。
+
+        Args:
+            kpi_ids: 需要重新计算的KPI ID列表，为None时计算全部
+        """
+        stmt = (
+            update(KPI)
+            .where(self._latest_point_column().isnot(None))
+            .values(
+                current_value=self._latest_point_column("value"),
+                latest_recorded_at=self._latest_point_column("recorded_at")
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if kpi_ids is not None:
+            stmt = stmt.where(KPI.id.in_(kpi_ids))
+
+        try:
+            await self.db.execute(stmt)
+            await self._refresh_archived_latest(kpi_ids)
+            await self.db.commit()
+        except (SQLAlchemyError, OSError) as e:
+            await self.db.rollback()
+            raise DatabaseError(f"KPI最新值刷新失败: {str(e)}")
+
+    async def _refresh_archived_latest(self, kpi_ids: Optional[List[int]]) -> None:
+        """用归档分区中的数据点修正最新值（热表中没有更新的数据点时）"""
+        archive = KPIArchiveService(self.db)
+        if not archive.list_partitions():
+            return
+        hot_point = self._latest_point_column()
+        query = select(KPI.id, KPI.latest_recorded_at, hot_point).where(
+            or_(hot_point.is_(None), KPI.latest_recorded_at < archive.hot_cutoff())
+        )
+        if kpi_ids is not None:
+            query = query.where(KPI.id.in_(kpi_ids))
+        candidates = (await self.db.execute(query)).all()
+
+        updates = []
+        for i in range(0, len(candidates), ARCHIVED_LATEST_CHUNK):
+            chunk = candidates[i:i + ARCHIVED_LATEST_CHUNK]
+            archived = await archive.get_latest_archived_points([kpi_id for kpi_id, _, _ in chunk])
+            for kpi_id, latest_recorded_at, hot_point_id in chunk:
+                point = archived.get(kpi_id)
+                if point is None:
+                    continue
+                # 热表中没有数据点时，KPI行上的值可能来自已删除的数据点，以归档为准
+                if hot_point_id is None or point[1] > latest_recorded_at:
+                    updates.append({"b_kpi_id": kpi_id, "b_value": point[0], "b_recorded_at": point[1]})
+        if not updates:
+            return
+        kpis = KPI.__table__
+        await self.db.execute(
+            update(kpis)
+            .where(kpis.c.id == bindparam("b_kpi_id"))
+            .values(current_value=bindparam("b_value"), latest_recorded_at=bindparam("b_recorded_at")),
+            updates
+        )
@@ -0,0 +1,126 @@
+"""
+密码哈希执行器
+
+bcrypt 每次哈希/校验要占用 100~300ms CPU，直接在 async 处理函数里执行会卡住整个
+事件循环。这里把哈希和校验放到固定大小的专用线程池中执行（bcrypt 计算期间释放GIL），
+并限制排队中的请求数：超过 PASSWORD_HASH_MAX_PENDING 时立即返回 429，
+登录高峰只会让登录本身排队，不会拖慢其它接口。
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from passlib.context import CryptContext
+
+from config.settings import get_app_settings
+from ..utils.exceptions import RateLimitError
+
+settings = get_app_settings()
+
+# 密码加密上下文
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+class PasswordHasher:
+    """有界的密码哈希线程池"""
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._submitted = 0
+        self._completed = 0
+        self._rejected = 0
+        self._wait_seconds = 0.0
+        self._run_seconds = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="password-hash"
+                )
+            return self._executor
+
+    def _timed(self, fn: Callable[..., Any], args: tuple, queued_at: float) -> Any:
+        """在线程池中执行，记录排队和执行耗时"""
+        started = time.perf_counter()
+        with self._lock:
+            self._running += 1
+            self._wait_seconds += started - queued_at
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+                self._run_seconds += time.perf_counter() - started
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        提交到线程池并等待结果
+
+        Raises:
+            RateLimitError: 排队中的请求数已达上限
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise RateLimitError("登录请求过多，请稍后重试")
+            self._pending += 1
+            self._submitted += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._get_executor(), self._timed, fn, args, time.perf_counter()
+            )
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        """获取密码哈希"""
+        return await self._run(pwd_context.hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """验证密码"""
+        return await self._run(pwd_context.verify, plain_password, hashed_password)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取执行器指标
+
+        Returns:
+            包含 workers、max_pending、pending（排队+执行中）、running、queued、
+            submitted、completed、rejected、avg_wait_ms、avg_run_ms 的字典
+        """
+        with self._lock:
+            completed = self._completed
+            return {
+                "workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "running": self._running,
+                "queued": self._pending - self._running,
+                "submitted": self._submitted,
+                "completed": completed,
+                "rejected": self._rejected,
+                "avg_wait_ms": round(self._wait_seconds / completed * 1000, 2) if completed else 0.0,
+                "avg_run_ms": round(self._run_seconds / completed * 1000, 2) if completed else 0.0,
+            }
+
+    def shutdown(self) -> None:
+        """关闭线程池（应用关闭时调用）"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_PENDING)
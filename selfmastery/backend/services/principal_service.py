@@ -0,0 +1,206 @@
+"""
+请求主体（Principal）服务
+
+认证依赖每次请求都要按令牌加载用户，权限检查器又会再次加载同一用户并重建
+角色权限表。这里把用户信息和预先计算好的角色权限集合合成一个只读的
+Principal，每个请求只解析一次（保存在 request.state 中供所有依赖共享），
+并按用户ID做短期TTL缓存。用户记录提交变更后（包括角色、启用状态）缓存立即失效；
+其它工作进程修改用户表时按 users 表版本号失效。
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import FrozenSet, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from config.settings import get_app_settings
+from ..models.user import User
+from ..schemas.user import UserResponse
+from .cache_versions import TableVersions, table_versions
+
+settings = get_app_settings()
+
+# 所有权限名
+ALL_PERMISSIONS = (
+    "can_create_system",
+    "can_edit_system",
+    "can_delete_system",
+    "can_create_process",
+    "can_edit_process",
+    "can_delete_process",
+    "can_create_sop",
+    "can_edit_sop",
+    "can_delete_sop",
+    "can_manage_users",
+    "can_view_analytics",
+)
+
+# 角色对应的权限集合（viewer 只读，没有任何权限）
+ROLE_PERMISSIONS = {
+    # 管理员拥有所有权限
+    "admin": frozenset(ALL_PERMISSIONS),
+    # 管理者拥有大部分权限
+    "manager": frozenset({
+        "can_create_system",
+        "can_edit_system",
+        "can_create_process",
+        "can_edit_process",
+        "can_create_sop",
+        "can_edit_sop",
+        "can_view_analytics",
+    }),
+    # 普通用户拥有基本权限
+    "user": frozenset({
+        "can_create_process",
+        "can_edit_process",
+        "can_create_sop",
+        "can_edit_sop",
+    }),
+    "viewer": frozenset(),
+}
+
+# session.info 中记录待失效用户ID的键（None 表示全部失效）
+USER_CHANGES_KEY = "principal_changed_user_ids"
+
+
+def role_permissions(role: str) -> FrozenSet[str]:
+    """角色对应的权限集合"""
+    return ROLE_PERMISSIONS.get(role, frozenset())
+
+
+class Principal(UserResponse):
+    """已认证的请求主体（用户信息 + 角色权限），在请求间共享，只读"""
+    permissions: FrozenSet[str] = frozenset()
+
+    class Config:
+        from_attributes = True
+        frozen = True
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        """由用户记录构建"""
+        return cls(
+            id=user.id,
+            name=user.name,
+            email=user.email,
+            role=user.role,
+            timezone=user.timezone,
+            is_active=user.is_active,
+            created_at=user.created_at,
+            updated_at=user.updated_at,
+            permissions=role_permissions(user.role)
+        )
+
+    def has_permission(self, permission: str) -> bool:
+        return permission in self.permissions
+
+
+class PrincipalCache:
+    """按用户ID缓存的 Principal（LRU + TTL，线程安全）"""
+
+    def __init__(self, ttl: float, max_size: int, versions: TableVersions):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.versions = versions
+        # 用户ID -> (过期时间, 缓存时的 users 表版本, Principal)
+        self._entries: "OrderedDict[int, Tuple[float, int, Principal]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[Principal]:
+        version = self.versions.version(User.__tablename__)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic() or entry[1] != version:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[2]
+
+    def put(self, principal: Principal, version: Optional[int]) -> None:
+        """缓存 Principal（version 为加载前读取的 users 表版本）"""
+        if self.ttl <= 0 or version is None:
+            return
+        with self._lock:
+            self._entries[principal.id] = (time.monotonic() + self.ttl, version, principal)
+            self._entries.move_to_end(principal.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_ids: Optional[Set[int]] = None) -> None:
+        """使指定用户（为None时全部）的缓存失效"""
+        with self._lock:
+            if user_ids is None:
+                self._entries.clear()
+                return
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+
+principal_cache = PrincipalCache(settings.PRINCIPAL_CACHE_TTL_SECONDS, settings.PRINCIPAL_CACHE_SIZE, table_versions)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_user_changes(session, flush_context):
+    """记录本次事务中有变化的用户（提交后再失效）"""
+    user_ids = session.info.get(USER_CHANGES_KEY, set())
+    if user_ids is None:
+        return
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User) and obj.id:
+            user_ids.add(obj.id)
+    if user_ids:
+        session.info[USER_CHANGES_KEY] = user_ids
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_user_changes(orm_execute_state):
+    """批量 UPDATE/DELETE 用户表时提交后使全部缓存失效"""
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) and \
+            orm_execute_state.bind_mapper is not None and orm_execute_state.bind_mapper.class_ is User:
+        orm_execute_state.session.info[USER_CHANGES_KEY] = None
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_principals(session):
+    """事务提交后使受影响用户的缓存失效"""
+    if USER_CHANGES_KEY in session.info:
+        principal_cache.invalidate(session.info.pop(USER_CHANGES_KEY))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_user_changes(session):
+    """回滚时丢弃记录的变更"""
+    session.info.pop(USER_CHANGES_KEY, None)
+
+
+async def load_principal(
+    db: AsyncSession,
+    user_id: int,
+    cache: PrincipalCache = principal_cache
+) -> Optional[Principal]:
+    """
+    获取用户的 Principal（优先读缓存）
+
+    Args:
+        db: 数据库会话
+        user_id: 用户ID
+
+    Returns:
+        Principal，用户不存在或已删除时为None
+    """
+    principal = cache.get(user_id)
+    if principal is not None:
+        return principal
+
+    version = cache.versions.version(User.__tablename__)
+    user = await db.get(User, user_id)
+    if user is None or user.is_deleted:
+        return None
+    principal = Principal.from_user(user)
+    cache.put(principal, version)
+    return principal
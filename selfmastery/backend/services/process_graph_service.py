@@ -0,0 +1,306 @@
+"""
+流程图服务
+
+把业务系统内的流程连接（ProcessConnection）加载为 CSR（压缩稀疏行）邻接数组，
+按系统缓存（流程或流程连接的表版本变化后失效），可达性、拓扑排序、环检测和
+关键路径都在内存中按层批量计算，不再逐跳懒加载关系。
+"""
+from typing import List, Optional, Dict, Any, Iterable
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from ..models.process import BusinessProcess, ProcessConnection
+from ..models.system import BusinessSystem
+from ..utils.exceptions import SystemNotFoundError, ValidationError
+from .cache_versions import TableVersions, VersionedCache, table_versions
+
+# 缓存的系统流程图数量上限
+GRAPH_CACHE_SIZE = 256
+
+# 流程图依赖的表
+GRAPH_CACHE_TABLES = ("business_processes", "process_connections")
+
+
+def _gather(indptr: np.ndarray, indices: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """一次取出多行的全部邻居（CSR 多行切片拼接）"""
+    if rows.size == 0:
+        return rows
+    starts = indptr[rows]
+    counts = indptr[rows + 1] - starts
+    total = int(counts.sum())
+    if total == 0:
+        return np.empty(0, dtype=indices.dtype)
+    # 每个元素的偏移 = 所在行的起点 + 行内序号
+    offsets = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
+    return indices[offsets]
+
+
+def _gather_edges(indptr: np.ndarray, indices: np.ndarray, rows: np.ndarray):
+    """取出多行的全部边，返回 (源节点数组, 目标节点数组)"""
+    counts = indptr[rows + 1] - indptr[rows]
+    return np.repeat(rows, counts), _gather(indptr, indices, rows)
+
+
+class ProcessGraph:
+    """单个业务系统的流程图（CSR 邻接数组）
+
+    节点为系统内未删除的流程，按ID排序后的下标即节点编号；
+    只包含两端流程都属于该系统的连接。
+    """
+
+    def __init__(self, system_id: int, process_ids: Iterable[int], durations: Iterable[Optional[int]], edges: Iterable[tuple]):
+        self.system_id = system_id
+        self.node_ids = np.asarray(list(process_ids), dtype=np.int64)
+        self.durations = np.asarray([d or 0 for d in durations], dtype=np.int64)
+        self._index = {int(pid): i for i, pid in enumerate(self.node_ids)}
+
+        n = self.node_ids.size
+        pairs = np.asarray(
+            [(self._index[a], self._index[b]) for a, b in edges if a in self._index and b in self._index],
+            dtype=np.int64
+        ).reshape(-1, 2)
+        self.edge_count = len(pairs)
+        self.indptr, self.indices = self._csr(pairs[:, 0], pairs[:, 1], n)
+        self.rev_indptr, self.rev_indices = self._csr(pairs[:, 1], pairs[:, 0], n)
+
+    @staticmethod
+    def _csr(sources: np.ndarray, targets: np.ndarray, n: int):
+        """由边列表构建 CSR 数组"""
+        order = np.argsort(sources, kind="stable")
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=n), out=indptr[1:])
+        return indptr, targets[order]
+
+    @property
+    def node_count(self) -> int:
+        return int(self.node_ids.size)
+
+    def has_process(self, process_id: int) -> bool:
+        """流程是否在图中"""
+        return process_id in self._index
+
+    def _to_nodes(self, process_ids: Iterable[int]) -> np.ndarray:
+        """流程ID转节点编号"""
+        missing = [pid for pid in process_ids if pid not in self._index]
+        if missing:
+            raise ValidationError(f"流程不属于该业务系统: {', '.join(map(str, missing))}")
+        return np.asarray([self._index[pid] for pid in process_ids], dtype=np.int64)
+
+    def _ids(self, nodes: np.ndarray) -> List[int]:
+        """节点编号转流程ID"""
+        return self.node_ids[nodes].tolist()
+
+    def reachable(self, process_ids: List[int], downstream: bool = True) -> Dict[int, List[int]]:
+        """
+        批量计算传递可达的流程
+
+        Args:
+            process_ids: 起点流程ID列表
+            downstream: True 计算下游（受影响的流程），False 计算上游（依赖的流程）
+
+        Returns:
+            {起点流程ID: 可达流程ID列表（不含自身，除非处在环上）}
+        """
+        indptr, indices = (self.indptr, self.indices) if downstream else (self.rev_indptr, self.rev_indices)
+        result = {}
+        for pid, start in zip(process_ids, self._to_nodes(process_ids)):
+            visited = np.zeros(self.node_count, dtype=bool)
+            frontier = np.asarray([start])
+            while frontier.size:
+                neighbors = np.unique(_gather(indptr, indices, frontier))
+                frontier = neighbors[~visited[neighbors]]
+                visited[frontier] = True
+            result[pid] = self._ids(np.flatnonzero(visited))
+        return result
+
+    def _kahn_layers(self, indptr: np.ndarray, indices: np.ndarray):
+        """按层执行 Kahn 算法，返回 (分层节点列表, 未能排序的节点掩码)"""
+        indegree = np.bincount(indices, minlength=self.node_count)
+        done = np.zeros(self.node_count, dtype=bool)
+        frontier = np.flatnonzero(indegree == 0)
+        layers = []
+        while frontier.size:
+            layers.append(frontier)
+            done[frontier] = True
+            indegree -= np.bincount(_gather(indptr, indices, frontier), minlength=self.node_count)
+            frontier = np.flatnonzero((indegree == 0) & ~done)
+        return layers, ~done
+
+    def topological_layers(self) -> List[List[int]]:
+        """
+        分层拓扑排序（同一层内的流程互不依赖，可并行执行）
+
+        Raises:
+            ValidationError: 流程图存在环
+        """
+        layers, remaining = self._kahn_layers(self.indptr, self.indices)
+        if remaining.any():
+            raise ValidationError("流程图存在环，无法进行拓扑排序")
+        return [self._ids(layer) for layer in layers]
+
+    def cyclic_process_ids(self) -> List[int]:
+        """
+        找出位于环上的流程
+
+        正向 Kahn 剩下的是环及其下游，反向 Kahn 剩下的是环及其上游，
+        两者的交集即环上（或两个环之间）的流程。
+        """
+        _, forward = self._kahn_layers(self.indptr, self.indices)
+        if not forward.any():
+            return []
+        _, backward = self._kahn_layers(self.rev_indptr, self.rev_indices)
+        return self._ids(np.flatnonzero(forward & backward))
+
+    def critical_path(self) -> Dict[str, Any]:
+        """
+        计算关键路径（按流程预估时长加权的最长路径）
+
+        Returns:
+            {"process_ids": 关键路径上的流程ID, "total_duration": 总时长（分钟）}
+
+        Raises:
+            ValidationError: 流程图存在环
+        """
+        if self.node_count == 0:
+            return {"process_ids": [], "total_duration": 0}
+
+        layers, remaining = self._kahn_layers(self.indptr, self.indices)
+        if remaining.any():
+            raise ValidationError("流程图存在环，无法计算关键路径")
+
+        # 都没有预估时长时按流程个数计算最长路径
+        weights = self.durations if self.durations.any() else np.ones(self.node_count, dtype=np.int64)
+
+        # finish[v] = weights[v] + max(finish[前驱])，按拓扑层批量松弛
+        best_pred = np.zeros(self.node_count, dtype=np.int64)
+        finish = weights.copy()
+        for layer in layers:
+            finish[layer] = best_pred[layer] + weights[layer]
+            sources, targets = _gather_edges(self.indptr, self.indices, layer)
+            np.maximum.at(best_pred, targets, finish[sources])
+
+        # 从终点沿反向边回溯，选择 finish 恰好等于 finish[v] - weights[v] 的前驱
+        node = int(np.argmax(finish))
+        path = [node]
+        while True:
+            preds = _gather(self.rev_indptr, self.rev_indices, np.asarray([node]))
+            if preds.size == 0:
+                break
+            target = finish[node] - weights[node]
+            candidates = preds[finish[preds] == target]
+            if candidates.size == 0:
+                break
+            node = int(candidates[0])
+            path.append(node)
+
+        path = np.asarray(path[::-1])
+        return {
+            "process_ids": self._ids(path),
+            "total_duration": int(self.durations[path].sum())
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        """流程图概要"""
+        cyclic = self.cyclic_process_ids()
+        return {
+            "system_id": self.system_id,
+            "process_count": self.node_count,
+            "connection_count": self.edge_count,
+            "has_cycle": bool(cyclic),
+            "cyclic_process_ids": cyclic
+        }
+
+
+class ProcessGraphCache(VersionedCache):
+    """按系统缓存流程图（LRU + TTL，流程或流程连接的表版本变化后失效）"""
+
+    def __init__(
+        self,
+        max_size: int = GRAPH_CACHE_SIZE,
+        ttl: Optional[float] = None,
+        versions: TableVersions = table_versions
+    ):
+        super().__init__(GRAPH_CACHE_TABLES, max_size, ttl, versions)
+
+
+process_graph_cache = ProcessGraphCache()
+
+
+class ProcessGraphService:
+    """流程图服务类"""
+
+    def __init__(self, db: AsyncSession, cache: ProcessGraphCache = process_graph_cache):
+        self.db = db
+        self.cache = cache
+
+    async def get_graph(self, system_id: int) -> ProcessGraph:
+        """
+        获取系统的流程图，未缓存时用两次查询加载
+
+        Args:
+            system_id: 业务系统ID
+
+        Returns:
+            流程图
+
+        Raises:
+            SystemNotFoundError: 业务系统不存在
+        """
+        graph = self.cache.get(system_id)
+        if graph is not None:
+            return graph
+        stamp = self.cache.stamp()
+
+        system_exists = await self.db.scalar(
+            select(BusinessSystem.id).where(
+                BusinessSystem.id == system_id,
+                BusinessSystem.is_deleted == False
+            )
+        )
+        if not system_exists:
+            raise SystemNotFoundError("业务系统不存在")
+
+        nodes = (await self.db.execute(
+            select(BusinessProcess.id, BusinessProcess.estimated_duration)
+            .where(BusinessProcess.system_id == system_id, BusinessProcess.is_deleted == False)
+            .order_by(BusinessProcess.id)
+        )).all()
+
+        source = aliased(BusinessProcess)
+        edges = (await self.db.execute(
+            select(ProcessConnection.from_process_id, ProcessConnection.to_process_id)
+            .join(source, source.id == ProcessConnection.from_process_id)
+            .where(source.system_id == system_id, ProcessConnection.is_deleted == False)
+        )).all()
+
+        graph = ProcessGraph(
+            system_id,
+            [row[0] for row in nodes],
+            [row[1] for row in nodes],
+            edges
+        )
+        self.cache.put(system_id, graph, stamp)
+        return graph
+
+    async def get_reachable(self, system_id: int, process_ids: List[int], downstream: bool = True) -> Dict[int, List[int]]:
+        """批量获取流程的下游（或上游）可达流程"""
+        return (await self.get_graph(system_id)).reachable(process_ids, downstream)
+
+    async def get_topological_layers(self, system_id: int) -> List[List[int]]:
+        """获取分层拓扑顺序"""
+        return (await self.get_graph(system_id)).topological_layers()
+
+    async def get_cycles(self, system_id: int) -> List[int]:
+        """获取位于环上的流程ID"""
+        return (await self.get_graph(system_id)).cyclic_process_ids()
+
+    async def get_critical_path(self, system_id: int) -> Dict[str, Any]:
+        """获取关键路径"""
+        return (await self.get_graph(system_id)).critical_path()
+
+    async def get_summary(self, system_id: int) -> Dict[str, Any]:
+        """获取流程图概要"""
+        return (await self.get_graph(system_id)).summary()
@@ -0,0 +1,229 @@
+"""
+全局搜索服务
+"""
+from typing import List, Optional, Dict, Any, Tuple, Type
+from sqlalchemy import text, select, literal_column, table
+from sqlalchemy.sql import Subquery
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import SQLAlchemyError
+
+from ..models.base import BaseModel
+from ..models.search import SEARCH_INDEXES, SearchIndexSpec
+from ..utils.exceptions import DatabaseError, ValidationError
+
+# trigram 分词器只能对不少于3个字符的词使用索引
+MIN_MATCH_TERM_LENGTH = 3
+
+# 单次搜索允许的最大关键词数
+MAX_SEARCH_TERMS = 8
+
+
+def split_search_terms(query: str) -> Tuple[List[str], List[str]]:
+    """
+    拆分搜索关键词
+
+    Args:
+        query: 用户输入的搜索字符串，空白分隔的多个词之间为 AND 关系
+
+    Returns:
+        (可走全文索引的词, 需要按子串匹配的短词)
+
+    Raises:
+        ValidationError: 没有有效关键词
+    """
+    terms = [term for term in query.split() if term][:MAX_SEARCH_TERMS]
+    if not terms:
+        raise ValidationError("搜索关键词不能为空")
+    match_terms = [term for term in terms if len(term) >= MIN_MATCH_TERM_LENGTH]
+    like_terms = [term for term in terms if len(term) < MIN_MATCH_TERM_LENGTH]
+    return match_terms, like_terms
+
+
+def fts_match_expression(terms: List[str]) -> str:
+    """将关键词转换为FTS5查询表达式（每个词按短语匹配，避免语法字符被解释）"""
+    return " ".join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+
+def like_pattern(term: str) -> str:
+    """构建转义后的子串匹配模式"""
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def index_match_ranking(
+    model: Type[BaseModel],
+    term: str,
+    fields: List[str],
+    dialect_name: str
+) -> Optional[Subquery]:
+    """
+    构建走全文索引的子串匹配子查询（带BM25相关度）
+
+    trigram 索引上的短语查询与不区分大小写的 LIKE '%term%' 语义一致，
+    但只需读取索引中命中的行。
+
+    Args:
+        model: 数据模型类
+        term: 匹配的子串
+        fields: 需要匹配的字段，必须都在该实体的索引列中
+        dialect_name: 数据库方言名称
+
+    Returns:
+        命中行的子查询，列 rowid（即 model.id）和 rank（BM25 分数，越小越相关）；
+        数据库不支持、实体未建索引、字段未被索引或关键词过短时返回None，
+        调用方应退回到 LIKE 查询
+    """
+    if dialect_name != "sqlite" or len(term) < MIN_MATCH_TERM_LENGTH:
+        return None
+    spec = next(
+        (spec for spec in SEARCH_INDEXES.values() if spec.table == model.__tablename__),
+        None
+    )
+    if spec is None or not fields or not set(fields) <= set(spec.columns):
+        return None
+
+    expression = "{%s} : %s" % (" ".join(fields), fts_match_expression([term]))
+    weights = ", ".join(str(weight) for weight in spec.weights)
+    return (
+        select(
+            literal_column("rowid").label("rowid"),
+            literal_column(f"bm25({spec.fts_table}, {weights})").label("rank")
+        )
+        .select_from(table(spec.fts_table))
+        .where(text(f"{spec.fts_table} MATCH :fts_match").bindparams(fts_match=expression))
+        .subquery()
+    )
+
+
+class SearchService:
+    """全局搜索服务类
+
+    SQLite 下使用 FTS5 索引并按 BM25 排序；其它数据库退回到 LIKE 查询，
+    结果按ID倒序排列。
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    def _use_index(self) -> bool:
+        """当前数据库是否有全文索引"""
+        return self.db.get_bind().dialect.name == "sqlite"
+
+    def _entity_query(
+        self,
+        spec: SearchIndexSpec,
+        match_terms: List[str],
+        like_terms: List[str],
+        params: Dict[str, Any],
+        count_only: bool = False
+    ) -> str:
+        """
+        构建单个实体的搜索语句
+
+        Args:
+            spec: 实体索引定义
+            match_terms: 走全文索引的词
+            like_terms: 按子串匹配的词
+            params: 绑定参数字典（LIKE 参数写入其中）
+            count_only: 是否只统计匹配数
+
+        Returns:
+            SQL语句
+        """
+        use_index = self._use_index() and match_terms
+        like_op = "LIKE" if self._use_index() else "ILIKE"
+        terms = like_terms if use_index else match_terms + like_terms
+
+        params["is_deleted"] = False
+        conditions = ["t.is_deleted = :is_deleted"]
+        for i, term in enumerate(terms):
+            params[f"like_{i}"] = like_pattern(term)
+            conditions.append("(" + " OR ".join(
+                f"t.{col} {like_op} :like_{i} ESCAPE '\\'" for col in spec.columns
+            ) + ")")
+
+        if use_index:
+            fts = spec.fts_table
+            source = f"{fts} JOIN {spec.table} t ON t.id = {fts}.rowid"
+            conditions.insert(0, f"{fts} MATCH :match")
+            weights = ", ".join(str(weight) for weight in spec.weights)
+            snippet = f"snippet({fts}, -1, '<mark>', '</mark>', '…', 16)"
+            score = f"bm25({fts}, {weights})"
+        else:
+            source = f"{spec.table} t"
+            snippet = f"substr(coalesce(t.{spec.columns[1]}, t.{spec.title_column}), 1, 64)"
+            score = "0.0"
+
+        where = " AND ".join(conditions)
+        if count_only:
+            return (
+                f"SELECT '{spec.entity_type}' AS entity_type, count(*) AS total "
+                f"FROM {source} WHERE {where}"
+            )
+        return (
+            f"SELECT '{spec.entity_type}' AS entity_type, t.id AS id, "
+            f"t.{spec.title_column} AS title, {snippet} AS snippet, {score} AS score, "
+            f"t.updated_at AS updated_at "
+            f"FROM {source} WHERE {where}"
+        )
+
+    async def search(
+        self,
+        query: str,
+        entity_types: Optional[List[str]] = None,
+        skip: int = 0,
+        limit: int = 20
+    ) -> Dict[str, Any]:
+        """
+        跨业务系统、流程、SOP和任务的全局搜索
+
+        Args:
+            query: 搜索字符串
+            entity_types: 限定的实体类型（system, process, sop, task），为空时搜索全部
+            skip: 跳过记录数
+            limit: 返回记录数
+
+        Returns:
+            包含 items（按相关度排序的结果）、facets（各实体类型的匹配数）和 total 的字典
+
+        Raises:
+            ValidationError: 关键词为空或实体类型无效
+            DatabaseError: 查询失败
+        """
+        match_terms, like_terms = split_search_terms(query)
+
+        entity_types = entity_types or list(SEARCH_INDEXES)
+        invalid = [entity for entity in entity_types if entity not in SEARCH_INDEXES]
+        if invalid:
+            raise ValidationError(f"不支持的搜索类型: {', '.join(invalid)}")
+        specs = [SEARCH_INDEXES[entity] for entity in dict.fromkeys(entity_types)]
+
+        params: Dict[str, Any] = {"skip": skip, "limit": limit}
+        if match_terms:
+            params["match"] = fts_match_expression(match_terms)
+
+        order = "score, updated_at DESC, id DESC" if self._use_index() else "id DESC"
+        items_sql = (
+            "SELECT entity_type, id, title, snippet, score FROM ("
+            + " UNION ALL ".join(
+                self._entity_query(spec, match_terms, like_terms, params) for spec in specs
+            )
+            + f") AS results ORDER BY {order} LIMIT :limit OFFSET :skip"
+        )
+        facets_sql = " UNION ALL ".join(
+            self._entity_query(spec, match_terms, like_terms, params, count_only=True)
+            for spec in specs
+        )
+
+        try:
+            items = (await self.db.execute(text(items_sql), params)).mappings().all()
+            facet_rows = (await self.db.execute(text(facets_sql), params)).all()
+        except SQLAlchemyError as e:
+            raise DatabaseError(f"搜索失败: {str(e)}")
+
+        facets = {row.entity_type: row.total for row in facet_rows}
+        return {
+            "items": [dict(item) for item in items],
+            "facets": facets,
+            "total": sum(facets.values())
+        }
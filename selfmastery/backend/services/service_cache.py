@@ -0,0 +1,295 @@
+"""
+BaseService 读缓存
+
+get / get_multi / count / get_by_field 的结果按 (表, 表版本, 操作, 规范化参数) 缓存在
+进程内 LRU 中（条数上限 SERVICE_CACHE_SIZE，过期时间 CACHE_TTL）。缓存的是已提交
+的列值快照，命中时在当前会话中重建持久化对象，不查询数据库。
+
+失效由会话事件驱动：flush 的增删改和经会话执行的批量 INSERT/UPDATE/DELETE（ORM
+实体或 Core 表）记录涉及的表，事务提交后表版本加一，该表的所有旧缓存项随之失效；
+回滚时丢弃记录。
+表版本保存在 cache_versions.table_versions 中，多工作进程部署时由各进程共享。
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Set, Tuple, Type
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.session import make_transient_to_detached
+
+from config.settings import get_app_settings
+from .cache_versions import TableVersions, table_versions
+
+settings = get_app_settings()
+
+# session.info 中记录本事务写过的表的键
+CACHE_CHANGES_KEY = "service_cache_changed_tables"
+
+_MISSING = object()
+
+# 参数无法作为缓存键时的占位值
+UNCACHEABLE = object()
+
+
+class ServiceCache:
+    """按表版本失效的读缓存（LRU + TTL，线程安全）"""
+
+    def __init__(self, max_size: int, ttl: float, versions: TableVersions):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.versions = versions
+        self._entries: "OrderedDict[Tuple, Tuple[float, Any]]" = OrderedDict()
+        # 表名 -> 该表的缓存键，版本变化时据此清理旧缓存项
+        self._table_keys: Dict[str, Set[Tuple]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        versions.subscribe(self._drop_tables)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0 and self.ttl > 0
+
+    def key(self, table: str, *parts: Hashable) -> Optional[Tuple]:
+        """缓存键（包含表的当前版本），版本无法确认时为None"""
+        version = self.versions.version(table)
+        if version is None:
+            return None
+        return (table, version) + parts
+
+    def _remove(self, key: Tuple) -> None:
+        del self._entries[key]
+        keys = self._table_keys.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._table_keys[key[0]]
+
+    def get(self, key: Tuple) -> Any:
+        """读取缓存，未命中返回 _MISSING"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return _MISSING
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                self.evictions += 1
+                self.misses += 1
+                return _MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Tuple, value: Any) -> None:
+        if not self.enabled:
+            return
+        # 读取期间表已被（任一进程）修改的结果不再写入
+        if self.versions.version(key[0]) != key[1]:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            self._table_keys.setdefault(key[0], set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_tables(self, tables: Iterable[str]) -> None:
+        """使表的全部缓存失效（所有工作进程）"""
+        self.versions.bump(tables)
+
+    def _drop_tables(self, tables: Set[str]) -> None:
+        """表版本变化（本进程或其它进程提交）后清理旧版本的缓存项"""
+        with self._lock:
+            for table in tables:
+                for key in list(self._table_keys.get(table, ())):
+                    self._remove(key)
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._table_keys.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """命中、未命中、淘汰、失效计数"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+        stats["versions"] = self.versions.stats()
+        return stats
+
+
+service_cache = ServiceCache(settings.SERVICE_CACHE_SIZE, settings.CACHE_TTL, table_versions)
+
+
+def normalize_filters(filters: Optional[Dict[str, Any]]) -> Any:
+    """
+    过滤条件规范化为可哈希的键（字段排序，IN 列表排序去重）
+
+    Returns:
+        规范化结果，值不可哈希时返回 UNCACHEABLE
+    """
+    if not filters:
+        return ()
+    items = []
+    for field, value in sorted(filters.items()):
+        if isinstance(value, list):
+            try:
+                value = ("in",) + tuple(sorted(set(value)))
+            except TypeError:
+                return UNCACHEABLE
+        try:
+            hash(value)
+        except TypeError:
+            return UNCACHEABLE
+        items.append((field, value))
+    return tuple(items)
+
+
+def _table_of(model: Type) -> str:
+    return model.__table__.name
+
+
+def _cacheable(session: Session, model: Type) -> bool:
+    """会话中有该表未提交的修改时绕过缓存（必须读到本事务自己的写入）"""
+    if not service_cache.enabled:
+        return False
+    if _table_of(model) in session.info.get(CACHE_CHANGES_KEY, ()):
+        return False
+    return not (session.new or session.dirty or session.deleted)
+
+
+def _snapshot(obj) -> Optional[Dict[str, Any]]:
+    """已加载的列值快照，有未加载（过期）的列时返回None"""
+    state = inspect(obj)
+    values = state.dict
+    snapshot = {}
+    for attr in state.mapper.column_attrs:
+        if attr.key not in values:
+            return None
+        value = values[attr.key]
+        snapshot[attr.key] = copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+    return snapshot
+
+
+def _restore(session: Session, model: Type, snapshot: Dict[str, Any]):
+    """在会话中由快照重建持久化对象；会话中已有同一对象时返回None（以会话中的为准）"""
+    mapper = inspect(model)
+    identity_key = mapper.identity_key_from_primary_key((snapshot["id"],))
+    if identity_key in session.identity_map:
+        return None
+    obj = mapper.class_manager.new_instance()
+    # 新建实例没有已提交状态，直接写入属性字典即等同于 set_committed_value
+    obj.__dict__.update(
+        (key, copy.deepcopy(value) if isinstance(value, (dict, list)) else value)
+        for key, value in snapshot.items()
+    )
+    make_transient_to_detached(obj)
+    # load=False 直接按快照建立持久化对象，不查询数据库，也不级联遍历关系
+    return session.merge(obj, load=False)
+
+
+def cache_lookup(session: Session, model: Type, *parts: Hashable) -> Tuple[Optional[Tuple], Any]:
+    """
+    查询缓存
+
+    Returns:
+        (缓存键, 结果)；不可缓存时键为None，未命中时结果为 _MISSING。
+        对象结果已在会话中重建为持久化对象。
+    """
+    if not _cacheable(session, model) or any(part is UNCACHEABLE for part in parts):
+        return None, _MISSING
+    try:
+        key = service_cache.key(_table_of(model), *parts)
+        hash(key)
+    except TypeError:
+        return None, _MISSING
+    if key is None:
+        return None, _MISSING
+    value = service_cache.get(key)
+    if value is _MISSING or not isinstance(value, list):
+        return key, value
+
+    objects = []
+    for snapshot in value:
+        obj = _restore(session, model, snapshot)
+        if obj is None:
+            # 会话里已有对象，放弃本次命中按原路径查询
+            return key, _MISSING
+        objects.append(obj)
+    return key, objects
+
+
+def cache_store(key: Optional[Tuple], value: Any) -> None:
+    """写入缓存（对象列表保存列值快照）"""
+    if key is None:
+        return
+    if isinstance(value, list):
+        snapshots = [_snapshot(obj) for obj in value]
+        if any(snapshot is None for snapshot in snapshots):
+            return
+        value = snapshots
+    service_cache.put(key, value)
+
+
+def is_miss(value: Any) -> bool:
+    return value is _MISSING
+
+
+def _record_tables(session: Session, tables: Iterable[str]) -> None:
+    changed = session.info.setdefault(CACHE_CHANGES_KEY, set())
+    changed.update(tables)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_table_changes(session, flush_context):
+    """记录本次flush涉及的表（提交后再失效）"""
+    tables = {
+        obj.__table__.name
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+        if hasattr(obj, "__table__")
+    }
+    if tables:
+        _record_tables(session, tables)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_table_changes(orm_execute_state):
+    """记录批量 INSERT/UPDATE/DELETE 涉及的表（ORM实体或 Core 表，如 update(KPI.__table__)）"""
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None:
+        table = mapper.local_table.name
+    else:
+        table = orm_execute_state.statement.table.name
+    _record_tables(orm_execute_state.session, {table})
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_tables(session):
+    """事务提交后使涉及表的缓存失效"""
+    tables = session.info.pop(CACHE_CHANGES_KEY, None)
+    if tables:
+        service_cache.invalidate_tables(tables)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_table_changes(session):
+    """回滚时丢弃记录的变更"""
+    session.info.pop(CACHE_CHANGES_KEY, None)
@@ -1,44 +1,126 @@
 """
 业务系统服务
 """
-from typing import List, Optional, Dict, Any
-from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import List, Optional, Dict, Any, Tuple
+from sqlalchemy import select, update, func, case, and_, true, literal
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 from sqlalchemy.exc import SQLAlchemyError
 
-from ..models.system import BusinessSystem
+from ..models.system import BusinessSystem, PATH_UPPER_BOUND_SUFFIX
+from ..models.process import BusinessProcess
+from ..models.sop import SOP
+from ..models.task import Task
 from ..schemas.system import BusinessSystemCreate, BusinessSystemUpdate, BusinessSystemStats
 from ..utils.exceptions import (
     SystemNotFoundError,
+    ProcessNotFoundError,
     DatabaseError,
     AuthorizationError,
     ValidationError
 )
-from .base_service import BaseService
+from .base_service import AsyncBaseService
+from .search_service import index_match_ranking
 
 
-class SystemService(BaseService[BusinessSystem]):
+class SystemService(AsyncBaseService[BusinessSystem]):
     """业务系统服务类"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         super().__init__(BusinessSystem, db)
     
-    def create_system(self, system_data: BusinessSystemCreate, current_user_id: int) -> BusinessSystem:
+    def _hierarchy_by_triggers(self) -> bool:
+        """SQLite 由触发器维护物化路径和深度，其它数据库（如 PostgreSQL）由本服务维护"""
+        return self.db.get_bind().dialect.name == "sqlite"
+    
+    async def _path_under(self, system_id: int, parent_id: Optional[int]) -> Tuple[str, int]:
+        """系统放在 parent_id 下时的 (路径, 深度)"""
+        parent = await self.get(parent_id) if parent_id is not None else None
+        if parent is None:
+            return f"/{system_id}/", 0
+        return f"{parent.path}{system_id}/", parent.depth + 1
+    
+    async def create(self, obj_data: Dict[str, Any]) -> BusinessSystem:
+        """创建业务系统（非SQLite数据库在同一事务中写入物化路径和深度）"""
+        if self._hierarchy_by_triggers():
+            return await super().create(obj_data)
+        try:
+            system = BusinessSystem(**obj_data)
+            self.db.add(system)
+            await self.db.flush()
+            system.path, system.depth = await self._path_under(system.id, system.parent_id)
+            await self.db.commit()
+            await self.db.refresh(system)
+            return system
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            raise e
+    
+    async def update(self, obj_id: int, obj_data: Dict[str, Any]) -> Optional[BusinessSystem]:
+        """
+        更新业务系统
+        
+        调整父系统时整棵子树的路径和深度在同一事务中改写（SQLite 由触发器完成，
+        其它数据库执行一条按路径前缀范围的UPDATE），之后重新读取已加载的对象。
+        """
+        if "parent_id" not in obj_data:
+            return await super().update(obj_id, obj_data)
+        
+        if not self._hierarchy_by_triggers():
+            try:
+                system = await self.get(obj_id)
+                if system is None:
+                    return None
+                if obj_data["parent_id"] != system.parent_id:
+                    await self._rewrite_subtree_paths(system, obj_data["parent_id"])
+            except SQLAlchemyError as e:
+                await self.db.rollback()
+                raise e
+        
+        if await super().update(obj_id, obj_data) is None:
+            return None
+        # 子树中其它行的路径已改写，已加载的对象需要重新读取
+        self.db.expire_all()
+        return await self.get(obj_id)
+    
+    async def _rewrite_subtree_paths(self, system: BusinessSystem, parent_id: Optional[int]) -> None:
+        """把系统子树的路径前缀和深度改写到新父系统下（不提交）"""
+        old_path, old_depth = system.path, system.depth
+        new_path, new_depth = await self._path_under(system.id, parent_id)
+        await self.db.execute(
+            update(BusinessSystem)
+            .where(
+                BusinessSystem.path >= old_path,
+                BusinessSystem.path < old_path + PATH_UPPER_BOUND_SUFFIX
+            )
+            .values(
+                path=literal(new_path) + func.substr(BusinessSystem.path, len(old_path) + 1),
+                depth=BusinessSystem.depth + (new_depth - old_depth)
+            )
+            .execution_options(synchronize_session=False)
+        )
+    
+    async def create_system(self, system_data: BusinessSystemCreate, current_user_id: int) -> BusinessSystem:
         """创建业务系统"""
         try:
             # 确保创建者是系统所有者
             system_dict = system_data.dict()
             system_dict["owner_id"] = current_user_id
             
-            system = self.create(system_dict)
+            if system_dict.get("parent_id") is not None and not await self.get(system_dict["parent_id"]):
+                raise SystemNotFoundError("父系统不存在")
+            
+            system = await self.create(system_dict)
             return system
             
         except SQLAlchemyError as e:
             raise DatabaseError(f"业务系统创建失败: {str(e)}")
     
-    def update_system(self, system_id: int, system_data: BusinessSystemUpdate, current_user_id: int) -> Optional[BusinessSystem]:
+    async def update_system(self, system_id: int, system_data: BusinessSystemUpdate, current_user_id: int) -> Optional[BusinessSystem]:
         """更新业务系统"""
         try:
-            system = self.get(system_id)
+            system = await self.get(system_id)
             if not system:
                 raise SystemNotFoundError("业务系统不存在")
             
@@ -52,16 +134,59 @@ class SystemService(BaseService[BusinessSystem]):
             if not update_data:
                 return system
             
-            updated_system = self.update(system_id, update_data)
+            if "parent_id" in update_data:
+                await self._check_new_parent(system, update_data["parent_id"])
+            
+            updated_system = await self.update(system_id, update_data)
             return updated_system
             
         except SQLAlchemyError as e:
             raise DatabaseError(f"业务系统更新失败: {str(e)}")
     
-    def delete_system(self, system_id: int, current_user_id: int) -> bool:
+    async def _check_new_parent(self, system: BusinessSystem, parent_id: Optional[int]) -> None:
+        """校验新的父系统存在且不在当前系统的子树中"""
+        if parent_id is None:
+            return
+        parent = await self.get(parent_id)
+        if not parent:
+            raise SystemNotFoundError("父系统不存在")
+        if parent.path.startswith(system.path):
+            raise ValidationError("不能将系统移动到自身或其子系统下")
+    
+    async def move_system(self, system_id: int, parent_id: Optional[int], current_user_id: int) -> BusinessSystem:
+        """
+        调整业务系统的父系统
+        
+        子树中所有系统的路径和深度在同一事务中更新（见 update）。
+        
+        Args:
+            system_id: 业务系统ID
+            parent_id: 新的父系统ID，为None时移动为根系统
+            current_user_id: 当前用户ID
+            
+        Returns:
+            更新后的业务系统
+        """
+        try:
+            system = await self.get(system_id)
+            if not system:
+                raise SystemNotFoundError("业务系统不存在")
+            
+            if system.owner_id != current_user_id:
+                raise AuthorizationError("只有系统所有者可以移动系统")
+            
+            await self._check_new_parent(system, parent_id)
+            
+            return await self.update(system_id, {"parent_id": parent_id})
+            
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            raise DatabaseError(f"业务系统移动失败: {str(e)}")
+    
+    async def delete_system(self, system_id: int, current_user_id: int) -> bool:
         """删除业务系统"""
         try:
-            system = self.get(system_id)
+            system = await self.get(system_id)
             if not system:
                 raise SystemNotFoundError("业务系统不存在")
             
@@ -69,40 +194,46 @@ class SystemService(BaseService[BusinessSystem]):
             if system.owner_id != current_user_id:
                 raise AuthorizationError("只有系统所有者可以删除系统")
             
-            # 检查是否有关联的流程或SOP
-            if system.processes or system.sops:
+            # 检查是否有关联的流程（SOP通过流程关联到系统）
+            process_count = await self.db.scalar(
+                select(func.count(BusinessProcess.id)).where(
+                    BusinessProcess.system_id == system_id,
+                    BusinessProcess.is_deleted == False
+                )
+            )
+            if process_count:
                 raise ValidationError("系统下还有关联的流程或SOP，无法删除")
             
-            return self.delete(system_id)
+            return await self.delete(system_id)
             
         except SQLAlchemyError as e:
             raise DatabaseError(f"业务系统删除失败: {str(e)}")
     
-    def get_user_systems(self, user_id: int, skip: int = 0, limit: int = 100) -> List[BusinessSystem]:
+    async def get_user_systems(self, user_id: int, skip: int = 0, limit: int = 100) -> List[BusinessSystem]:
         """获取用户的业务系统列表"""
-        return self.get_multi(
+        return await self.get_multi(
             skip=skip,
             limit=limit,
             filters={"owner_id": user_id}
         )
     
-    def get_systems_by_industry(self, industry: str, skip: int = 0, limit: int = 100) -> List[BusinessSystem]:
+    async def get_systems_by_industry(self, industry: str, skip: int = 0, limit: int = 100) -> List[BusinessSystem]:
         """根据行业获取业务系统列表"""
-        return self.get_multi(
+        return await self.get_multi(
             skip=skip,
             limit=limit,
             filters={"industry": industry}
         )
     
-    def get_systems_by_status(self, status: str, skip: int = 0, limit: int = 100) -> List[BusinessSystem]:
+    async def get_systems_by_status(self, status: str, skip: int = 0, limit: int = 100) -> List[BusinessSystem]:
         """根据状态获取业务系统列表"""
-        return self.get_multi(
+        return await self.get_multi(
             skip=skip,
             limit=limit,
             filters={"status": status}
         )
     
-    def search_systems(
+    async def search_systems(
         self,
         query: str,
         skip: int = 0,
@@ -110,8 +241,12 @@ class SystemService(BaseService[BusinessSystem]):
         industry: Optional[str] = None,
         status: Optional[str] = None,
         owner_id: Optional[int] = None
-    ) -> List[BusinessSystem]:
-        """搜索业务系统"""
+    ) -> Tuple[List[BusinessSystem], int]:
+        """搜索业务系统，返回 (系统列表, 匹配总数)
+
+        关键词、过滤条件和分页在同一条查询中执行；SQLite 下关键词通过全文索引匹配，
+        结果按相关度、ID排序。
+        """
         # 构建过滤条件
         filters = {}
         if industry:
@@ -121,72 +256,236 @@ class SystemService(BaseService[BusinessSystem]):
         if owner_id:
             filters["owner_id"] = owner_id
         
-        # 如果有过滤条件，先应用过滤再搜索
-        if filters:
-            systems = self.get_multi(filters=filters, limit=1000)
-            # 在内存中进行搜索过滤
-            search_results = []
-            for system in systems:
-                if (query.lower() in system.name.lower() or 
-                    (system.description and query.lower() in system.description.lower())):
-                    search_results.append(system)
-            
-            # 应用分页
-            return search_results[skip:skip + limit]
+        term = query.strip()
+        search_fields = ["name", "description"]
+        ranking = index_match_ranking(
+            BusinessSystem, term, search_fields, self.db.get_bind().dialect.name
+        )
+        
+        if ranking is not None:
+            base_stmt = self._build_select(filters=filters).join(
+                ranking, BusinessSystem.id == ranking.c.rowid
+            )
+            stmt = (
+                base_stmt.add_columns(func.count().over().label("total_count"))
+                .order_by(ranking.c.rank, BusinessSystem.id)
+                .offset(skip)
+                .limit(limit)
+            )
+            rows = (await self.db.execute(stmt)).all()
+            systems = [row[0] for row in rows]
+            if rows:
+                total = rows[0].total_count
+            else:
+                # 越过末页时单独计数
+                total = await self.db.scalar(select(func.count()).select_from(base_stmt.subquery()))
         else:
-            # 直接使用数据库搜索
-            return self.search(
-                search_term=query,
-                search_fields=["name", "description"],
+            systems, total, _, _ = await self.search_page(
+                search_term=term,
+                search_fields=search_fields,
                 skip=skip,
-                limit=limit
+                limit=limit,
+                filters=filters
+            )
+        return systems, total
+    
+    async def get_subtree(
+        self,
+        system_id: int,
+        include_self: bool = False,
+        max_depth: Optional[int] = None
+    ) -> List[BusinessSystem]:
+        """
+        获取子系统树（一次范围查询，按先序遍历顺序返回）
+        
+        Args:
+            system_id: 业务系统ID
+            include_self: 是否包含自身
+            max_depth: 相对于当前系统的最大层数，为None时不限制
+            
+        Returns:
+            子系统列表
+        """
+        system = await self.get(system_id)
+        if not system:
+            raise SystemNotFoundError("业务系统不存在")
+        
+        stmt = self._build_select().where(system.subtree_clause(include_self))
+        if max_depth is not None:
+            stmt = stmt.where(BusinessSystem.depth <= system.depth + max_depth)
+        result = await self.db.scalars(stmt.order_by(BusinessSystem.path))
+        return list(result.all())
+    
+    async def get_ancestors(self, system_id: int) -> List[BusinessSystem]:
+        """
+        获取祖先系统（从根到父，一次主键查询）
+        
+        Args:
+            system_id: 业务系统ID
+            
+        Returns:
+            祖先系统列表
+        """
+        system = await self.get(system_id)
+        if not system:
+            raise SystemNotFoundError("业务系统不存在")
+        
+        if not system.ancestor_ids:
+            return []
+        result = await self.db.scalars(
+            select(BusinessSystem)
+            .where(BusinessSystem.id.in_(system.ancestor_ids))
+            .order_by(BusinessSystem.depth)
+        )
+        return list(result.all())
+    
+    async def get_system_path(self, system_id: int) -> str:
+        """获取系统的完整路径名称，如 "集团 > 财务中心 > 报销" """
+        system = await self.get(system_id)
+        if not system:
+            raise SystemNotFoundError("业务系统不存在")
+        
+        ancestors = await self.get_ancestors(system_id)
+        return " > ".join([ancestor.name for ancestor in ancestors] + [system.name])
+    
+    async def get_process_count(self, system_id: int) -> int:
+        """获取流程数量（包含子系统）"""
+        counts = await self.get_rolled_up_process_counts([system_id])
+        if system_id not in counts:
+            raise SystemNotFoundError("业务系统不存在")
+        return counts[system_id]
+    
+    async def get_process_full_name(self, process_id: int) -> str:
+        """获取流程的完整名称（包含系统路径），如 "集团 > 财务中心 > 报销审批" """
+        process = await self.db.get(BusinessProcess, process_id)
+        if process is None or process.is_deleted:
+            raise ProcessNotFoundError("流程不存在")
+        return f"{await self.get_system_path(process.system_id)} > {process.name}"
+    
+    async def get_rolled_up_process_counts(self, system_ids: List[int]) -> Dict[int, int]:
+        """
+        批量获取包含子系统在内的流程数量
+        
+        每个系统的子树通过路径前缀范围与流程表关联，一次分组查询完成汇总。
+        
+        Args:
+            system_ids: 业务系统ID列表
+            
+        Returns:
+            {系统ID: 流程数量}，不存在的系统不出现在结果中
+        """
+        if not system_ids:
+            return {}
+        
+        root = aliased(BusinessSystem)
+        stmt = (
+            select(root.id, func.count(BusinessProcess.id))
+            .select_from(root)
+            .join(
+                BusinessSystem,
+                and_(
+                    BusinessSystem.path >= root.path,
+                    BusinessSystem.path < root.path + PATH_UPPER_BOUND_SUFFIX,
+                    BusinessSystem.is_deleted == False
+                )
+            )
+            .outerjoin(
+                BusinessProcess,
+                and_(
+                    BusinessProcess.system_id == BusinessSystem.id,
+                    BusinessProcess.is_deleted == False
+                )
             )
+            .where(root.id.in_(system_ids), root.is_deleted == False)
+            .group_by(root.id)
+        )
+        result = await self.db.execute(stmt)
+        return dict(result.all())
     
-    def get_system_stats(self, system_id: int) -> BusinessSystemStats:
-        """获取业务系统统计信息"""
+    async def get_system_stats(self, system_id: int) -> BusinessSystemStats:
+        """获取业务系统统计信息
+
+        流程、SOP和任务的各项计数均在数据库端通过 COUNT/CASE 聚合完成，
+        不再把系统下的全部记录加载到内存。
+        """
         try:
-            system = self.get(system_id)
+            system = await self.get(system_id)
             if not system:
                 raise SystemNotFoundError("业务系统不存在")
             
-            stats = BusinessSystemStats()
-            
-            # 统计流程数量
-            processes = system.processes
-            stats.total_processes = len(processes)
-            stats.active_processes = len([p for p in processes if p.status == "active"])
-            
-            # 统计SOP数量
-            sops = system.sops
-            stats.total_sops = len(sops)
-            stats.published_sops = len([s for s in sops if s.status == "published"])
+            # 系统下的流程（SOP与任务都通过流程关联到系统）
+            process_filter = and_(
+                BusinessProcess.system_id == system_id,
+                BusinessProcess.is_deleted == False
+            )
             
-            # 统计任务数量（通过流程关联）
-            all_tasks = []
-            for process in processes:
-                all_tasks.extend(process.tasks)
+            process_stats = (
+                select(
+                    func.count(BusinessProcess.id).label("total_processes"),
+                    func.coalesce(
+                        func.sum(case((BusinessProcess.status == "active", 1), else_=0)), 0
+                    ).label("active_processes")
+                )
+                .where(process_filter)
+                .subquery()
+            )
             
-            stats.total_tasks = len(all_tasks)
-            stats.completed_tasks = len([t for t in all_tasks if t.status == "completed"])
-            stats.pending_tasks = len([t for t in all_tasks if t.status in ["pending", "in_progress"]])
+            sop_ids = select(BusinessProcess.sop_id).where(
+                process_filter,
+                BusinessProcess.sop_id.isnot(None)
+            )
+            sop_stats = (
+                select(
+                    func.count(SOP.id).label("total_sops"),
+                    func.coalesce(
+                        func.sum(case((SOP.status == "published", 1), else_=0)), 0
+                    ).label("published_sops")
+                )
+                .where(SOP.id.in_(sop_ids), SOP.is_deleted == False)
+                .subquery()
+            )
             
-            # 统计逾期任务
-            from datetime import datetime
             now = datetime.now()
-            stats.overdue_tasks = len([
-                t for t in all_tasks 
-                if t.due_date and t.due_date < now and t.status != "completed"
-            ])
+            task_stats = (
+                select(
+                    func.count(Task.id).label("total_tasks"),
+                    func.coalesce(
+                        func.sum(case((Task.status == "completed", 1), else_=0)), 0
+                    ).label("completed_tasks"),
+                    func.coalesce(
+                        func.sum(case((Task.status.in_(["pending", "in_progress"]), 1), else_=0)), 0
+                    ).label("pending_tasks"),
+                    func.coalesce(
+                        func.sum(case(
+                            (and_(
+                                Task.due_date.isnot(None),
+                                Task.due_date < now,
+                                Task.status != "completed"
+                            ), 1),
+                            else_=0
+                        )), 0
+                    ).label("overdue_tasks")
+                )
+                .join(BusinessProcess, Task.process_id == BusinessProcess.id)
+                .where(process_filter, Task.is_deleted == False)
+                .subquery()
+            )
+            
+            # 三个单行聚合结果交叉连接，一次查询返回全部计数
+            stmt = select(process_stats, sop_stats, task_stats).select_from(
+                process_stats.join(sop_stats, true()).join(task_stats, true())
+            )
+            row = (await self.db.execute(stmt)).mappings().one()
             
-            return stats
+            return BusinessSystemStats(**row)
             
         except SQLAlchemyError as e:
             raise DatabaseError(f"获取系统统计失败: {str(e)}")
     
-    def archive_system(self, system_id: int, current_user_id: int) -> Optional[BusinessSystem]:
+    async def archive_system(self, system_id: int, current_user_id: int) -> Optional[BusinessSystem]:
         """归档业务系统"""
         try:
-            system = self.get(system_id)
+            system = await self.get(system_id)
             if not system:
                 raise SystemNotFoundError("业务系统不存在")
             
@@ -194,16 +493,16 @@ class SystemService(BaseService[BusinessSystem]):
             if system.owner_id != current_user_id:
                 raise AuthorizationError("只有系统所有者可以归档系统")
             
-            updated_system = self.update(system_id, {"status": "archived"})
+            updated_system = await self.update(system_id, {"status": "archived"})
             return updated_system
             
         except SQLAlchemyError as e:
             raise DatabaseError(f"系统归档失败: {str(e)}")
     
-    def activate_system(self, system_id: int, current_user_id: int) -> Optional[BusinessSystem]:
+    async def activate_system(self, system_id: int, current_user_id: int) -> Optional[BusinessSystem]:
         """激活业务系统"""
         try:
-            system = self.get(system_id)
+            system = await self.get(system_id)
             if not system:
                 raise SystemNotFoundError("业务系统不存在")
             
@@ -211,44 +510,67 @@ class SystemService(BaseService[BusinessSystem]):
             if system.owner_id != current_user_id:
                 raise AuthorizationError("只有系统所有者可以激活系统")
             
-            updated_system = self.update(system_id, {"status": "active"})
+            updated_system = await self.update(system_id, {"status": "active"})
             return updated_system
             
         except SQLAlchemyError as e:
             raise DatabaseError(f"系统激活失败: {str(e)}")
     
-    def get_system_processes(self, system_id: int, skip: int = 0, limit: int = 100):
+    async def get_system_processes(self, system_id: int, skip: int = 0, limit: int = 100):
         """获取系统的流程列表"""
         try:
-            system = self.get(system_id)
+            system = await self.get(system_id)
             if not system:
                 raise SystemNotFoundError("业务系统不存在")
             
-            processes = system.processes
-            # 应用分页
-            return processes[skip:skip + limit]
+            stmt = (
+                select(BusinessProcess)
+                .where(
+                    BusinessProcess.system_id == system_id,
+                    BusinessProcess.is_deleted == False
+                )
+                .order_by(BusinessProcess.id)
+                .offset(skip)
+                .limit(limit)
+            )
+            result = await self.db.execute(stmt)
+            return list(result.scalars().all())
             
         except SQLAlchemyError as e:
             raise DatabaseError(f"获取系统流程失败: {str(e)}")
     
-    def get_system_sops(self, system_id: int, skip: int = 0, limit: int = 100):
+    async def get_system_sops(self, system_id: int, skip: int = 0, limit: int = 100):
         """获取系统的SOP列表"""
         try:
-            system = self.get(system_id)
+            system = await self.get(system_id)
             if not system:
                 raise SystemNotFoundError("业务系统不存在")
             
-            sops = system.sops
-            # 应用分页
-            return sops[skip:skip + limit]
+            sop_ids = (
+                select(BusinessProcess.sop_id)
+                .where(
+                    BusinessProcess.system_id == system_id,
+                    BusinessProcess.is_deleted == False,
+                    BusinessProcess.sop_id.isnot(None)
+                )
+            )
+            stmt = (
+                select(SOP)
+                .where(SOP.id.in_(sop_ids), SOP.is_deleted == False)
+                .order_by(SOP.id)
+                .offset(skip)
+                .limit(limit)
+            )
+            result = await self.db.execute(stmt)
+            return list(result.scalars().all())
             
         except SQLAlchemyError as e:
             raise DatabaseError(f"获取系统SOP失败: {str(e)}")
     
-    def clone_system(self, system_id: int, new_name: str, current_user_id: int) -> BusinessSystem:
+    async def clone_system(self, system_id: int, new_name: str, current_user_id: int) -> BusinessSystem:
         """克隆业务系统"""
         try:
-            original_system = self.get(system_id)
+            original_system = await self.get(system_id)
             if not original_system:
                 raise SystemNotFoundError("原始业务系统不存在")
             
@@ -262,16 +584,16 @@ class SystemService(BaseService[BusinessSystem]):
                 "owner_id": current_user_id
             }
             
-            cloned_system = self.create(system_data)
+            cloned_system = await self.create(system_data)
             return cloned_system
             
         except SQLAlchemyError as e:
             raise DatabaseError(f"系统克隆失败: {str(e)}")
     
-    def transfer_ownership(self, system_id: int, new_owner_id: int, current_user_id: int) -> Optional[BusinessSystem]:
+    async def transfer_ownership(self, system_id: int, new_owner_id: int, current_user_id: int) -> Optional[BusinessSystem]:
         """转移系统所有权"""
         try:
-            system = self.get(system_id)
+            system = await self.get(system_id)
             if not system:
                 raise SystemNotFoundError("业务系统不存在")
             
@@ -282,25 +604,25 @@ class SystemService(BaseService[BusinessSystem]):
             # 验证新所有者存在
             from .user_service import UserService
             user_service = UserService(self.db)
-            new_owner = user_service.get(new_owner_id)
+            new_owner = await user_service.get(new_owner_id)
             if not new_owner:
                 raise ValidationError("新所有者不存在")
             
-            updated_system = self.update(system_id, {"owner_id": new_owner_id})
+            updated_system = await self.update(system_id, {"owner_id": new_owner_id})
             return updated_system
             
         except SQLAlchemyError as e:
             raise DatabaseError(f"所有权转移失败: {str(e)}")
     
-    def get_systems_by_company_size(self, company_size: str, skip: int = 0, limit: int = 100) -> List[BusinessSystem]:
+    async def get_systems_by_company_size(self, company_size: str, skip: int = 0, limit: int = 100) -> List[BusinessSystem]:
         """根据公司规模获取业务系统"""
-        return self.get_multi(
+        return await self.get_multi(
             skip=skip,
             limit=limit,
             filters={"company_size": company_size}
         )
     
-    def bulk_update_systems(self, updates: List[Dict[str, Any]], current_user_id: int) -> List[BusinessSystem]:
+    async def bulk_update_systems(self, updates: List[Dict[str, Any]], current_user_id: int) -> List[BusinessSystem]:
         """批量更新业务系统"""
         try:
             updated_systems = []
@@ -309,7 +631,7 @@ class SystemService(BaseService[BusinessSystem]):
                 if not system_id:
                     continue
                 
-                system = self.get(system_id)
+                system = await self.get(system_id)
                 if not system:
                     continue
                 
@@ -321,7 +643,7 @@ class SystemService(BaseService[BusinessSystem]):
                 update_fields = {k: v for k, v in update_data.items() if k != "id"}
                 
                 if update_fields:
-                    updated_system = self.update(system_id, update_fields)
+                    updated_system = await self.update(system_id, update_fields)
                     if updated_system:
                         updated_systems.append(updated_system)
             
@@ -1,11 +1,16 @@
 """
 用户服务
 """
-from typing import List, Optional, Dict, Any
-from sqlalchemy.orm import Session
+from typing import List, Optional, Dict, Any, Tuple
+from sqlalchemy import select, func, case
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
 
 from ..models.user import User
+from ..models.system import BusinessSystem
+from ..models.process import BusinessProcess
+from ..models.sop import SOP
+from ..models.task import Task
 from ..schemas.user import UserCreate, UserUpdate, UserStats
 from ..utils.exceptions import (
     UserNotFoundError,
@@ -13,20 +18,21 @@ from ..utils.exceptions import (
     DatabaseError,
     ValidationError
 )
-from .base_service import BaseService
+from .base_service import AsyncBaseService
+from .principal_service import ALL_PERMISSIONS, role_permissions
 
 
-class UserService(BaseService[User]):
+class UserService(AsyncBaseService[User]):
     """用户服务类"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         super().__init__(User, db)
     
-    def create_user(self, user_data: UserCreate) -> User:
+    async def create_user(self, user_data: UserCreate) -> User:
         """创建用户"""
         try:
             # 检查邮箱是否已存在
-            existing_user = self.get_by_field("email", user_data.email)
+            existing_user = await self.get_by_field("email", user_data.email)
             if existing_user:
                 raise UserAlreadyExistsError("邮箱已被注册")
             
@@ -34,22 +40,22 @@ class UserService(BaseService[User]):
             user_dict = user_data.dict()
             
             # 创建用户
-            user = self.create(user_dict)
+            user = await self.create(user_dict)
             return user
             
         except SQLAlchemyError as e:
             raise DatabaseError(f"用户创建失败: {str(e)}")
     
-    def update_user(self, user_id: int, user_data: UserUpdate) -> Optional[User]:
+    async def update_user(self, user_id: int, user_data: UserUpdate) -> Optional[User]:
         """更新用户信息"""
         try:
-            user = self.get(user_id)
+            user = await self.get(user_id)
             if not user:
                 raise UserNotFoundError("用户不存在")
             
             # 如果更新邮箱，检查是否已存在
             if user_data.email and user_data.email != user.email:
-                existing_user = self.get_by_field("email", user_data.email)
+                existing_user = await self.get_by_field("email", user_data.email)
                 if existing_user:
                     raise UserAlreadyExistsError("邮箱已被其他用户使用")
             
@@ -59,41 +65,42 @@ class UserService(BaseService[User]):
             if not update_data:
                 return user
             
-            updated_user = self.update(user_id, update_data)
+            updated_user = await self.update(user_id, update_data)
             return updated_user
             
         except SQLAlchemyError as e:
             raise DatabaseError(f"用户更新失败: {str(e)}")
     
-    def get_user_by_email(self, email: str) -> Optional[User]:
+    async def get_user_by_email(self, email: str) -> Optional[User]:
         """根据邮箱获取用户"""
-        return self.get_by_field("email", email)
+        return await self.get_by_field("email", email)
     
-    def get_users_by_role(self, role: str, skip: int = 0, limit: int = 100) -> List[User]:
+    async def get_users_by_role(self, role: str, skip: int = 0, limit: int = 100) -> List[User]:
         """根据角色获取用户列表"""
-        return self.get_multi(
+        return await self.get_multi(
             skip=skip,
             limit=limit,
             filters={"role": role}
         )
     
-    def get_active_users(self, skip: int = 0, limit: int = 100) -> List[User]:
+    async def get_active_users(self, skip: int = 0, limit: int = 100) -> List[User]:
         """获取活跃用户列表"""
-        return self.get_multi(
+        return await self.get_multi(
             skip=skip,
             limit=limit,
             filters={"is_active": True}
         )
     
-    def search_users(
+    async def search_users(
         self,
         query: str,
         skip: int = 0,
         limit: int = 100,
         role: Optional[str] = None,
-        is_active: Optional[bool] = None
-    ) -> List[User]:
-        """搜索用户"""
+        is_active: Optional[bool] = None,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[User], Optional[int], Optional[str], str]:
+        """搜索用户，返回 (用户列表, 匹配总数, 下一页游标, 实际使用的总数模式)"""
         # 构建过滤条件
         filters = {}
         if role:
@@ -101,92 +108,110 @@ class UserService(BaseService[User]):
         if is_active is not None:
             filters["is_active"] = is_active
         
-        # 如果有过滤条件，先应用过滤再搜索
-        if filters:
-            users = self.get_multi(filters=filters, limit=1000)  # 获取更多数据用于搜索
-            # 在内存中进行搜索过滤
-            search_results = []
-            for user in users:
-                if (query.lower() in user.name.lower() or 
-                    query.lower() in user.email.lower()):
-                    search_results.append(user)
-            
-            # 应用分页
-            return search_results[skip:skip + limit]
-        else:
-            # 直接使用数据库搜索
-            return self.search(
-                search_term=query,
-                search_fields=["name", "email"],
-                skip=skip,
-                limit=limit
-            )
+        # 搜索条件与过滤条件一起在数据库中执行，匹配总数随当前页一并返回
+        return await self.search_page(
+            search_term=query,
+            search_fields=["name", "email"],
+            limit=limit,
+            cursor=cursor,
+            skip=skip,
+            filters=filters
+        )
     
-    def get_user_stats(self, user_id: int) -> UserStats:
+    async def get_user_stats(self, user_id: int) -> UserStats:
         """获取用户统计信息"""
         try:
-            user = self.get(user_id)
+            user = await self.get(user_id)
             if not user:
                 raise UserNotFoundError("用户不存在")
             
-            # 统计用户相关数据
-            stats = UserStats()
-            
-            # 统计拥有的业务系统数量
-            stats.total_systems = len(user.owned_systems)
-            
-            # 统计拥有的业务流程数量
-            stats.total_processes = len(user.owned_processes)
-            
-            # 统计创建的SOP数量
-            stats.total_sops = len(user.authored_sops)
-            
-            # 统计分配的任务数量
-            assigned_tasks = user.assigned_tasks
-            stats.total_tasks = len(assigned_tasks)
-            
-            # 统计已完成和待处理的任务
-            completed_tasks = [task for task in assigned_tasks if task.status == "completed"]
-            pending_tasks = [task for task in assigned_tasks if task.status in ["pending", "in_progress"]]
+            stats_map = await self.get_users_stats([user_id])
+            return stats_map[user_id]
             
-            stats.completed_tasks = len(completed_tasks)
-            stats.pending_tasks = len(pending_tasks)
+        except SQLAlchemyError as e:
+            raise DatabaseError(f"获取用户统计失败: {str(e)}")
+    
+    async def get_users_stats(self, user_ids: List[int]) -> Dict[int, UserStats]:
+        """批量获取用户统计信息
+
+        每张关联表只执行一次按用户分组的聚合查询，不加载关系对象。
+        未找到数据的用户返回全零统计。
+        """
+        try:
+            user_ids = list(dict.fromkeys(user_ids))
+            stats_map = {user_id: UserStats() for user_id in user_ids}
+            if not user_ids:
+                return stats_map
+            
+            # 拥有的业务系统、业务流程，以及创建的SOP数量
+            owner_counts = [
+                (BusinessSystem, BusinessSystem.owner_id, "total_systems"),
+                (BusinessProcess, BusinessProcess.owner_id, "total_processes"),
+                (SOP, SOP.author_id, "total_sops"),
+            ]
+            for model, owner_column, field in owner_counts:
+                stmt = (
+                    select(owner_column, func.count(model.id))
+                    .where(owner_column.in_(user_ids), model.is_deleted == False)
+                    .group_by(owner_column)
+                )
+                for owner_id, total in (await self.db.execute(stmt)).all():
+                    setattr(stats_map[owner_id], field, total)
+            
+            # 分配的任务数量及完成/待处理情况
+            stmt = (
+                select(
+                    Task.assignee_id,
+                    func.count(Task.id),
+                    func.coalesce(func.sum(case((Task.status == "completed", 1), else_=0)), 0),
+                    func.coalesce(
+                        func.sum(case((Task.status.in_(["pending", "in_progress"]), 1), else_=0)), 0
+                    )
+                )
+                .where(Task.assignee_id.in_(user_ids), Task.is_deleted == False)
+                .group_by(Task.assignee_id)
+            )
+            for assignee_id, total, completed, pending in (await self.db.execute(stmt)).all():
+                stats = stats_map[assignee_id]
+                stats.total_tasks = total
+                stats.completed_tasks = completed
+                stats.pending_tasks = pending
             
-            return stats
+            return stats_map
             
         except SQLAlchemyError as e:
-            raise DatabaseError(f"获取用户统计失败: {str(e)}")
+            raise DatabaseError(f"批量获取用户统计失败: {str(e)}")
     
-    def deactivate_user(self, user_id: int) -> bool:
+    async def deactivate_user(self, user_id: int) -> bool:
         """停用用户"""
         try:
-            user = self.get(user_id)
+            user = await self.get(user_id)
             if not user:
                 raise UserNotFoundError("用户不存在")
             
-            self.update(user_id, {"is_active": False})
+            await self.update(user_id, {"is_active": False})
             return True
             
         except SQLAlchemyError as e:
             raise DatabaseError(f"用户停用失败: {str(e)}")
     
-    def activate_user(self, user_id: int) -> bool:
+    async def activate_user(self, user_id: int) -> bool:
         """激活用户"""
         try:
-            user = self.get(user_id)
+            user = await self.get(user_id)
             if not user:
                 raise UserNotFoundError("用户不存在")
             
-            self.update(user_id, {"is_active": True})
+            await self.update(user_id, {"is_active": True})
             return True
             
         except SQLAlchemyError as e:
             raise DatabaseError(f"用户激活失败: {str(e)}")
     
-    def change_user_role(self, user_id: int, new_role: str) -> Optional[User]:
+    async def change_user_role(self, user_id: int, new_role: str) -> Optional[User]:
         """修改用户角色"""
         try:
-            user = self.get(user_id)
+            user = await self.get(user_id)
             if not user:
                 raise UserNotFoundError("用户不存在")
             
@@ -195,103 +220,44 @@ class UserService(BaseService[User]):
             if new_role not in allowed_roles:
                 raise ValidationError(f"无效的角色: {new_role}")
             
-            updated_user = self.update(user_id, {"role": new_role})
+            updated_user = await self.update(user_id, {"role": new_role})
             return updated_user
             
         except SQLAlchemyError as e:
             raise DatabaseError(f"角色修改失败: {str(e)}")
     
-    def get_users_by_ids(self, user_ids: List[int]) -> List[User]:
+    async def get_users_by_ids(self, user_ids: List[int]) -> List[User]:
         """根据ID列表获取用户"""
         try:
-            users = []
-            for user_id in user_ids:
-                user = self.get(user_id)
-                if user:
-                    users.append(user)
-            return users
+            return await self.get_by_ids(user_ids)
             
         except SQLAlchemyError as e:
             raise DatabaseError(f"批量获取用户失败: {str(e)}")
     
-    def bulk_update_users(self, updates: List[Dict[str, Any]]) -> List[User]:
+    async def bulk_update_users(self, updates: List[Dict[str, Any]]) -> List[User]:
         """批量更新用户"""
         try:
-            updated_users = []
-            for update_data in updates:
-                user_id = update_data.get("id")
-                if not user_id:
-                    continue
-                
-                user = self.get(user_id)
-                if not user:
-                    continue
-                
-                # 移除id字段
-                update_fields = {k: v for k, v in update_data.items() if k != "id"}
-                
-                if update_fields:
-                    updated_user = self.update(user_id, update_fields)
-                    if updated_user:
-                        updated_users.append(updated_user)
-            
-            return updated_users
+            return await self.bulk_update(updates)
             
         except SQLAlchemyError as e:
             raise DatabaseError(f"批量更新用户失败: {str(e)}")
     
-    def get_user_permissions(self, user_id: int) -> Dict[str, Any]:
+    async def get_user_permissions(self, user_id: int) -> Dict[str, Any]:
         """获取用户权限信息"""
         try:
-            user = self.get(user_id)
+            user = await self.get(user_id)
             if not user:
                 raise UserNotFoundError("用户不存在")
             
-            # 根据角色定义权限
-            permissions = {
-                "can_create_system": False,
-                "can_edit_system": False,
-                "can_delete_system": False,
-                "can_create_process": False,
-                "can_edit_process": False,
-                "can_delete_process": False,
-                "can_create_sop": False,
-                "can_edit_sop": False,
-                "can_delete_sop": False,
-                "can_manage_users": False,
-                "can_view_analytics": False,
-            }
-            
-            if user.role == "admin":
-                # 管理员拥有所有权限
-                permissions = {k: True for k in permissions.keys()}
-            elif user.role == "manager":
-                # 管理者拥有大部分权限
-                permissions.update({
-                    "can_create_system": True,
-                    "can_edit_system": True,
-                    "can_create_process": True,
-                    "can_edit_process": True,
-                    "can_create_sop": True,
-                    "can_edit_sop": True,
-                    "can_view_analytics": True,
-                })
-            elif user.role == "user":
-                # 普通用户拥有基本权限
-                permissions.update({
-                    "can_create_process": True,
-                    "can_edit_process": True,
-                    "can_create_sop": True,
-                    "can_edit_sop": True,
-                })
-            # viewer角色保持默认权限（只读）
+            granted = role_permissions(user.role)
+            permissions = {permission: permission in granted for permission in ALL_PERMISSIONS}
             
             return permissions
             
         except SQLAlchemyError as e:
             raise DatabaseError(f"获取用户权限失败: {str(e)}")
     
-    def check_user_permission(self, user_id: int, permission: str) -> bool:
+    async def check_user_permission(self, user_id: int, permission: str) -> bool:
         """检查用户是否拥有特定权限"""
-        permissions = self.get_user_permissions(user_id)
+        permissions = await self.get_user_permissions(user_id)
         return permissions.get(permission, False)
\ No newline at end of file
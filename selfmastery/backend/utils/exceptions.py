@@ -111,11 +111,17 @@ class ExternalServiceError(BaseAPIException):
 class RateLimitError(BaseAPIException):
     """频率限制异常"""
     
-    def __init__(self, detail: str = "请求频率过高", error_code: str = "RATE_LIMIT_ERROR"):
+    def __init__(
+        self,
+        detail: str = "请求频率过高",
+        error_code: str = "RATE_LIMIT_ERROR",
+        headers: Optional[Dict[str, Any]] = None
+    ):
         super().__init__(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
             detail=detail,
-            error_code=error_code
+            error_code=error_code,
+            headers=headers
         )
 
 
@@ -0,0 +1,96 @@
+"""
+游标分页工具
+"""
+import base64
+import json
+from datetime import datetime, date
+from typing import Any, Optional, Tuple
+
+from .exceptions import ValidationError
+
+
+def _encode_value(value: Any) -> Any:
+    """将排序字段值转换为可JSON序列化的形式"""
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"$d": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    """还原排序字段值"""
+    if isinstance(value, dict):
+        if "$dt" in value:
+            return datetime.fromisoformat(value["$dt"])
+        if "$d" in value:
+            return date.fromisoformat(value["$d"])
+    return value
+
+
+def encode_cursor(order_by: str, value: Any, obj_id: int) -> str:
+    """
+    生成不透明的分页游标
+
+    Args:
+        order_by: 排序字段名
+        value: 当前页最后一条记录的排序字段值
+        obj_id: 当前页最后一条记录的ID
+
+    Returns:
+        URL安全的游标字符串
+    """
+    payload = json.dumps(
+        {"f": order_by, "v": _encode_value(value), "id": obj_id},
+        separators=(",", ":"),
+        ensure_ascii=False
+    )
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, order_by: str) -> Tuple[Any, int]:
+    """
+    解析分页游标
+
+    Args:
+        cursor: 游标字符串
+        order_by: 当前请求的排序字段名，必须与生成游标时一致
+
+    Returns:
+        (排序字段值, 记录ID)
+
+    Raises:
+        ValidationError: 游标格式错误或与排序字段不匹配
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        field, value, obj_id = payload["f"], payload["v"], payload["id"]
+    except (ValueError, TypeError, KeyError):
+        raise ValidationError("无效的分页游标")
+
+    if field != order_by or not isinstance(obj_id, int):
+        raise ValidationError("分页游标与排序字段不匹配")
+
+    try:
+        return _decode_value(value), obj_id
+    except ValueError:
+        raise ValidationError("无效的分页游标")
+
+
+def next_cursor_for(items: list, limit: int, order_by: str) -> Optional[str]:
+    """
+    根据多取一条的查询结果生成下一页游标
+
+    Args:
+        items: 按 limit + 1 查询得到的记录列表
+        limit: 每页记录数
+        order_by: 排序字段名
+
+    Returns:
+        下一页游标，没有更多数据时为None
+    """
+    if len(items) <= limit:
+        return None
+    last = items[limit - 1]
+    return encode_cursor(order_by, getattr(last, order_by), last.id)
@@ -1,16 +1,66 @@
 """
 统一响应格式
+
+响应信封由 *_response 函数直接构建为字典（不经过 pydantic 模型），下面的 pydantic
+模型只描述响应结构。大列表接口可以直接返回 ORJSONResponse：结合 project_rows 把ORM
+对象按字段投影进信封，datetime 等由 orjson 原生编码，跳过 FastAPI 的 jsonable_encoder。
 """
-from typing import Any, Optional, Dict, List, Union
-from pydantic import BaseModel
+from decimal import Decimal
+from operator import attrgetter, itemgetter
+from typing import Any, Optional, Dict, Iterable, List, Mapping, Sequence, Union
+from pydantic import BaseModel, Field
 from datetime import datetime
 
+import orjson
+from fastapi.responses import JSONResponse
+
+# orjson 编码选项：允许非字符串键（如以ID为键的字典）、numpy 数组和标量
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _orjson_default(value: Any) -> Any:
+    """orjson 不支持的类型"""
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"无法序列化的类型: {type(value).__name__}")
+
+
+class ORJSONResponse(JSONResponse):
+    """orjson 编码的 JSON 响应（datetime/date/UUID/枚举/numpy 原生编码）"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_orjson_default, option=ORJSON_OPTIONS)
+
+
+def project_rows(rows: Iterable[Any], fields: Sequence[str]) -> List[Dict[str, Any]]:
+    """
+    按字段把ORM对象（或字典行）投影为字典列表，字段值原样保留
+
+    Args:
+        rows: ORM对象或字典
+        fields: 输出字段（按顺序）
+
+    Returns:
+        字典列表
+    """
+    rows = list(rows)
+    if not rows:
+        return []
+    getter = (itemgetter if isinstance(rows[0], Mapping) else attrgetter)(*fields)
+    if len(fields) == 1:
+        return [{fields[0]: getter(row)} for row in rows]
+    return [dict(zip(fields, getter(row))) for row in rows]
+
 
 class BaseResponse(BaseModel):
     """基础响应模式"""
     success: bool = True
     message: str = "操作成功"
-    timestamp: datetime = datetime.now()
+    timestamp: datetime = Field(default_factory=datetime.now)
     
     class Config:
         json_encoders = {
@@ -56,26 +106,19 @@ class PaginatedResponse(BaseResponse):
     def __init__(
         self,
         data: List[Any],
-        total: int,
-        page: int,
+        total: Optional[int],
+        page: Optional[int],
         size: int,
         message: str = "获取数据成功",
+        next_cursor: Optional[str] = None,
+        total_approximate: bool = False,
         **kwargs
     ):
-        pages = (total + size - 1) // size if size > 0 else 0
-        pagination = {
-            "total": total,
-            "page": page,
-            "size": size,
-            "pages": pages,
-            "has_next": page < pages,
-            "has_prev": page > 1
-        }
         super().__init__(
             success=True,
             message=message,
             data=data,
-            pagination=pagination,
+            pagination=_pagination(total, page, size, next_cursor, total_approximate),
             **kwargs
         )
 
@@ -98,12 +141,43 @@ class ValidationErrorResponse(ErrorResponse):
         )
 
 
+def _pagination(
+    total: Optional[int],
+    page: Optional[int],
+    size: int,
+    next_cursor: Optional[str],
+    total_approximate: bool
+) -> Dict[str, Any]:
+    """分页信息（游标翻页不计算总数时 total 和 pages 为None）"""
+    if total is None:
+        pages = None
+    else:
+        pages = (total + size - 1) // size if size > 0 else 0
+    return {
+        "total": total,
+        "page": page,
+        "size": size,
+        "pages": pages,
+        # 游标分页（page为None）或没有总数时以是否存在下一页游标判断
+        "has_next": next_cursor is not None if page is None or pages is None else page < pages,
+        "has_prev": page is not None and page > 1,
+        "next_cursor": next_cursor,
+        # 总数来自表统计信息估算时为True
+        "total_approximate": total_approximate
+    }
+
+
+def _envelope(success: bool, message: str, **fields: Any) -> Dict[str, Any]:
+    """响应信封（字段与 BaseResponse 子类的 dict() 结果一致）"""
+    return {"success": success, "message": message, "timestamp": datetime.now(), **fields}
+
+
 def success_response(
     data: Any = None,
     message: str = "操作成功"
 ) -> Dict[str, Any]:
     """创建成功响应"""
-    return SuccessResponse(data=data, message=message).dict()
+    return _envelope(True, message, data=data)
 
 
 def error_response(
@@ -112,28 +186,25 @@ def error_response(
     details: Optional[Dict[str, Any]] = None
 ) -> Dict[str, Any]:
     """创建错误响应"""
-    return ErrorResponse(
-        message=message,
-        error_code=error_code,
-        details=details
-    ).dict()
+    return _envelope(False, message, error_code=error_code, details=details)
 
 
 def paginated_response(
     data: List[Any],
-    total: int,
-    page: int,
+    total: Optional[int],
+    page: Optional[int],
     size: int,
-    message: str = "获取数据成功"
+    message: str = "获取数据成功",
+    next_cursor: Optional[str] = None,
+    total_approximate: bool = False
 ) -> Dict[str, Any]:
     """创建分页响应"""
-    return PaginatedResponse(
+    return _envelope(
+        True,
+        message,
         data=data,
-        total=total,
-        page=page,
-        size=size,
-        message=message
-    ).dict()
+        pagination=_pagination(total, page, size, next_cursor, total_approximate)
+    )
 
 
 def validation_error_response(
@@ -141,10 +212,13 @@ def validation_error_response(
     message: str = "数据验证失败"
 ) -> Dict[str, Any]:
     """创建验证错误响应"""
-    return ValidationErrorResponse(
-        validation_errors=validation_errors,
-        message=message
-    ).dict()
+    return _envelope(
+        False,
+        message,
+        error_code="VALIDATION_ERROR",
+        details=None,
+        validation_errors=validation_errors
+    )
 
 
 class APIResponse:
@@ -171,18 +245,22 @@ class APIResponse:
     @staticmethod
     def paginated(
         data: List[Any],
-        total: int,
-        page: int,
+        total: Optional[int],
+        page: Optional[int],
         size: int,
-        message: str = "获取数据成功"
+        message: str = "获取数据成功",
+        next_cursor: Optional[str] = None,
+        total_approximate: bool = False
     ) -> Dict[str, Any]:
-        """分页响应"""
+        """分页响应（游标分页时page传None）"""
         return paginated_response(
             data=data,
             total=total,
             page=page,
             size=size,
-            message=message
+            message=message,
+            next_cursor=next_cursor,
+            total_approximate=total_approximate
         )
     
     @staticmethod
@@ -35,6 +35,10 @@ class DatabaseSettings(BaseSettings):
     # 是否启用SQL日志
     DB_ECHO: bool = False
     
+    # KPI历史数据归档配置（SQLite）：热数据保留的月数，及按月归档文件目录（默认为数据库同级的 archive 目录）
+    KPI_HOT_MONTHS: int = 3
+    KPI_ARCHIVE_DIR: str = ""
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -51,6 +55,13 @@ class DatabaseSettings(BaseSettings):
         else:
             return f"postgresql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
     
+    @property
+    def kpi_archive_dir(self) -> Path:
+        """KPI历史数据归档目录"""
+        if self.KPI_ARCHIVE_DIR:
+            return Path(self.KPI_ARCHIVE_DIR)
+        return Path(self.DB_PATH).parent / "archive"
+    
     @property
     def async_database_url(self) -> str:
         """异步数据库连接URL"""
@@ -26,6 +26,28 @@ class Settings:
         self.ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
         self.REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
         self.ALGORITHM = os.getenv("ALGORITHM", "HS256")
+        self.PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "30"))  # 0 表示不缓存
+        self.PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+        self.TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))  # 0 表示不缓存
+        self.PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+        self.PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))  # 超过后返回429
+        # API密钥，格式 "密钥:权限1|权限2,密钥2:*"
+        api_keys = os.getenv("API_KEYS", "")
+        self.API_KEYS = {
+            key.strip(): [scope for scope in scopes.split("|") if scope]
+            for key, _, scopes in (item.partition(":") for item in api_keys.split(",") if item.strip())
+        }
+        
+        # 速率限制配置
+        self.RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "True").lower() == "true"
+        # 计数存储：memory 或 sqlite（多工作进程共享，API_WORKERS > 1 时默认）
+        self.RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE", "sqlite" if self.API_WORKERS > 1 else "memory")
+        self.RATE_LIMIT_DB_PATH = os.getenv("RATE_LIMIT_DB_PATH", "data/rate_limits.db")
+        self.RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+        self.RATE_LIMIT_IP_REQUESTS = int(os.getenv("RATE_LIMIT_IP_REQUESTS", "600"))
+        self.RATE_LIMIT_IP_WINDOW_SECONDS = float(os.getenv("RATE_LIMIT_IP_WINDOW_SECONDS", "60"))
+        self.RATE_LIMIT_API_KEY_REQUESTS = int(os.getenv("RATE_LIMIT_API_KEY_REQUESTS", "1000"))
+        self.RATE_LIMIT_API_KEY_WINDOW_SECONDS = float(os.getenv("RATE_LIMIT_API_KEY_WINDOW_SECONDS", "3600"))
         
         # 数据库配置
         self.DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./data/selfmastery.db")
@@ -41,6 +63,9 @@ class Settings:
         
         # 文件上传配置
         self.UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+        self.REPORT_DIR = os.getenv("REPORT_DIR", "reports")
+        # 报告任务超过该时间（秒）没有进度更新即视为已中断（工作进程重启等）
+        self.REPORT_JOB_STALE_SECONDS = float(os.getenv("REPORT_JOB_STALE_SECONDS", "900"))
         self.MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", str(10 * 1024 * 1024)))  # 10MB
         allowed_ext = os.getenv("ALLOWED_EXTENSIONS", ".jpg,.jpeg,.png,.gif,.pdf,.doc,.docx,.xls,.xlsx")
         self.ALLOWED_EXTENSIONS = [ext.strip() for ext in allowed_ext.split(",")]
@@ -51,6 +76,10 @@ class Settings:
         self.REDIS_DB = int(os.getenv("REDIS_DB", "0"))
         self.REDIS_PASSWORD = os.getenv("REDIS_PASSWORD")
         self.CACHE_TTL = int(os.getenv("CACHE_TTL", "3600"))  # 1小时
+        self.SERVICE_CACHE_SIZE = int(os.getenv("SERVICE_CACHE_SIZE", "10000"))  # 0 表示不缓存
+        # 缓存版本号存储：memory 或 sqlite（多工作进程共享，API_WORKERS > 1 时默认）
+        self.CACHE_VERSION_STORE = os.getenv("CACHE_VERSION_STORE", "sqlite" if self.API_WORKERS > 1 else "memory")
+        self.CACHE_VERSION_DB_PATH = os.getenv("CACHE_VERSION_DB_PATH", "data/cache_versions.db")
         
         # Celery配置
         self.CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/1")
@@ -74,6 +103,8 @@ class Settings:
         # 业务配置
         self.PAGINATION_SIZE = int(os.getenv("PAGINATION_SIZE", "20"))
         self.MAX_PAGINATION_SIZE = int(os.getenv("MAX_PAGINATION_SIZE", "100"))
+        self.KPI_ALERT_INTERVAL_SECONDS = float(os.getenv("KPI_ALERT_INTERVAL_SECONDS", "60"))  # 0 表示不启动
+        self.KPI_ALERT_TIME_BUDGET_SECONDS = float(os.getenv("KPI_ALERT_TIME_BUDGET_SECONDS", "10"))
         
         # 第三方服务配置
         self.WECHAT_APP_ID = os.getenv("WECHAT_APP_ID")
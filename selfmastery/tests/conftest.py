@@ -0,0 +1,86 @@
+"""
+测试公共配置
+
+测试使用临时目录中的 SQLite 数据库，环境变量须在导入应用模块之前设置。
+每个测试结束后清空所有表并使缓存失效，测试之间互不影响。
+"""
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+
+PROJECT_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_DIR))
+sys.path.insert(0, str(PROJECT_DIR.parent))
+
+TEST_DATA_DIR = Path(tempfile.mkdtemp(prefix="selfmastery-tests-"))
+os.environ.update(
+    DB_TYPE="sqlite",
+    DB_PATH=str(TEST_DATA_DIR / "test.db"),
+    KPI_ARCHIVE_DIR=str(TEST_DATA_DIR / "archive"),
+    LOG_FILE=str(TEST_DATA_DIR / "app.log"),
+    REPORT_DIR=str(TEST_DATA_DIR / "reports"),
+    API_WORKERS="1",
+    CACHE_VERSION_STORE="memory",
+    RATE_LIMIT_STORE="memory",
+)
+
+from selfmastery.config.database import Base, engine, SessionLocal, AsyncSessionLocal, async_engine  # noqa: E402
+import backend.models as models  # noqa: E402
+from backend.services.base_service import BaseService  # noqa: E402
+from backend.services.cache_versions import table_versions  # noqa: E402
+
+Base.metadata.create_all(engine)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    engine.dispose()
+    shutil.rmtree(TEST_DATA_DIR, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def clean_database():
+    """测试结束后清空所有表、归档文件，并使所有表的缓存失效"""
+    yield
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    shutil.rmtree(TEST_DATA_DIR / "archive", ignore_errors=True)
+    table_versions.bump(table.name for table in Base.metadata.sorted_tables)
+
+
+@pytest.fixture
+def db():
+    """同步数据库会话"""
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest_asyncio.fixture
+async def async_db():
+    """异步数据库会话（连接池随测试的事件循环释放）"""
+    async with AsyncSessionLocal() as session:
+        yield session
+    await async_engine.dispose()
+
+
+@pytest.fixture
+def user(db):
+    """测试用户"""
+    return BaseService(models.User, db).create({"name": "测试用户", "email": "tester@example.com"})
+
+
+@pytest.fixture
+def process(db, user):
+    """测试业务系统下的一个流程"""
+    system = BaseService(models.BusinessSystem, db).create({"name": "测试系统", "owner_id": user.id})
+    return BaseService(models.BusinessProcess, db).create(
+        {"name": "测试流程", "system_id": system.id, "owner_id": user.id}
+    )
@@ -0,0 +1,156 @@
+"""
+缓存失效测试（表版本号、BaseService 读缓存、计算结果缓存）
+"""
+import pytest
+from sqlalchemy import update
+
+import backend.models as models
+from backend.services.base_service import BaseService
+from backend.services.cache_versions import SQLiteTableVersions, TableVersions, VersionedCache
+from backend.services.service_cache import ServiceCache, service_cache, is_miss
+from selfmastery.config.database import SessionLocal
+
+
+class FakeClock:
+    """可手动推进的 time.monotonic"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr("backend.services.service_cache.time.monotonic", clock)
+    monkeypatch.setattr("backend.services.cache_versions.time.monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def shared_versions(tmp_path):
+    """同一个版本文件上的两个存储，模拟两个工作进程"""
+    return SQLiteTableVersions(tmp_path / "versions.db"), SQLiteTableVersions(tmp_path / "versions.db")
+
+
+def test_service_cache_invalidates_on_version_bump():
+    cache = ServiceCache(max_size=10, ttl=60, versions=TableVersions())
+    key = cache.key("users", "get", 1)
+    cache.put(key, "cached")
+    other = cache.key("kpis", "get", 1)
+    cache.put(other, "kpi")
+
+    assert cache.get(key) == "cached"
+
+    cache.invalidate_tables({"users"})
+
+    assert is_miss(cache.get(key))
+    assert cache.key("users", "get", 1) != key
+    assert cache.get(other) == "kpi"
+
+
+def test_service_cache_skips_results_read_before_a_commit():
+    cache = ServiceCache(max_size=10, ttl=60, versions=TableVersions())
+    key = cache.key("users", "get", 1)
+
+    # 读取期间表被修改，旧结果不再写入
+    cache.invalidate_tables({"users"})
+    cache.put(key, "stale")
+
+    assert cache.stats()["size"] == 0
+
+
+def test_service_cache_ttl_and_lru(clock):
+    cache = ServiceCache(max_size=2, ttl=60, versions=TableVersions())
+    keys = [cache.key("users", "get", i) for i in range(3)]
+    for key in keys:
+        cache.put(key, key[-1])
+
+    assert is_miss(cache.get(keys[0]))
+    assert cache.get(keys[2]) == 2
+
+    clock.now += 61
+    assert is_miss(cache.get(keys[2]))
+
+
+def test_base_service_cache_sees_core_update(db, user):
+    service = BaseService(models.User, db)
+    assert service.get(user.id).name == "测试用户"
+    db.rollback()
+    hits = service_cache.hits
+    assert service.get(user.id).name == "测试用户"
+    assert service_cache.hits == hits + 1
+    db.rollback()
+
+    writer = SessionLocal()
+    try:
+        writer.execute(update(models.User.__table__).where(models.User.id == user.id).values(name="改名"))
+        writer.commit()
+    finally:
+        writer.close()
+
+    db.expire_all()
+    assert service.get(user.id).name == "改名"
+
+
+def test_versioned_cache_clears_on_dependency_change():
+    versions = TableVersions()
+    cache = VersionedCache(("kpis", "kpi_rollups"), max_size=10, ttl=60, versions=versions)
+    stamp = cache.stamp()
+    cache.put("series", [1, 2], stamp)
+
+    versions.bump({"users"})
+    assert cache.get("series") == [1, 2]
+
+    versions.bump({"kpi_rollups"})
+    assert cache.get("series") is None
+
+    # 读取前取得的 stamp 已过期，结果不保存
+    cache.put("series", [3], stamp)
+    assert cache.get("series") is None
+
+
+def test_versioned_cache_ttl(clock):
+    cache = VersionedCache(("kpis",), max_size=10, ttl=5, versions=TableVersions())
+    cache.put("key", "value", cache.stamp())
+
+    clock.now += 4
+    assert cache.get("key") == "value"
+    clock.now += 2
+    assert cache.get("key") is None
+
+
+def test_sqlite_versions_shared_between_connections(shared_versions):
+    first, second = shared_versions
+    changed = []
+    second.subscribe(changed.append)
+
+    first.bump({"users", "kpis"})
+
+    assert second.version("users") == first.version("users") == 1
+    assert changed == [{"users", "kpis"}]
+    assert second.stats()["remote_changes"] == 2
+
+    second.bump({"users"})
+    assert first.version("users") == 2
+    assert first.version("kpis") == 1
+
+
+def test_sqlite_versions_invalidate_other_process_caches(shared_versions):
+    first, second = shared_versions
+    writer_cache = ServiceCache(max_size=10, ttl=60, versions=first)
+    reader_cache = ServiceCache(max_size=10, ttl=60, versions=second)
+    reader_graph = VersionedCache(("process_connections",), max_size=10, ttl=60, versions=second)
+
+    key = reader_cache.key("users", "get", 1)
+    reader_cache.put(key, "cached")
+    reader_graph.put(1, "graph", reader_graph.stamp())
+
+    writer_cache.invalidate_tables({"users", "process_connections"})
+
+    # 读取方查询缓存时先同步版本，旧版本的缓存项随之清理
+    assert reader_cache.key("users", "get", 1) != key
+    assert is_miss(reader_cache.get(key))
+    assert reader_graph.get(1) is None
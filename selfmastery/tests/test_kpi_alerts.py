@@ -0,0 +1,127 @@
+"""
+KPI阈值预警测试
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import select
+
+import backend.models as models
+from backend.models.kpi import KPIAlert
+from backend.services.base_service import BaseService
+from backend.services.kpi_alert_service import KPIAlertService, acquire_lease, evaluate_thresholds
+from backend.services.kpi_service import KPIService
+from selfmastery.config.database import AsyncSessionLocal
+
+NAN = np.nan
+
+
+def test_evaluate_thresholds():
+    values = np.array([50.0, 80.0, 95.0, 10.0, 4.0, 95.0, 95.0])
+    warning = np.array([80.0, 80.0, 80.0, 20.0, 20.0, NAN, 80.0])
+    critical = np.array([90.0, 90.0, 90.0, 5.0, 5.0, 90.0, NAN])
+    below = np.array([False, False, False, True, True, False, False])
+
+    levels = evaluate_thresholds(values, warning, critical, below)
+
+    assert levels.tolist() == [0, 1, 2, 1, 2, 2, 1]
+
+
+def test_evaluate_thresholds_without_thresholds():
+    values = np.array([1e9, -1e9])
+    unset = np.array([NAN, NAN])
+
+    assert evaluate_thresholds(values, unset, unset, np.array([False, True])).tolist() == [0, 0]
+
+
+@pytest.fixture
+def kpi_ids(db, process):
+    service = BaseService(models.KPI, db)
+    above = service.create({
+        "name": "故障率", "process_id": process.id, "metric_type": "percentage",
+        "warning_threshold": 80.0, "critical_threshold": 90.0, "threshold_direction": "above"
+    })
+    below = service.create({
+        "name": "满意度", "process_id": process.id, "metric_type": "percentage",
+        "warning_threshold": 60.0, "critical_threshold": 40.0, "threshold_direction": "below"
+    })
+    invalid = service.create({
+        "name": "方向无效", "process_id": process.id, "metric_type": "count",
+        "warning_threshold": 1.0, "threshold_direction": "sideways"
+    })
+    return above.id, below.id, invalid.id
+
+
+async def record(db, values):
+    await KPIService(db).record_data_points([
+        {"kpi_id": kpi_id, "value": value} for kpi_id, value in values.items()
+    ])
+
+
+async def alert_history(db):
+    result = await db.execute(select(KPIAlert.kpi_id, KPIAlert.severity).order_by(KPIAlert.id))
+    return result.all()
+
+
+@pytest.mark.asyncio
+async def test_alerts_fire_only_on_state_change(async_db, kpi_ids):
+    above, below, invalid = kpi_ids
+    service = KPIAlertService(async_db)
+
+    await record(async_db, {above: 85.0, below: 70.0, invalid: 100.0})
+    first = await service.run_cycle()
+    assert (first["evaluated"], first["alerts"], first["next_id"]) == (2, 1, None)
+
+    # 状态未变化时不重复写入
+    await record(async_db, {above: 88.0, below: 65.0})
+    assert (await service.run_cycle())["alerts"] == 0
+
+    await record(async_db, {above: 95.0, below: 30.0})
+    assert (await service.run_cycle())["alerts"] == 2
+
+    # 恢复正常时写入 info 级别的预警
+    await record(async_db, {above: 10.0})
+    assert (await service.run_cycle())["alerts"] == 1
+
+    assert await alert_history(async_db) == [
+        (above, "warning"), (above, "critical"), (below, "critical"), (above, "info")
+    ]
+
+
+@pytest.mark.asyncio
+async def test_run_cycle_resumes_from_next_id(async_db, kpi_ids):
+    above, below, _ = kpi_ids
+    await record(async_db, {above: 95.0, below: 10.0})
+    service = KPIAlertService(async_db)
+
+    first = await service.run_cycle(batch_size=1, time_budget=0)
+    assert (first["evaluated"], first["next_id"]) == (1, above)
+
+    second = await service.run_cycle(after_id=first["next_id"], batch_size=1, time_budget=0)
+    assert second["evaluated"] == 1
+    assert await alert_history(async_db) == [(above, "critical"), (below, "critical")]
+
+
+@pytest.mark.asyncio
+async def test_acquire_lease_is_exclusive(async_db):
+    async with AsyncSessionLocal() as other_db:
+        assert await acquire_lease(async_db, "alerts", "worker-a", 60)
+        assert not await acquire_lease(other_db, "alerts", "worker-b", 60)
+        # 持有者续期
+        assert await acquire_lease(async_db, "alerts", "worker-a", 60)
+        assert not await acquire_lease(other_db, "alerts", "worker-b", 60)
+        # 其它租约互不影响
+        assert await acquire_lease(other_db, "reports", "worker-b", 60)
+
+
+@pytest.mark.asyncio
+async def test_expired_lease_is_taken_over(async_db):
+    async with AsyncSessionLocal() as other_db:
+        assert await acquire_lease(async_db, "alerts", "worker-a", -1)
+        assert await acquire_lease(other_db, "alerts", "worker-b", 60)
+        assert not await acquire_lease(async_db, "alerts", "worker-a", 60)
+
+    lease = await async_db.scalar(select(models.KPIAlertLease).where(models.KPIAlertLease.name == "alerts"))
+    assert lease.holder == "worker-b"
+    assert lease.expires_at > datetime.utcnow() + timedelta(seconds=30)
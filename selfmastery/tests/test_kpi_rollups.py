@@ -0,0 +1,156 @@
+"""
+KPI汇总表测试
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+import backend.models as models
+from backend.models.kpi import KPIRollup
+from backend.services import kpi_service
+from backend.services.base_service import BaseService
+from backend.services.kpi_archive_service import KPIArchiveService
+from backend.services.kpi_service import KPIService, aggregate_rollups, choose_resolution
+
+START = datetime(2026, 1, 1)
+
+
+@pytest.fixture
+def kpi_ids(db, process):
+    kpis = BaseService(models.KPI, db).bulk_create([
+        {"name": f"指标{i}", "process_id": process.id, "metric_type": "count"} for i in range(2)
+    ])
+    return [kpi.id for kpi in kpis]
+
+
+def make_points(kpi_ids, start=START, count=60, step=timedelta(minutes=50)):
+    """按固定间隔轮流为各KPI生成数据点"""
+    return [
+        {"kpi_id": kpi_ids[i % len(kpi_ids)], "value": float(i % 7), "recorded_at": start + step * i}
+        for i in range(count)
+    ]
+
+
+async def rollup_rows(db):
+    result = await db.scalars(select(KPIRollup))
+    return sorted(
+        (row.kpi_id, row.resolution, row.bucket_start, row.count, round(row.sum, 6),
+         row.min, row.max, row.last_value, row.last_recorded_at)
+        for row in result.all()
+    )
+
+
+def expected_rows(points):
+    return sorted(
+        (kpi_id, resolution, start, values["count"], round(values["sum"], 6),
+         values["min"], values["max"], values["last_value"], values["last_recorded_at"])
+        for (kpi_id, resolution, start), values in aggregate_rollups(points).items()
+    )
+
+
+@pytest.mark.parametrize("span, expected", [
+    (timedelta(hours=6), "hour"),
+    (timedelta(days=20), "hour"),
+    (timedelta(days=60), "day"),
+    (timedelta(days=3 * 365), "month"),
+    (timedelta(days=365 * 100), "month"),
+])
+def test_choose_resolution(span, expected):
+    assert choose_resolution(START, START + span) == expected
+
+
+def test_choose_resolution_respects_max_points():
+    assert choose_resolution(START, START + timedelta(days=2), max_points=24) == "day"
+
+
+def test_aggregate_rollups_buckets():
+    points = [
+        {"kpi_id": 1, "value": 3.0, "recorded_at": datetime(2026, 1, 1, 10, 5)},
+        {"kpi_id": 1, "value": 1.0, "recorded_at": datetime(2026, 1, 1, 10, 50)},
+        # 补录的较早数据不改变 last_value
+        {"kpi_id": 1, "value": 9.0, "recorded_at": datetime(2026, 1, 1, 10, 1)},
+    ]
+    buckets = aggregate_rollups(points)
+
+    hour = buckets[(1, "hour", datetime(2026, 1, 1, 10))]
+    assert hour == {
+        "count": 3, "sum": 13.0, "min": 1.0, "max": 9.0,
+        "last_value": 1.0, "last_recorded_at": datetime(2026, 1, 1, 10, 50)
+    }
+    assert buckets[(1, "day", datetime(2026, 1, 1))]["count"] == 3
+    assert buckets[(1, "month", datetime(2026, 1, 1))]["count"] == 3
+    assert len(buckets) == 3
+
+
+@pytest.mark.asyncio
+async def test_merge_rollups_accumulates_existing_buckets(async_db, kpi_ids):
+    service = KPIService(async_db)
+    first = [
+        {"kpi_id": kpi_ids[0], "value": 5.0, "recorded_at": datetime(2026, 1, 1, 10, 30)},
+        {"kpi_id": kpi_ids[0], "value": 2.0, "recorded_at": datetime(2026, 1, 1, 10, 40)},
+    ]
+    second = [
+        {"kpi_id": kpi_ids[0], "value": 8.0, "recorded_at": datetime(2026, 1, 1, 10, 35)},
+        {"kpi_id": kpi_ids[0], "value": 1.0, "recorded_at": datetime(2026, 1, 1, 11, 0)},
+    ]
+
+    await service._merge_rollups(aggregate_rollups(first))
+    await service._merge_rollups(aggregate_rollups(second))
+    await async_db.commit()
+
+    assert await rollup_rows(async_db) == expected_rows(first + second)
+    hour = await async_db.scalar(select(KPIRollup).where(
+        KPIRollup.resolution == "hour", KPIRollup.bucket_start == datetime(2026, 1, 1, 10)
+    ))
+    # 后合并的批次中较早的数据点不覆盖 last_value
+    assert (hour.count, hour.sum, hour.min, hour.max, hour.last_value) == (3, 15.0, 2.0, 8.0, 2.0)
+
+
+@pytest.mark.asyncio
+async def test_record_data_points_maintains_rollups(async_db, kpi_ids):
+    points = make_points(kpi_ids)
+
+    await KPIService(async_db).record_data_points(points, chunk_size=7)
+
+    assert await rollup_rows(async_db) == expected_rows(points)
+
+
+@pytest.mark.asyncio
+async def test_rebuild_rollups_in_batches(async_db, kpi_ids, monkeypatch):
+    monkeypatch.setattr(kpi_service, "ROLLUP_BACKFILL_BATCH_SIZE", 4)
+    points = make_points(kpi_ids)
+    service = KPIService(async_db)
+    await service.record_data_points(points)
+    recorded = await rollup_rows(async_db)
+
+    assert await service.rebuild_rollups() == len(points)
+    assert await rollup_rows(async_db) == recorded
+
+
+@pytest.mark.asyncio
+async def test_rebuild_rollups_for_selected_kpis(async_db, kpi_ids):
+    points = make_points(kpi_ids)
+    service = KPIService(async_db)
+    await service.record_data_points(points)
+    recorded = await rollup_rows(async_db)
+
+    processed = await service.rebuild_rollups([kpi_ids[1]])
+
+    assert processed == len([point for point in points if point["kpi_id"] == kpi_ids[1]])
+    assert await rollup_rows(async_db) == recorded
+
+
+@pytest.mark.asyncio
+async def test_rebuild_rollups_includes_archived_months(async_db, kpi_ids):
+    old = datetime.utcnow().replace(day=1) - timedelta(days=240)
+    points = make_points(kpi_ids, start=old, count=40, step=timedelta(days=3))
+    service = KPIService(async_db)
+    await service.record_data_points(points)
+    recorded = await rollup_rows(async_db)
+
+    archived = await KPIArchiveService(async_db).archive()
+    assert archived
+
+    assert await service.rebuild_rollups() == len(points)
+    assert await rollup_rows(async_db) == recorded
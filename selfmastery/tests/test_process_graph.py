@@ -0,0 +1,113 @@
+"""
+流程图（CSR）算法测试
+"""
+import pytest
+
+from backend.services.process_graph_service import ProcessGraph
+from backend.utils.exceptions import ValidationError
+
+
+def make_graph(edges, durations=None, process_ids=None):
+    """由边列表构建流程图，流程ID默认取边中出现的全部ID"""
+    if process_ids is None:
+        process_ids = sorted({pid for edge in edges for pid in edge})
+    if durations is None:
+        durations = {}
+    return ProcessGraph(1, process_ids, [durations.get(pid) for pid in process_ids], edges)
+
+
+@pytest.fixture
+def diamond():
+    """10 -> 20 -> 40，10 -> 30 -> 40 -> 50"""
+    return make_graph(
+        [(10, 20), (10, 30), (20, 40), (30, 40), (40, 50)],
+        durations={10: 5, 20: 30, 30: 10, 40: 5, 50: 1}
+    )
+
+
+def test_reachable_downstream_and_upstream(diamond):
+    assert diamond.reachable([10, 30, 50]) == {10: [20, 30, 40, 50], 30: [40, 50], 50: []}
+    assert diamond.reachable([40, 10], downstream=False) == {40: [10, 20, 30], 10: []}
+
+
+def test_reachable_includes_start_on_cycle():
+    graph = make_graph([(1, 2), (2, 3), (3, 1), (3, 4)])
+
+    assert graph.reachable([1]) == {1: [1, 2, 3, 4]}
+    assert graph.reachable([4]) == {4: []}
+
+
+def test_reachable_rejects_process_outside_graph(diamond):
+    with pytest.raises(ValidationError):
+        diamond.reachable([99])
+
+
+def test_edges_to_other_systems_are_ignored():
+    graph = make_graph([(1, 2), (2, 99)], process_ids=[1, 2])
+
+    assert graph.edge_count == 1
+    assert graph.reachable([1]) == {1: [2]}
+
+
+def test_topological_layers(diamond):
+    assert diamond.topological_layers() == [[10], [20, 30], [40], [50]]
+
+
+def test_topological_layers_with_isolated_processes():
+    graph = make_graph([(1, 2)], process_ids=[1, 2, 3])
+
+    assert graph.topological_layers() == [[1, 3], [2]]
+
+
+def test_topological_layers_rejects_cycle():
+    graph = make_graph([(1, 2), (2, 1)])
+
+    with pytest.raises(ValidationError):
+        graph.topological_layers()
+
+
+def test_cyclic_process_ids(diamond):
+    assert diamond.cyclic_process_ids() == []
+
+    # 1 -> 2 -> 3 -> 1 的环，4 在环的下游，5 在环的上游，都不在环上
+    graph = make_graph([(5, 1), (1, 2), (2, 3), (3, 1), (3, 4)])
+    assert graph.cyclic_process_ids() == [1, 2, 3]
+
+
+def test_cyclic_process_ids_self_loop_and_two_cycles():
+    graph = make_graph([(1, 1), (2, 3), (3, 2), (4, 5)])
+
+    assert graph.cyclic_process_ids() == [1, 2, 3]
+
+
+def test_critical_path_by_duration(diamond):
+    assert diamond.critical_path() == {"process_ids": [10, 20, 40, 50], "total_duration": 41}
+
+
+def test_critical_path_without_durations_counts_processes():
+    graph = make_graph([(1, 2), (2, 3), (1, 4)])
+
+    assert graph.critical_path() == {"process_ids": [1, 2, 3], "total_duration": 0}
+
+
+def test_critical_path_empty_graph():
+    assert make_graph([]).critical_path() == {"process_ids": [], "total_duration": 0}
+
+
+def test_critical_path_rejects_cycle():
+    graph = make_graph([(1, 2), (2, 3), (3, 2)])
+
+    with pytest.raises(ValidationError):
+        graph.critical_path()
+
+
+def test_summary():
+    graph = make_graph([(1, 2), (2, 1), (2, 3)])
+
+    assert graph.summary() == {
+        "system_id": 1,
+        "process_count": 3,
+        "connection_count": 3,
+        "has_cycle": True,
+        "cyclic_process_ids": [1, 2],
+    }
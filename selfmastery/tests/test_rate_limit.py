@@ -0,0 +1,105 @@
+"""
+令牌桶限流存储测试
+"""
+import types
+
+import pytest
+
+from backend.middleware import rate_limit
+from backend.middleware.rate_limit import MemoryRateLimitStore, RateLimiter, SQLiteRateLimitStore
+
+
+class FakeClock:
+    """可手动推进的 time.time"""
+
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", types.SimpleNamespace(time=clock.time))
+    return clock
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryRateLimitStore(max_keys=100)
+    return SQLiteRateLimitStore(tmp_path / "rate_limits.db")
+
+
+def test_bucket_allows_capacity_then_rejects(store, clock):
+    results = [store.consume("user:1", capacity=3, rate=1.0) for _ in range(4)]
+
+    assert [allowed for allowed, _ in results] == [True, True, True, False]
+    assert [tokens for _, tokens in results] == [2.0, 1.0, 0.0, 0.0]
+
+
+def test_bucket_refills_at_rate(store, clock):
+    for _ in range(2):
+        store.consume("user:1", capacity=2, rate=0.5)
+    assert not store.consume("user:1", capacity=2, rate=0.5)[0]
+
+    clock.now += 2
+    assert store.consume("user:1", capacity=2, rate=0.5) == (True, 0.0)
+
+    # 补充不超过容量
+    clock.now += 3600
+    assert store.consume("user:1", capacity=2, rate=0.5) == (True, 1.0)
+
+
+def test_buckets_are_per_key(store, clock):
+    assert store.consume("user:1", capacity=1, rate=0.1)[0]
+    assert not store.consume("user:1", capacity=1, rate=0.1)[0]
+    assert store.consume("user:2", capacity=1, rate=0.1)[0]
+
+
+def test_cost_consumes_multiple_tokens(store, clock):
+    assert store.consume("user:1", capacity=5, rate=1.0, cost=4) == (True, 1.0)
+    assert store.consume("user:1", capacity=5, rate=1.0, cost=2) == (False, 1.0)
+
+
+def test_memory_store_evicts_full_and_least_recent_buckets(clock):
+    store = MemoryRateLimitStore(max_keys=2)
+    store.consume("user:1", capacity=1, rate=1.0)
+    clock.now += 10
+    # user:1 已补满，访问新键时被淘汰
+    store.consume("user:2", capacity=1, rate=1.0)
+    assert len(store) == 1
+
+    store.consume("user:3", capacity=1, rate=1.0)
+    store.consume("user:4", capacity=1, rate=1.0)
+    assert len(store) == 2
+    # 被淘汰的桶与新桶等价
+    assert store.consume("user:2", capacity=1, rate=1.0)[0]
+
+
+def test_sqlite_store_is_shared_between_connections(tmp_path, clock):
+    first = SQLiteRateLimitStore(tmp_path / "rate_limits.db")
+    second = SQLiteRateLimitStore(tmp_path / "rate_limits.db")
+
+    assert first.consume("ip:127.0.0.1", capacity=2, rate=1.0)[0]
+    assert second.consume("ip:127.0.0.1", capacity=2, rate=1.0)[0]
+    assert not first.consume("ip:127.0.0.1", capacity=2, rate=1.0)[0]
+    assert len(second) == 1
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_headers(store, clock):
+    limiter = RateLimiter(store)
+
+    first = await limiter.hit("user:1", max_requests=2, window_seconds=60)
+    await limiter.hit("user:1", max_requests=2, window_seconds=60)
+    rejected = await limiter.hit("user:1", max_requests=2, window_seconds=60)
+
+    assert first.headers() == {
+        "X-RateLimit-Limit": "2", "X-RateLimit-Remaining": "1", "X-RateLimit-Reset": "30"
+    }
+    assert not rejected.allowed
+    assert rejected.headers()["Retry-After"] == "30"
+    assert rejected.headers()["X-RateLimit-Remaining"] == "0"
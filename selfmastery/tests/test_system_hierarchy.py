@@ -0,0 +1,133 @@
+"""
+业务系统物化路径测试
+
+SQLite 由触发器维护 path/depth；service 模式删除触发器，按其它数据库（如 PostgreSQL）
+的方式由 SystemService 维护，两种方式的结果应一致。
+"""
+import pytest
+import pytest_asyncio
+from sqlalchemy import text
+
+from selfmastery.config.database import engine
+from backend.models.system import BusinessSystem, ensure_system_hierarchy, rebuild_system_paths
+from backend.services.system_service import SystemService
+from backend.utils.exceptions import ValidationError
+
+HIERARCHY_TRIGGERS = ("business_systems_path_ai", "business_systems_path_bu", "business_systems_path_au")
+
+
+@pytest.fixture(params=["trigger", "service"])
+def hierarchy_mode(request, monkeypatch):
+    """物化路径的维护方式"""
+    if request.param == "service":
+        with engine.begin() as conn:
+            for trigger in HIERARCHY_TRIGGERS:
+                conn.execute(text(f"DROP TRIGGER {trigger}"))
+        monkeypatch.setattr(SystemService, "_hierarchy_by_triggers", lambda self: False)
+    yield request.param
+    with engine.begin() as conn:
+        ensure_system_hierarchy(conn)
+
+
+@pytest_asyncio.fixture
+async def tree(async_db, user, hierarchy_mode):
+    """集团 > 财务中心 > 报销，以及另一个根系统 销售中心"""
+    service = SystemService(async_db)
+    group = await service.create({"name": "集团", "owner_id": user.id})
+    finance = await service.create({"name": "财务中心", "owner_id": user.id, "parent_id": group.id})
+    expense = await service.create({"name": "报销", "owner_id": user.id, "parent_id": finance.id})
+    sales = await service.create({"name": "销售中心", "owner_id": user.id})
+    return {"group": group.id, "finance": finance.id, "expense": expense.id, "sales": sales.id}
+
+
+async def _hierarchy(service: SystemService, system_id: int):
+    system = await service.get(system_id)
+    return system.path, system.depth
+
+
+@pytest.mark.asyncio
+async def test_create_sets_path_and_depth(async_db, tree):
+    service = SystemService(async_db)
+
+    assert await _hierarchy(service, tree["group"]) == (f"/{tree['group']}/", 0)
+    assert await _hierarchy(service, tree["finance"]) == (f"/{tree['group']}/{tree['finance']}/", 1)
+    assert await _hierarchy(service, tree["expense"]) == (
+        f"/{tree['group']}/{tree['finance']}/{tree['expense']}/", 2
+    )
+    assert await service.get_system_path(tree["expense"]) == "集团 > 财务中心 > 报销"
+
+
+@pytest.mark.asyncio
+async def test_subtree(async_db, tree):
+    service = SystemService(async_db)
+
+    subtree = await service.get_subtree(tree["group"])
+    assert [system.id for system in subtree] == [tree["finance"], tree["expense"]]
+
+    with_self = await service.get_subtree(tree["group"], include_self=True, max_depth=1)
+    assert [system.id for system in with_self] == [tree["group"], tree["finance"]]
+
+    assert await service.get_subtree(tree["sales"]) == []
+
+
+@pytest.mark.asyncio
+async def test_move_rewrites_subtree(async_db, user, tree):
+    service = SystemService(async_db)
+
+    moved = await service.move_system(tree["finance"], tree["sales"], user.id)
+
+    assert (moved.path, moved.depth) == (f"/{tree['sales']}/{tree['finance']}/", 1)
+    assert await _hierarchy(service, tree["expense"]) == (
+        f"/{tree['sales']}/{tree['finance']}/{tree['expense']}/", 2
+    )
+    assert await service.get_subtree(tree["group"]) == []
+    assert [system.id for system in await service.get_subtree(tree["sales"])] == [
+        tree["finance"], tree["expense"]
+    ]
+
+    await service.move_system(tree["finance"], None, user.id)
+    assert await _hierarchy(service, tree["finance"]) == (f"/{tree['finance']}/", 0)
+    assert await _hierarchy(service, tree["expense"]) == (f"/{tree['finance']}/{tree['expense']}/", 1)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("target", ["group", "finance", "expense"])
+async def test_move_under_own_subtree_is_rejected(async_db, user, tree, target):
+    service = SystemService(async_db)
+
+    with pytest.raises(ValidationError):
+        await service.move_system(tree["group"], tree[target], user.id)
+
+    async_db.expire_all()
+    assert await _hierarchy(service, tree["group"]) == (f"/{tree['group']}/", 0)
+    assert await _hierarchy(service, tree["expense"]) == (
+        f"/{tree['group']}/{tree['finance']}/{tree['expense']}/", 2
+    )
+
+
+@pytest.mark.asyncio
+async def test_move_leaves_sibling_subtrees(async_db, user, tree):
+    service = SystemService(async_db)
+    # 同一父系统下的其它子树不受影响
+    sibling = await service.create({"name": "审计", "owner_id": user.id, "parent_id": tree["group"]})
+    sibling_id = sibling.id
+
+    await service.move_system(tree["finance"], tree["sales"], user.id)
+
+    assert await _hierarchy(service, sibling_id) == (f"/{tree['group']}/{sibling_id}/", 1)
+
+
+def test_rebuild_system_paths_backfills_from_parent_ids(db, user):
+    group = BusinessSystem(name="集团", owner_id=user.id)
+    db.add(group)
+    db.flush()
+    finance = BusinessSystem(name="财务中心", owner_id=user.id, parent_id=group.id)
+    db.add(finance)
+    db.commit()
+    db.execute(text("UPDATE business_systems SET path = NULL, depth = 0"))
+
+    rebuild_system_paths(db.connection())
+    db.commit()
+
+    db.refresh(finance)
+    assert (finance.path, finance.depth) == (f"/{group.id}/{finance.id}/", 1)